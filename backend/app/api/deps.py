@@ -0,0 +1,26 @@
+"""Shared API dependencies."""
+
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from ..config import ADMIN_TOKEN
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """True when an admin token is configured and ``token`` matches it."""
+    if ADMIN_TOKEN is None or token is None:
+        return False
+    return hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Reject the request unless it carries the configured admin token.
+
+    Admin endpoints fail closed: without ``ADMIN_TOKEN`` every request is refused.
+    """
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
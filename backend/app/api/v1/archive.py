@@ -0,0 +1,48 @@
+"""Archive inspection and compaction endpoints."""
+
+from datetime import date, datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session
+
+from ...archive import archive_before, get_archive, subtract_months
+from ...config import RECORD_RETENTION_MONTHS
+from ...db import get_session
+from ...engine_state import engine_for
+from ..deps import require_admin
+
+router = APIRouter(prefix="/api/v1/archive", tags=["archive"], dependencies=[Depends(require_admin)])
+
+
+@router.get("")
+def list_partitions(session: Session = Depends(get_session)) -> dict:
+    """List archived monthly partitions with their row counts and key ranges."""
+    archive = get_archive(session)
+    records, predictions = archive.counts()
+    return {
+        "directory": str(archive.root) if archive.root else None,
+        "retention_months": RECORD_RETENTION_MONTHS,
+        "records": records,
+        "predictions": predictions,
+        "partitions": [part.to_dict() for part in archive.partitions()],
+    }
+
+
+@router.post("/compact")
+def compact(
+    before: Optional[date] = Query(default=None, description="Archive whole months before this date's month"),
+    session: Session = Depends(get_session),
+) -> dict:
+    """Archive cold months now; defaults to the configured retention."""
+    if before is not None:
+        cutoff = datetime(before.year, before.month, 1)
+    elif RECORD_RETENTION_MONTHS > 0:
+        cutoff = subtract_months(datetime.utcnow(), RECORD_RETENTION_MONTHS)
+    else:
+        raise HTTPException(status_code=400, detail="Pass ?before=YYYY-MM-DD or set RECORD_RETENTION_MONTHS")
+    try:
+        written = archive_before(engine_for(session), cutoff)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    return {"archived_before": cutoff.date().isoformat(), "partitions": [part.to_dict() for part in written]}
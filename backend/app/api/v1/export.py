@@ -0,0 +1,53 @@
+"""Bulk export endpoint."""
+
+from datetime import datetime
+from typing import Iterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from ...config import EXPORT_BATCH_SIZE
+from ...db import get_session
+from ...engine_state import engine_for
+from ...export import ExportFormatError, ExportQuery, default_format, get_format, stream_export
+from ..deps import require_admin
+
+router = APIRouter(prefix="/api/v1/export", tags=["export"], dependencies=[Depends(require_admin)])
+
+
+@router.get(
+    "/records",
+    responses={400: {"description": "Unknown format, or parquet/arrow requested while pyarrow is not installed"}},
+)
+def export_records(
+    format_name: Optional[str] = Query(
+        default=None, alias="format", description="parquet, arrow or csv.gz (default: parquet if available)"
+    ),
+    start: Optional[datetime] = Query(default=None, description="scheduled_time lower bound (inclusive)"),
+    end: Optional[datetime] = Query(default=None, description="scheduled_time upper bound (exclusive)"),
+    route_id: Optional[str] = None,
+    predictions: bool = Query(default=True, description="Join predictions (one row per prediction)"),
+    batch_size: int = Query(default=EXPORT_BATCH_SIZE, ge=1, le=1_000_000),
+    session: Session = Depends(get_session),
+) -> StreamingResponse:
+    """Stream records, optionally joined with their predictions, as a file download."""
+    name = format_name or default_format()
+    try:
+        fmt = get_format(name)
+    except ExportFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    query = ExportQuery(start=start, end=end, route_id=route_id, include_predictions=predictions)
+    engine = engine_for(session)
+
+    def body() -> Iterator[bytes]:
+        # The request's session is closed once the handler returns; the
+        # stream reads through its own.
+        with Session(engine) as export_session:
+            yield from stream_export(export_session, query, fmt, batch_size)
+
+    return StreamingResponse(
+        body(),
+        media_type=fmt.media_type,
+        headers={"Content-Disposition": f'attachment; filename="records.{fmt.extension}"'},
+    )
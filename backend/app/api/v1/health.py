@@ -1,36 +1,92 @@
 """Health and metrics endpoints."""
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import func
-from sqlmodel import Session, select
+import os
+from typing import Dict, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
+from fastapi.responses import PlainTextResponse
+from sqlmodel import Session
 
 from ...config import MODEL_PATH
+from ...datetime_parsing import timestamp_parser
 from ...db import get_session
+from ...engine_state import engine_for
+from ...instrumentation import instrumentation
+from ...metrics_store import get_metrics_store, reconcile_metrics
 from ...model_server import model_server
-from ...models import Prediction, Record
+from ...prediction_worker import prediction_worker
 from ...schemas import HealthOut
 
 router = APIRouter(prefix="/api/v1", tags=["health"])
 
 
+def _process_memory() -> Dict[str, Optional[int]]:
+    """Return resident and shared memory of this process (Linux only)."""
+    fields: Dict[str, Optional[int]] = {"VmRSS": None, "RssFile": None, "RssShmem": None}
+    try:
+        with open("/proc/self/status", encoding="ascii") as handle:
+            for line in handle:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    fields[key] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    shared = None
+    if fields["RssFile"] is not None:
+        shared = fields["RssFile"] + (fields["RssShmem"] or 0)
+    return {"rss_bytes": fields["VmRSS"], "rss_shared_bytes": shared}
+
+
 @router.get("/health", response_model=HealthOut)
 def health() -> HealthOut:
-    """Return service health and model status."""
-    return HealthOut(status="ok", model_loaded=model_server.loaded, model_path=MODEL_PATH)
+    """Return service health, model status and this worker's memory use."""
+    info = model_server.model_info()
+    return HealthOut(
+        status="ok",
+        model_loaded=info is not None,
+        model_path=info.path if info is not None and info.path else MODEL_PATH,
+        model_version=info.version if info is not None else None,
+        model_load_seconds=info.load_seconds if info is not None else None,
+        model_mmap_mode=info.mmap_mode if info is not None else None,
+        worker_pid=os.getpid(),
+        **_process_memory(),
+    )
 
 
 @router.get("/metrics")
-def metrics(session: Session = Depends(get_session)) -> dict:
-    """Return simple service metrics."""
-    total_records = session.exec(select(func.count()).select_from(Record)).one()
-    total_predictions = session.exec(select(func.count()).select_from(Prediction)).one()
-    last_version = session.exec(
-        select(Prediction.model_version).order_by(Prediction.created_at.desc())
-    ).first()
-    return {
-        "total_records": total_records[0] if isinstance(total_records, tuple) else total_records,
-        "total_predictions": total_predictions[0] if isinstance(total_predictions, tuple) else total_predictions,
-        "last_model_version": last_version,
-    }
+def metrics(
+    background_tasks: BackgroundTasks,
+    reconcile: bool = Query(default=False, description="Recount totals from the tables in the background"),
+    session: Session = Depends(get_session),
+) -> dict:
+    """Return service metrics from the precomputed counters."""
+    if reconcile:
+        background_tasks.add_task(reconcile_metrics, engine_for(session))
+    payload = get_metrics_store(session).snapshot()
+    payload["prediction_worker"] = prediction_worker.stats()
+    payload["datetime_parser"] = timestamp_parser.stats()
+    cache = model_server.cache_stats()
+    if cache is not None:
+        payload["prediction_cache"] = cache
+    batching = model_server.batching_stats()
+    if batching is not None:
+        payload["micro_batching"] = batching
+    return payload
+
 
+@router.get("/metrics/prom", response_class=PlainTextResponse)
+def metrics_prometheus(session: Session = Depends(get_session)) -> PlainTextResponse:
+    """Prometheus text exposition of stage latencies, request metrics and service gauges.
 
+    Stage and request series are only collected when INSTRUMENTATION_ENABLED is set.
+    """
+    totals = get_metrics_store(session).snapshot()
+    worker = prediction_worker.stats()
+    gauges = {
+        "busdelay_records": ("Records stored, archived ones included", totals["total_records"]),
+        "busdelay_predictions": ("Predictions stored, archived ones included", totals["total_predictions"]),
+        "busdelay_prediction_worker_queue_depth": ("Record ids waiting for prediction", worker["queue_depth"]),
+        "busdelay_prediction_worker_lag_seconds": ("Age of the oldest queued record id", worker["lag_seconds"]),
+        "busdelay_model_loaded": ("1 if a model is loaded", 1 if model_server.loaded else 0),
+    }
+    return PlainTextResponse(instrumentation.render(gauges), media_type="text/plain; version=0.0.4")
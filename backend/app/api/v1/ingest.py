@@ -3,38 +3,27 @@
 import logging
 from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from sqlmodel import Session
 
-from ...cleaning import clean_record
-from ...crud import create_prediction, create_record
-from ...db import engine, get_session
-from ...feature_engineering import create_features
+from ...cleaning import clean_record, clean_records_bulk
+from ...config import STREAM_INGEST_CHUNK_SIZE, STREAM_INGEST_MAX_REJECTS
+from ...crud import create_prediction, create_record, create_records_bulk
+from ...db import get_session
+from ...executors import run_db
+from ...feature_engineering import create_feature_vector
 from ...model_server import ModelNotLoadedError, model_server
+from ...models import Record
+from ...prediction_worker import prediction_worker
 from ...schemas import PredictOut, RecordIn, RecordOut
+from ...stream_ingest import FORMATS, StreamFormatError, ingest_jobs, ingest_stream
 
 router = APIRouter(prefix="/api/v1/records", tags=["records"])
 logger = logging.getLogger(__name__)
 
 
-def _predict_and_store(record_id: int) -> None:
-    """Background prediction task."""
-    from ...models import Record  # local import to avoid cycles
-
-    with Session(engine) as session:
-        record = session.get(Record, record_id)
-        if not record or not model_server.loaded:
-            return
-        try:
-            features = create_features(record.dict())
-            prediction_value = float(model_server.predict(features)[0])
-            create_prediction(session, record_id, prediction_value, model_server.model_version or "v1")
-        except ModelNotLoadedError:
-            return
-
-
 @router.post("/ingest", status_code=201)
 def ingest_record(record_in: RecordIn, session: Session = Depends(get_session)) -> Any:
     """Ingest a single record synchronously."""
@@ -44,7 +33,7 @@ def ingest_record(record_in: RecordIn, session: Session = Depends(get_session))
     prediction_payload: Optional[PredictOut] = None
     if model_server.loaded:
         try:
-            features = create_features(cleaned)
+            features = create_feature_vector(cleaned)
             prediction_value = float(model_server.predict(features)[0])
             prediction = create_prediction(
                 session, record.id, prediction_value, model_server.model_version or "v1"
@@ -65,22 +54,68 @@ def ingest_record(record_in: RecordIn, session: Session = Depends(get_session))
     return record_out
 
 
+def _store_batch(session: Session, records: List[RecordIn]) -> List[Record]:
+    """Clean and insert a batch in one transaction (runs on the DB pool)."""
+    return create_records_bulk(session, clean_records_bulk(records, session))
+
+
 @router.post("/batch_ingest", status_code=202)
 async def batch_ingest(
     records: List[RecordIn],
-    background_tasks: BackgroundTasks,
     session: Session = Depends(get_session),
 ) -> Dict[str, int]:
-    """Batch ingest records asynchronously, scheduling predictions."""
-    ingested = 0
+    """Batch ingest records, queueing predictions on the background worker."""
+    stored = await run_db(_store_batch, session, records)
     scheduled = 0
-    for record_in in records:
-        cleaned = clean_record(record_in.dict(), session)
-        record = create_record(session, cleaned)
-        ingested += 1
-        if model_server.loaded:
-            scheduled += 1
-            background_tasks.add_task(_predict_and_store, record.id)
-    return {"ingested": ingested, "predictions_scheduled": scheduled}
+    if model_server.loaded:
+        scheduled = prediction_worker.submit(record.id for record in stored)
+    return {"ingested": len(stored), "predictions_scheduled": scheduled}
+
+
+def _stream_format(request: Request, requested: Optional[str]) -> str:
+    if requested:
+        return requested
+    content_type = request.headers.get("content-type", "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if any(kind in content_type for kind in ("ndjson", "jsonl", "json-seq")):
+        return "ndjson"
+    raise HTTPException(
+        status_code=415, detail="Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson"
+    )
+
+
+@router.post("/stream_ingest")
+async def stream_ingest(
+    request: Request,
+    format: Optional[str] = Query(default=None, regex=f"^({'|'.join(FORMATS)})$"),
+    job_id: Optional[str] = Query(default=None, description="Id to poll progress under; generated if omitted"),
+    session: Session = Depends(get_session),
+) -> Dict[str, Any]:
+    """Ingest a (chunked) CSV or NDJSON upload incrementally.
+
+    Rows are validated one by one and cleaned/inserted in chunks of
+    ``STREAM_INGEST_CHUNK_SIZE``; invalid rows are reported with their line
+    number. Progress is available at ``/stream_ingest/jobs/{job_id}``.
+    """
+    job = ingest_jobs.create(_stream_format(request, format), job_id, STREAM_INGEST_MAX_REJECTS)
+    try:
+        await ingest_stream(request.stream(), job, session, STREAM_INGEST_CHUNK_SIZE)
+    except StreamFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return job.summary()
+
+
+@router.get("/stream_ingest/jobs")
+def list_stream_ingest_jobs() -> List[Dict[str, Any]]:
+    """List recent streaming uploads, including ones still running."""
+    return [job.summary() for job in ingest_jobs.list()]
 
 
+@router.get("/stream_ingest/jobs/{job_id}")
+def get_stream_ingest_job(job_id: str) -> Dict[str, Any]:
+    """Return progress and rejects for one streaming upload."""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job.summary()
@@ -0,0 +1,86 @@
+"""Model registry administration endpoints."""
+
+import logging
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException
+
+from ...config import MODEL_PATH
+from ...model_registry import (
+    UnknownModelVersionError,
+    activate,
+    model_registry,
+    publish_and_activate,
+    rollback,
+)
+from ...model_server import model_server
+from ..deps import require_admin
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/v1/models", tags=["models"], dependencies=[Depends(require_admin)])
+
+
+def _status() -> dict:
+    active, history = model_registry.state()
+    return {
+        "loaded_version": model_server.model_version,
+        "active_version": active,
+        "history": history,
+        "versions": model_registry.versions(),
+    }
+
+
+@router.get("")
+def list_models() -> dict:
+    """List published versions, the active one and the rollback history."""
+    return _status()
+
+
+def _model_source(path: Optional[str]) -> str:
+    """Resolve a requested model file, which must live next to MODEL_PATH or in the registry.
+
+    Loading a model unpickles it, so arbitrary paths on the host are refused.
+    """
+    if path is None:
+        return MODEL_PATH
+    resolved = os.path.realpath(path)
+    roots = {os.path.realpath(os.path.dirname(MODEL_PATH)), os.path.realpath(model_registry.root)}
+    if not any(os.path.commonpath([resolved, root]) == root for root in roots):
+        raise HTTPException(status_code=400, detail="Model path must be inside the model directory or registry")
+    return resolved
+
+
+@router.post("/reload")
+def reload_model(path: Optional[str] = Body(default=None, embed=True)) -> dict:
+    """Publish the model file at ``path`` (default MODEL_PATH) and swap it in."""
+    source = _model_source(path)
+    try:
+        publish_and_activate(model_server, model_registry, source)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=f"Model file not found: {source}") from exc
+    except Exception as exc:
+        logger.exception("Failed to reload model from %s", source)
+        raise HTTPException(status_code=500, detail=f"Failed to load model: {exc}") from exc
+    return _status()
+
+
+@router.post("/activate/{version}")
+def activate_model(version: str) -> dict:
+    """Swap in a previously published version."""
+    try:
+        activate(model_server, model_registry, version)
+    except UnknownModelVersionError as exc:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}") from exc
+    return _status()
+
+
+@router.post("/rollback")
+def rollback_model() -> dict:
+    """Return to the previously active version."""
+    try:
+        rollback(model_server, model_registry)
+    except UnknownModelVersionError as exc:
+        raise HTTPException(status_code=409, detail="No previous model version to roll back to") from exc
+    return _status()
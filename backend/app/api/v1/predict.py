@@ -8,13 +8,21 @@ from sqlmodel import Session
 from ...cleaning import clean_record
 from ...crud import create_prediction, create_record
 from ...db import get_session
-from ...feature_engineering import create_features
+from ...executors import run_db
+from ...feature_engineering import create_feature_vector
 from ...model_server import ModelNotLoadedError, model_server
 from ...schemas import PredictOut, RecordIn, RecordOut
 
 router = APIRouter(prefix="/api/v1", tags=["predict"])
 
 
+def _persist(session: Session, cleaned: Dict[str, Any], prediction_value: float) -> int:
+    """Store the cleaned record and its prediction; return the record id."""
+    record = create_record(session, cleaned)
+    create_prediction(session, record.id, prediction_value, model_server.model_version or "v1")
+    return record.id
+
+
 @router.post("/predict", response_model=PredictOut)
 async def predict_endpoint(
     payload: Dict[str, Any] = Body(...),
@@ -32,11 +40,11 @@ async def predict_endpoint(
 
         logger.info(f"Received prediction request: {payload}")
         record_in = RecordIn(**payload)
-        cleaned = clean_record(record_in.dict(), session)
+        cleaned = await run_db(clean_record, record_in.dict(), session)
         logger.info(f"Cleaned record: {cleaned}")
         
-        features = create_features(cleaned)
-        logger.info(f"Features shape: {features.shape}, columns: {list(features.columns)}")
+        features = create_feature_vector(cleaned)
+        logger.info(f"Features shape: {features.shape}")
         
         # Use baseline predictor since model quality is poor (R² = 0.26)
         # TODO: Retrain with more data (need 1,000-5,000+ rows) for better model
@@ -48,14 +56,12 @@ async def predict_endpoint(
                 "Model R² = 0.26, RMSE = 221 min. Need more training data."
             )
         
-        prediction_value = float(model_server.predict(features, use_baseline=use_baseline)[0])
+        prediction_value = float((await model_server.predict_async(features, use_baseline=use_baseline))[0])
         logger.info(f"Prediction: {prediction_value} minutes (baseline={use_baseline})")
 
         record_id = None
         if persist:
-            record = create_record(session, cleaned)
-            record_id = record.id
-            create_prediction(session, record_id, prediction_value, model_server.model_version or "v1")
+            record_id = await run_db(_persist, session, cleaned, prediction_value)
 
         return PredictOut(record_id=record_id, predicted_delay=prediction_value, model_version=model_server.model_version or "v1")
     except HTTPException:
@@ -0,0 +1,55 @@
+"""Recent request profiles captured by the profiling middleware."""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+
+from ...config import PROFILING_ENABLED
+from ...profiling import SORT_KEYS, request_profiler
+from ..deps import require_admin
+
+router = APIRouter(prefix="/api/v1/profiles", tags=["profiles"], dependencies=[Depends(require_admin)])
+
+SORT_PATTERN = "^(" + "|".join(SORT_KEYS) + ")$"
+
+
+@router.get("")
+def list_profiles() -> dict:
+    """List stored profiles, newest first."""
+    return {
+        "enabled": PROFILING_ENABLED,
+        "sample_rate": request_profiler.sample_rate,
+        "capacity": request_profiler.capacity,
+        "skipped": request_profiler.skipped,
+        "profiles": [profile.summary() for profile in request_profiler.profiles()],
+    }
+
+
+@router.delete("")
+def clear_profiles() -> dict:
+    """Drop all stored profiles."""
+    request_profiler.clear()
+    return {"cleared": True}
+
+
+@router.get("/{profile_id}")
+def get_profile(
+    profile_id: int,
+    format_name: str = Query(default="json", alias="format", regex="^(json|pstats|collapsed|prof)$"),
+    sort: str = Query(default="cumulative", regex=SORT_PATTERN),
+    limit: int = Query(default=40, ge=1, le=1000),
+):
+    """Return a profile's top functions (json), pstats table, collapsed stacks or binary pstats dump."""
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format_name == "pstats":
+        return PlainTextResponse(profile.pstats_report(limit, sort))
+    if format_name == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    if format_name == "prof":
+        return Response(
+            profile.dump(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.prof"'},
+        )
+    return {**profile.summary(), "sort": sort, "top": profile.top(limit, sort)}
@@ -2,39 +2,62 @@
 
 from typing import Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlmodel import Session
 
 from ...cleaning import clean_record
-from ...crud import create_prediction, get_record, list_predictions_with_records, list_records
+from ...crud import apply_record_update, create_prediction, get_record, list_predictions_with_records, list_records
 from ...db import get_session
-from ...feature_engineering import create_features
+from ...feature_engineering import create_feature_vector
 from ...model_server import ModelNotLoadedError, model_server
 from ...models import Record
+from ...pagination import Cursor, InvalidCursorError, decode_cursor, encode_cursor
 from ...schemas import PredictionWithRecord, RecordOut
 
 router = APIRouter(prefix="/api/v1/records", tags=["records"])
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _parse_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
 
 @router.get("/", response_model=list[RecordOut])
 def list_records_endpoint(
+    response: Response,
     limit: int = Query(default=100, le=500),
     offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="Opaque cursor from X-Next-Cursor; overrides offset"),
     session: Session = Depends(get_session),
 ) -> list[RecordOut]:
-    """List records with pagination."""
-    records = list_records(session, limit=limit, offset=offset)
+    """List records with pagination; the next page's cursor is sent in X-Next-Cursor."""
+    records = list_records(session, limit=limit, offset=offset, after=_parse_cursor(cursor))
+    if records and len(records) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(records[-1].created_at, records[-1].id)
     return [RecordOut.from_orm(r) for r in records]
 
 
 @router.get("/predictions", response_model=list[PredictionWithRecord])
 def list_predictions_endpoint(
+    response: Response,
     limit: int = Query(default=20, le=100),
     offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="Opaque cursor from X-Next-Cursor; overrides offset"),
     session: Session = Depends(get_session),
 ) -> list[PredictionWithRecord]:
-    """List recent predictions with their associated records."""
-    predictions_with_records = list_predictions_with_records(session, limit=limit, offset=offset)
+    """List recent predictions with their associated records; next cursor in X-Next-Cursor."""
+    predictions_with_records = list_predictions_with_records(
+        session, limit=limit, offset=offset, before=_parse_cursor(cursor)
+    )
+    if predictions_with_records and len(predictions_with_records) == limit:
+        last_prediction = predictions_with_records[-1][0]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last_prediction.created_at, last_prediction.id)
     return [
         PredictionWithRecord(
             id=pred.id,
@@ -74,15 +97,11 @@ def update_record(
     base_data.update(updates)
 
     cleaned = clean_record(base_data, session)
-    for key, value in cleaned.items():
-        setattr(record, key, value)
-    session.add(record)
-    session.commit()
-    session.refresh(record)
+    record = apply_record_update(session, record, cleaned)
 
     if repredict and model_server.loaded:
         try:
-            features = create_features(cleaned)
+            features = create_feature_vector(cleaned)
             prediction_value = float(model_server.predict(features)[0])
             create_prediction(session, record.id, prediction_value, model_server.model_version or "v1")
         except ModelNotLoadedError:
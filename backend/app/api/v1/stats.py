@@ -0,0 +1,68 @@
+"""Dashboard statistics served from the delay rollup tables."""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+
+from ...db import get_session
+from ...rollups import METRIC_ACTUAL, METRICS, query_stats
+
+router = APIRouter(prefix="/api/v1/stats", tags=["stats"])
+
+
+class StatsFilters:
+    """Query parameters shared by every statistics endpoint."""
+
+    def __init__(
+        self,
+        metric: str = Query(default=METRIC_ACTUAL, regex=f"^({'|'.join(METRICS)})$",
+                            description="actual (recorded delay) or predicted"),
+        start: Optional[datetime] = Query(default=None, description="Only scheduled times from this hour on"),
+        end: Optional[datetime] = Query(
+            default=None, description="Only hours starting before this (a partial last hour is included whole)"
+        ),
+        route_id: Optional[str] = Query(default=None),
+        weather: Optional[str] = Query(default=None),
+    ) -> None:
+        self.metric = metric
+        self.start = start
+        self.end = end
+        self.route_id = route_id
+        self.weather = weather
+
+    def query(self, session: Session, group_by: str) -> List[Dict[str, object]]:
+        return query_stats(
+            session,
+            group_by,
+            metric=self.metric,
+            start=self.start,
+            end=self.end,
+            route_id=self.route_id,
+            weather=self.weather,
+        )
+
+
+@router.get("/routes")
+def stats_by_route(filters: StatsFilters = Depends(), session: Session = Depends(get_session)) -> List[Dict[str, object]]:
+    """Delay count, mean, std, min and max per route."""
+    return filters.query(session, "route")
+
+
+@router.get("/hours")
+def stats_by_hour(filters: StatsFilters = Depends(), session: Session = Depends(get_session)) -> List[Dict[str, object]]:
+    """Delay statistics per hour of day (0-23) of the scheduled time."""
+    return filters.query(session, "hour")
+
+
+@router.get("/weather")
+def stats_by_weather(filters: StatsFilters = Depends(), session: Session = Depends(get_session)) -> List[Dict[str, object]]:
+    """Delay statistics per weather condition."""
+    return filters.query(session, "weather")
+
+
+@router.get("/timeseries")
+def stats_timeseries(filters: StatsFilters = Depends(), session: Session = Depends(get_session)) -> List[Dict[str, object]]:
+    """Delay statistics per hourly bucket of scheduled time, oldest first."""
+    return filters.query(session, "bucket")
@@ -0,0 +1,562 @@
+"""Monthly archive partitions for cold records and their predictions.
+
+Records are partitioned by the month of ``created_at``. Compaction moves every
+record of a cold month, together with all of its predictions, into one
+compressed columnar ``.npz`` file and deletes them from the hot tables.
+``manifest.json`` lists the partitions with the key ranges that let queries
+skip files they cannot match. Rollups are left untouched, so the stats
+endpoints keep covering archived history, and passenger-count statistics are
+seeded from archived rows too, so imputation does not change when a month is
+archived or a worker restarts.
+
+Layout under the archive directory::
+
+    records-<YYYY-MM>.npz   one array per column, rows sorted by (created_at, id)
+    manifest.json           {"partitions": [...]}
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+from sqlalchemy import delete, func, text
+from sqlalchemy.engine import Engine, make_url
+from sqlmodel import Session, SQLModel, select
+
+from .config import ARCHIVE_DIR
+from .engine_state import EngineStateRegistry, engine_for
+from .models import Prediction, Record
+from .pagination import Cursor
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+DELETE_CHUNK_SIZE = 500
+# Loaded partitions kept in memory per archive
+PARTITION_CACHE_SIZE = 4
+
+_DTYPES = {int: np.int64, float: np.float64, bool: np.bool_, str: np.str_}
+_FILLS = {int: 0, float: 0.0, bool: False, str: ""}
+
+Columns = Dict[str, np.ndarray]
+
+
+def month_start(moment: datetime) -> datetime:
+    """Truncate ``moment`` to the first instant of its month."""
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(moment: datetime) -> datetime:
+    """Return the start of the month after ``moment``'s month."""
+    start = month_start(moment)
+    return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+
+
+def subtract_months(moment: datetime, months: int) -> datetime:
+    """Return the start of the month ``months`` before ``moment``'s month."""
+    index = moment.year * 12 + moment.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _column_types(model: Type[SQLModel]) -> Dict[str, type]:
+    return {column.name: model.__fields__[column.name].type_ for column in model.__table__.columns}
+
+
+def _encode(prefix: str, model: Type[SQLModel], rows: Sequence[dict]) -> Columns:
+    """Turn row dicts into one array per column, plus null masks for nullable columns."""
+    arrays: Columns = {}
+    kinds = _column_types(model)
+    for column in model.__table__.columns:
+        kind = kinds[column.name]
+        values = [row.get(column.name) for row in rows]
+        key = f"{prefix}.{column.name}"
+        if kind is datetime:
+            arrays[key] = np.array(values, dtype="datetime64[us]")
+            continue
+        fill = _FILLS[kind]
+        arrays[key] = np.array([fill if value is None else value for value in values], dtype=_DTYPES[kind])
+        if column.nullable:
+            arrays[f"{key}.null"] = np.array([value is None for value in values], dtype=np.bool_)
+    return arrays
+
+
+def _decode(prefix: str, model: Type[SQLModel], columns: Columns, index) -> List[SQLModel]:
+    """Materialize the rows selected by ``index`` (a slice or index array) as model instances."""
+    values: Dict[str, list] = {}
+    for name in _column_types(model):
+        key = f"{prefix}.{name}"
+        column = columns[key][index].tolist()
+        mask = columns.get(f"{key}.null")
+        if mask is not None:
+            column = [None if null else value for value, null in zip(column, mask[index].tolist())]
+        values[name] = column
+    names = list(values)
+    return [model(**dict(zip(names, row))) for row in zip(*values.values())]
+
+
+def _position(created: np.ndarray, ids: np.ndarray, key: Cursor, inclusive: bool) -> int:
+    """Count rows whose ``(created_at, id)`` is below ``key`` (at most ``key`` if inclusive)."""
+    moment = np.datetime64(key[0], "us")
+    lo = int(np.searchsorted(created, moment, "left"))
+    hi = int(np.searchsorted(created, moment, "right"))
+    return lo + int(np.searchsorted(ids[lo:hi], key[1], "right" if inclusive else "left"))
+
+
+def _sorted_rows(rows: Iterable[dict]) -> List[dict]:
+    """Deduplicate rows by id (last one wins) and sort them by ``(created_at, id)``."""
+    unique = {row["id"]: row for row in rows}
+    return sorted(unique.values(), key=lambda row: (row["created_at"], row["id"]))
+
+
+def _key(row: SQLModel) -> Cursor:
+    return row.created_at, row.id
+
+
+def _row_key(row: dict) -> Cursor:
+    return row["created_at"], row["id"]
+
+
+def _cursor(value: Optional[list]) -> Optional[Cursor]:
+    return (datetime.fromisoformat(value[0]), int(value[1])) if value else None
+
+
+@dataclass
+class ArchivePartition:
+    """Manifest entry describing one archived month."""
+
+    month: str
+    file: str
+    records: int
+    predictions: int
+    min_record_id: int
+    max_record_id: int
+    first_record: Cursor
+    last_record: Cursor
+    first_prediction: Optional[Cursor]
+    last_prediction: Optional[Cursor]
+    scheduled_min: datetime
+    scheduled_max: datetime
+    archived_at: datetime
+    # Absent from manifests written before it was tracked
+    max_prediction_id: Optional[int] = None
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        for name in ("first_record", "last_record", "first_prediction", "last_prediction"):
+            key = data[name]
+            data[name] = [key[0].isoformat(), key[1]] if key else None
+        for name in ("scheduled_min", "scheduled_max", "archived_at"):
+            data[name] = data[name].isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ArchivePartition":
+        data = dict(data)
+        for name in ("first_record", "last_record", "first_prediction", "last_prediction"):
+            data[name] = _cursor(data[name])
+        for name in ("scheduled_min", "scheduled_max", "archived_at"):
+            data[name] = datetime.fromisoformat(data[name])
+        return cls(**data)
+
+
+class RecordArchive:
+    """Read and compact the archive partitions of one database.
+
+    An archive without a directory (in-memory databases) is always empty.
+    The manifest is re-read whenever it changes on disk, so several workers
+    can share one archive directory.
+    """
+
+    def __init__(self, root: Optional[str]) -> None:
+        self.root = Path(root) if root else None
+        self._lock = threading.Lock()
+        self._manifest_stat: Optional[Tuple[int, int]] = None
+        self._partitions: List[ArchivePartition] = []
+        self._cache: "OrderedDict[Tuple[str, int], Columns]" = OrderedDict()
+
+    def partitions(self) -> List[ArchivePartition]:
+        """Return archived partitions, oldest month first."""
+        if self.root is None:
+            return []
+        try:
+            stat = os.stat(self.root / MANIFEST_FILENAME)
+        except FileNotFoundError:
+            return []
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature != self._manifest_stat:
+                with open(self.root / MANIFEST_FILENAME, encoding="utf-8") as handle:
+                    entries = json.load(handle)["partitions"]
+                self._partitions = sorted(
+                    (ArchivePartition.from_dict(entry) for entry in entries), key=lambda part: part.month
+                )
+                self._manifest_stat = signature
+            return list(self._partitions)
+
+    def counts(self) -> Tuple[int, int]:
+        """Return the number of archived records and predictions."""
+        parts = self.partitions()
+        return sum(part.records for part in parts), sum(part.predictions for part in parts)
+
+    def _write_manifest(self, partitions: List[ArchivePartition]) -> None:
+        path = self.root / MANIFEST_FILENAME
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=f".{MANIFEST_FILENAME}.")
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump({"partitions": [part.to_dict() for part in partitions]}, handle, indent=2)
+        os.replace(tmp, path)
+
+    def _load(self, part: ArchivePartition, cache: bool = True) -> Columns:
+        """Return a partition's column arrays; ``cache=False`` leaves the partition cache unchanged."""
+        path = self.root / part.file
+        key = (part.file, os.stat(path).st_mtime_ns)
+        with self._lock:
+            columns = self._cache.get(key)
+            if columns is not None:
+                self._cache.move_to_end(key)
+                return columns
+        with np.load(path, allow_pickle=False) as data:
+            columns = {name: data[name] for name in data.files}
+        if not cache:
+            return columns
+        with self._lock:
+            self._cache[key] = columns
+            while len(self._cache) > PARTITION_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return columns
+
+    def get_records(self, record_ids: Iterable[int]) -> Dict[int, Record]:
+        """Look up archived records by id, opening only partitions whose id range matches."""
+        wanted = np.array(sorted(set(record_ids)), dtype=np.int64)
+        found: Dict[int, Record] = {}
+        if not len(wanted):
+            return found
+        for part in self.partitions():
+            candidates = wanted[(wanted >= part.min_record_id) & (wanted <= part.max_record_id)]
+            if not len(candidates):
+                continue
+            columns = self._load(part)
+            index = np.flatnonzero(np.isin(columns["record.id"], candidates))
+            for record in _decode("record", Record, columns, index):
+                found[record.id] = record
+        return found
+
+    def get_record(self, record_id: int) -> Optional[Record]:
+        """Look up one archived record by id."""
+        return self.get_records([record_id]).get(record_id)
+
+    def list_records(self, limit: int, offset: int = 0, after: Optional[Cursor] = None) -> Tuple[List[Record], int]:
+        """Return the archived head of an oldest-first page and the offset left for the hot table.
+
+        Archived months all precede the hot table, so a page starts here and
+        continues in the hot table once the archive is exhausted.
+        """
+        rows: List[Record] = []
+        for part in self.partitions():
+            if len(rows) >= limit:
+                break
+            if after is not None:
+                if part.last_record <= after:
+                    continue
+                columns = self._load(part)
+                start = _position(columns["record.created_at"], columns["record.id"], after, inclusive=True)
+            else:
+                if offset >= part.records:
+                    offset -= part.records
+                    continue
+                columns = self._load(part)
+                start, offset = offset, 0
+            rows.extend(_decode("record", Record, columns, slice(start, start + limit - len(rows))))
+        return rows, offset
+
+    def list_predictions(
+        self, n: int, before: Optional[Cursor] = None, floor: Optional[Cursor] = None
+    ) -> List[Tuple[Prediction, Record]]:
+        """Return the ``n`` newest archived predictions between ``floor`` and ``before`` (both exclusive).
+
+        Partitions are visited newest first and skipped once they cannot hold
+        anything newer than what has been collected.
+        """
+        candidates: List[Tuple[Prediction, int]] = []
+        parts = [part for part in self.partitions() if part.last_prediction is not None]
+        for part in sorted(parts, key=lambda part: part.last_prediction, reverse=True):
+            if floor is not None and part.last_prediction <= floor:
+                break
+            if before is not None and part.first_prediction >= before:
+                continue
+            if len(candidates) >= n and _key(candidates[n - 1][0]) >= part.last_prediction:
+                break
+            columns = self._load(part)
+            created, ids = columns["prediction.created_at"], columns["prediction.id"]
+            end = len(ids) if before is None else _position(created, ids, before, inclusive=False)
+            start = 0 if floor is None else _position(created, ids, floor, inclusive=True)
+            start = max(start, end - n)
+            predictions = _decode("prediction", Prediction, columns, slice(start, end))
+            candidates.extend((prediction, prediction.record_id) for prediction in predictions)
+            candidates.sort(key=lambda item: _key(item[0]), reverse=True)
+            del candidates[n:]
+        records = self.get_records(record_id for _, record_id in candidates)
+        return [(prediction, records[record_id]) for prediction, record_id in candidates if record_id in records]
+
+    def iter_records(
+        self, scheduled_from: Optional[datetime] = None, scheduled_to: Optional[datetime] = None
+    ) -> Iterator[Tuple[Record, List[Prediction]]]:
+        """Yield archived records scheduled in ``[scheduled_from, scheduled_to)`` with their predictions."""
+        for batch in self.iter_record_batches(scheduled_from, scheduled_to):
+            yield from batch
+
+    def iter_record_batches(
+        self,
+        scheduled_from: Optional[datetime] = None,
+        scheduled_to: Optional[datetime] = None,
+        batch_size: int = 10_000,
+        route_id: Optional[str] = None,
+        with_predictions: bool = True,
+        cache: bool = True,
+    ) -> Iterator[List[Tuple[Record, List[Prediction]]]]:
+        """Yield matching archived records with their predictions, ``batch_size`` records at a time.
+
+        Only one batch is decoded into model instances at once, so memory is
+        bounded by a partition's column arrays plus one batch; ``cache=False``
+        also keeps large scans out of the partition cache.
+        """
+        for part in self.partitions():
+            if scheduled_from is not None and part.scheduled_max < scheduled_from:
+                continue
+            if scheduled_to is not None and part.scheduled_min >= scheduled_to:
+                continue
+            columns = self._load(part, cache)
+            scheduled = columns["record.scheduled_time"]
+            selected = np.ones(len(scheduled), dtype=np.bool_)
+            if scheduled_from is not None:
+                selected &= scheduled >= np.datetime64(scheduled_from, "us")
+            if scheduled_to is not None:
+                selected &= scheduled < np.datetime64(scheduled_to, "us")
+            if route_id is not None:
+                selected &= columns["record.route_id"] == route_id
+            index = np.flatnonzero(selected)
+            if with_predictions:
+                # Predictions grouped by record id, in partition order within a record.
+                order = np.argsort(columns["prediction.record_id"], kind="stable")
+                owners = columns["prediction.record_id"][order]
+            for start in range(0, len(index), batch_size):
+                rows = index[start:start + batch_size]
+                records = _decode("record", Record, columns, rows)
+                if not with_predictions:
+                    yield [(record, []) for record in records]
+                    continue
+                ids = columns["record.id"][rows]
+                lo = np.searchsorted(owners, ids, "left")
+                hi = np.searchsorted(owners, ids, "right")
+                picked = np.concatenate([order[a:b] for a, b in zip(lo, hi)])
+                predictions = _decode("prediction", Prediction, columns, picked)
+                batch, offset = [], 0
+                for record, count in zip(records, (hi - lo).tolist()):
+                    batch.append((record, predictions[offset:offset + count]))
+                    offset += count
+                yield batch
+
+    def passenger_counts(self) -> Iterator[Tuple[str, datetime, int]]:
+        """Yield ``(route_id, scheduled_time, passenger_count)`` of archived records that have a count."""
+        for part in self.partitions():
+            columns = self._load(part)
+            index = np.flatnonzero(~columns["record.passenger_count.null"])
+            yield from zip(
+                columns["record.route_id"][index].tolist(),
+                columns["record.scheduled_time"][index].tolist(),
+                columns["record.passenger_count"][index].tolist(),
+            )
+
+    def reserve_ids(self, session: Session) -> None:
+        """Keep SQLite from handing out ids that archived rows already use.
+
+        Record and Prediction are AUTOINCREMENT tables, whose ``sqlite_sequence``
+        entry is raised here past the archive's largest ids; this matters for
+        partitions archived before those tables were migrated.
+        """
+        if engine_for(session).dialect.name != "sqlite":
+            return
+        parts = self.partitions()
+        if not parts or session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_sequence'")
+        ).first() is None:
+            return  # no AUTOINCREMENT table yet: ids are only reserved once ``ensure_autoincrement`` has run
+        last_ids = {
+            Record.__tablename__: max((part.max_record_id for part in parts), default=None),
+            Prediction.__tablename__: max(
+                (
+                    part.max_prediction_id if part.max_prediction_id is not None else part.last_prediction[1]
+                    for part in parts
+                    if part.last_prediction is not None
+                ),
+                default=None,
+            ),
+        }
+        for table, last_id in last_ids.items():
+            if last_id is None:
+                continue
+            params = {"name": table, "seq": last_id}
+            seq = session.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :name"), params).scalar()
+            if seq is None:
+                session.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), params)
+            elif seq < last_id:
+                session.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = :name"), params)
+
+    def compact(self, session: Session, start: datetime, end: datetime) -> Optional[ArchivePartition]:
+        """Move records created in ``[start, end)`` and all their predictions into the archive.
+
+        The partition file and manifest are written before the hot rows are
+        deleted; rerunning after a crash merges into the existing partition.
+        """
+        if self.root is None:
+            raise RuntimeError("This database has no archive directory")
+        records = session.exec(select(Record).where(Record.created_at >= start, Record.created_at < end)).all()
+        if not records:
+            return None
+        record_ids = [record.id for record in records]
+        predictions: List[Prediction] = []
+        for offset in range(0, len(record_ids), DELETE_CHUNK_SIZE):
+            chunk = record_ids[offset:offset + DELETE_CHUNK_SIZE]
+            predictions.extend(session.exec(select(Prediction).where(Prediction.record_id.in_(chunk))).all())
+
+        month = f"{start:%Y-%m}"
+        record_rows: List[dict] = []
+        prediction_rows: List[dict] = []
+        existing = {part.month: part for part in self.partitions()}
+        if month in existing:
+            columns = self._load(existing[month])
+            record_rows = [row.dict() for row in _decode("record", Record, columns, slice(None))]
+            prediction_rows = [row.dict() for row in _decode("prediction", Prediction, columns, slice(None))]
+        # Rows still in the hot tables win over copies left by an interrupted run.
+        record_rows = _sorted_rows(record_rows + [record.dict() for record in records])
+        prediction_rows = _sorted_rows(prediction_rows + [prediction.dict() for prediction in predictions])
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        part = ArchivePartition(
+            month=month,
+            file=f"records-{month}.npz",
+            records=len(record_rows),
+            predictions=len(prediction_rows),
+            min_record_id=min(row["id"] for row in record_rows),
+            max_record_id=max(row["id"] for row in record_rows),
+            first_record=_row_key(record_rows[0]),
+            last_record=_row_key(record_rows[-1]),
+            first_prediction=_row_key(prediction_rows[0]) if prediction_rows else None,
+            last_prediction=_row_key(prediction_rows[-1]) if prediction_rows else None,
+            scheduled_min=min(row["scheduled_time"] for row in record_rows),
+            scheduled_max=max(row["scheduled_time"] for row in record_rows),
+            archived_at=datetime.utcnow(),
+            max_prediction_id=max((row["id"] for row in prediction_rows), default=None),
+        )
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=f".{part.file}.", suffix=".npz")
+        with os.fdopen(fd, "wb") as handle:
+            np.savez_compressed(
+                handle,
+                **_encode("record", Record, record_rows),
+                **_encode("prediction", Prediction, prediction_rows),
+            )
+        os.replace(tmp, self.root / part.file)
+        existing[month] = part
+        self._write_manifest(sorted(existing.values(), key=lambda p: p.month))
+
+        self.reserve_ids(session)
+        prediction_ids = [prediction.id for prediction in predictions]
+        for offset in range(0, len(prediction_ids), DELETE_CHUNK_SIZE):
+            chunk = prediction_ids[offset:offset + DELETE_CHUNK_SIZE]
+            session.execute(delete(Prediction).where(Prediction.id.in_(chunk)))
+        for offset in range(0, len(record_ids), DELETE_CHUNK_SIZE):
+            chunk = record_ids[offset:offset + DELETE_CHUNK_SIZE]
+            session.execute(delete(Record).where(Record.id.in_(chunk)))
+        session.commit()
+        logger.info("Archived %s records and %s predictions from %s", len(records), len(predictions), month)
+        return part
+
+
+def archive_dir_for(engine: Engine) -> Optional[str]:
+    """Return the archive directory for ``engine``'s database.
+
+    ``ARCHIVE_DIR`` wins when set; a SQLite file ``data/db.sqlite`` otherwise
+    archives to ``data/db-archive``. In-memory databases have no archive.
+    """
+    if ARCHIVE_DIR:
+        return ARCHIVE_DIR
+    url = make_url(str(engine.url))
+    if url.get_backend_name() != "sqlite":
+        return str(Path(__file__).parent.parent / "data" / "archive")
+    if url.database in (None, "", ":memory:"):
+        return None
+    path = Path(url.database)
+    return str(path.with_name(f"{path.stem}-archive"))
+
+
+_registry: EngineStateRegistry[RecordArchive] = EngineStateRegistry(
+    lambda session: RecordArchive(archive_dir_for(engine_for(session)))
+)
+
+
+def get_archive(session: Session) -> RecordArchive:
+    """Return the archive of the session's database."""
+    return _registry.get(session)
+
+
+def reserve_archived_ids(engine: Engine) -> None:
+    """Raise ``engine``'s id sequences past every archived id at startup."""
+    with Session(engine) as session:
+        get_archive(session).reserve_ids(session)
+        session.commit()
+
+
+def archive_before(engine: Engine, before: datetime) -> List[ArchivePartition]:
+    """Archive every whole month of records created before ``before``'s month."""
+    cutoff = month_start(before)
+    written: List[ArchivePartition] = []
+    with Session(engine) as session:
+        archive = get_archive(session)
+        oldest = session.exec(select(func.min(Record.created_at)).where(Record.created_at < cutoff)).one()
+        start = month_start(oldest) if oldest is not None else cutoff
+        while start < cutoff:
+            part = archive.compact(session, start, next_month(start))
+            if part is not None:
+                written.append(part)
+            start = next_month(start)
+    return written
+
+
+def archive_expired(engine: Engine, retention_months: int) -> List[ArchivePartition]:
+    """Archive months that ended more than ``retention_months`` whole months ago."""
+    return archive_before(engine, subtract_months(datetime.utcnow(), retention_months))
+
+
+class RetentionJob:
+    """Background thread that periodically archives records past retention."""
+
+    def __init__(self, engine: Engine, retention_months: int, interval_s: float = 3600.0) -> None:
+        self.engine = engine
+        self.retention_months = retention_months
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="retention-job", daemon=True)
+
+    def start(self) -> None:
+        """Start periodic archival."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the thread; a compaction in progress finishes first."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                archive_expired(self.engine, self.retention_months)
+            except Exception:  # pragma: no cover - defensive logging
+                logger.exception("Retention job failed")
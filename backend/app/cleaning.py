@@ -2,65 +2,28 @@
 
 import logging
 import re
-from datetime import datetime, time
-from statistics import median
-from typing import Any, Dict, Optional
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
 
-from dateutil import parser
-from sqlmodel import Session, select
+import numpy as np
+import pandas as pd
+from sqlmodel import Session
 
 from . import config
-from .models import Record
+from .datetime_parsing import parse_iso, timestamp_parser
+from .instrumentation import timed
+from .passenger_stats import PassengerStats, get_passenger_stats
 
 logger = logging.getLogger(__name__)
 
 
-def _parse_time_only(value: str) -> Optional[datetime]:
-    """Parse time-only strings by attaching today's date in UTC."""
-    value = value.strip()
-    today = datetime.utcnow().date()
-    time_match_colon = re.match(r"^(?P<hour>\d{1,2}):(?P<minute>\d{2})$", value)
-    time_match_compact = re.match(r"^(?P<hour>\d{1,2})(?P<minute>\d{2})$", value)
-    time_match_ampm = re.match(r"^(?P<hour>\d{1,2})[.:](?P<minute>\d{2})(?P<ampm>[AaPp][Mm])$", value)
-
-    parsed_time: Optional[time] = None
-    if time_match_colon:
-        parsed_time = time(int(time_match_colon.group("hour")), int(time_match_colon.group("minute")))
-    elif time_match_compact:
-        parsed_time = time(int(time_match_compact.group("hour")), int(time_match_compact.group("minute")))
-    elif time_match_ampm:
-        hour = int(time_match_ampm.group("hour"))
-        minute = int(time_match_ampm.group("minute"))
-        ampm = time_match_ampm.group("ampm").lower()
-        if ampm == "pm" and hour != 12:
-            hour += 12
-        if ampm == "am" and hour == 12:
-            hour = 0
-        parsed_time = time(hour, minute)
-
-    if parsed_time:
-        return datetime.combine(today, parsed_time)
-    return None
+def parse_datetime(value: Optional[str], source: Optional[str] = None) -> Optional[datetime]:
+    """Parse various timestamp formats into timezone-naive datetime.
 
-
-def parse_datetime(value: Optional[str]) -> Optional[datetime]:
-    """Parse various timestamp formats into timezone-naive datetime."""
-    if value is None:
-        return None
-    value = value.strip()
-    if not value:
-        return None
-
-    time_only = _parse_time_only(value)
-    if time_only:
-        return time_only
-
-    try:
-        dt = parser.parse(value)
-        return dt.replace(tzinfo=None)
-    except (ValueError, TypeError):
-        logger.warning("Failed to parse datetime string '%s'", value)
-        return None
+    ``source`` (e.g. the field name) lets the parser remember which format
+    last worked for that kind of value.
+    """
+    return timestamp_parser.parse(value, source=source)
 
 
 def normalize_weather(value: str) -> str:
@@ -76,21 +39,33 @@ def normalize_weather(value: str) -> str:
     return normalized
 
 
-def _median_passenger(session: Session) -> int:
-    """Compute median passenger count or default to 10."""
-    counts = session.exec(
-        select(Record.passenger_count).where(Record.passenger_count.is_not(None))
-    ).all()
-    valid_counts = [c for c in counts if c is not None]
-    if not valid_counts:
+@timed("median_passenger")
+def _median_passenger(session: Session, route_id: Optional[str] = None, hour: Optional[int] = None) -> int:
+    """Return the running median passenger count or default to 10."""
+    value = get_passenger_stats(session).median(route_id=route_id, hour=hour)
+    if value is None:
         return 10
-    return int(median(valid_counts))
+    return value
 
 
-def _clean_passenger_count(raw_value: Optional[int], session: Session) -> int:
-    """Validate and impute passenger count."""
+def _clean_passenger_count(
+    raw_value: Optional[int],
+    session: Session,
+    route_id: Optional[str] = None,
+    hour: Optional[int] = None,
+) -> int:
+    """Validate and impute passenger count.
+
+    ``route_id`` and ``hour`` narrow the imputation scope when
+    ``config.PASSENGER_IMPUTATION_SCOPE`` asks for it.
+    """
     if raw_value is None or raw_value < config.MIN_PASSENGER or raw_value > config.MAX_PASSENGER:
-        imputed = _median_passenger(session)
+        scope = config.PASSENGER_IMPUTATION_SCOPE
+        imputed = _median_passenger(
+            session,
+            route_id=route_id if scope in ("route", "route_hour") else None,
+            hour=hour if scope == "route_hour" else None,
+        )
         logger.info("Imputing passenger_count with median/default %s", imputed)
         return imputed
     return raw_value
@@ -121,19 +96,22 @@ def _compute_delay(scheduled: Optional[datetime], actual: Optional[datetime]) ->
     return None
 
 
+@timed("clean_record")
 def clean_record(record_in: Dict[str, Any], db_session: Session) -> Dict[str, Any]:
     """Clean and impute a record according to deterministic rules."""
-    scheduled_dt = parse_datetime(record_in.get("scheduled_time"))
-    actual_dt = parse_datetime(record_in.get("actual_time"))
+    scheduled_dt = parse_datetime(record_in.get("scheduled_time"), source="scheduled_time")
+    actual_dt = parse_datetime(record_in.get("actual_time"), source="actual_time")
     weather = normalize_weather(str(record_in.get("weather", "")))
     raw_passenger = record_in.get("passenger_count")
     try:
         passenger_val = int(raw_passenger) if raw_passenger is not None else None
     except (TypeError, ValueError):
         passenger_val = None
-    passenger_count = _clean_passenger_count(passenger_val, db_session)
-    latitude, longitude = _validate_gps(record_in.get("latitude"), record_in.get("longitude"))
     route_id = _normalize_route(str(record_in.get("route_id", "")))
+    passenger_count = _clean_passenger_count(
+        passenger_val, db_session, route_id=route_id, hour=scheduled_dt.hour if scheduled_dt else None
+    )
+    latitude, longitude = _validate_gps(record_in.get("latitude"), record_in.get("longitude"))
     delay_minutes = _compute_delay(scheduled_dt, actual_dt)
 
     cleaned_record = {
@@ -151,3 +129,174 @@ def clean_record(record_in: Dict[str, Any], db_session: Session) -> Dict[str, An
     return cleaned_record
 
 
+_BULK_COLUMNS = ["route_id", "scheduled_time", "actual_time", "weather", "passenger_count", "latitude", "longitude"]
+_UNSEEN = object()
+
+
+def _bulk_columns(records_in: Union[pd.DataFrame, Iterable[Any]]) -> Dict[str, List[Any]]:
+    """Column lists of the input, with missing values (None/NaN) as None."""
+    if isinstance(records_in, pd.DataFrame):
+        frame = records_in
+        return {
+            column: frame[column].astype(object).where(frame[column].notna(), None).tolist()
+            if column in frame
+            else [None] * len(frame)
+            for column in _BULK_COLUMNS
+        }
+    rows = [r.dict() if hasattr(r, "dict") else r for r in records_in]
+    return {column: [row.get(column) for row in rows] for column in _BULK_COLUMNS}
+
+
+def _map_unique(values: List[Any], func: Callable[[Any], Any]) -> List[Any]:
+    """Apply ``func`` once per distinct value and broadcast the results."""
+    mapped: Dict[Any, Any] = {}
+    result = []
+    for value in values:
+        out = mapped.get(value, _UNSEEN)
+        if out is _UNSEEN:
+            out = mapped[value] = func(value)
+        result.append(out)
+    return result
+
+
+def _optional_str(value: Any) -> Optional[str]:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return str(value)
+
+
+def _parse_datetime_or_error(value: str, source: Optional[str] = None) -> Union[datetime, ValueError, None]:
+    try:
+        return parse_datetime(value, source=source)
+    except (ValueError, OverflowError) as exc:
+        return ValueError(str(exc))
+
+
+def _parse_datetime_values(
+    values: List[Any], source: str, errors: Optional[Dict[int, str]] = None
+) -> List[Optional[datetime]]:
+    """``parse_datetime`` over a column.
+
+    ISO strings go straight through ``fromisoformat``; every other distinct
+    string goes through the layered parser once. Values the scalar parser
+    raises on propagate, unless ``errors`` is given: then they become None and
+    ``errors[row]`` holds the message.
+    """
+    def parse_one(value: Any) -> Union[datetime, ValueError, None]:
+        text = _optional_str(value)
+        text = text.strip() if text is not None else None
+        if not text:
+            return None
+        parsed = parse_iso(text)
+        if parsed is None:
+            parsed = _parse_datetime_or_error(text, source) if errors is not None else parse_datetime(text, source)
+        return parsed
+
+    result = _map_unique(values, parse_one)
+    if errors is not None:
+        for row, value in enumerate(result):
+            if isinstance(value, ValueError):
+                errors[row] = f"{source}: {value}"
+                result[row] = None
+    return result
+
+
+def _coerce_passenger(raw_value: Any) -> Optional[int]:
+    if raw_value is None:
+        return None
+    try:
+        return int(raw_value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _coerce_coordinate(raw_value: Any, limit: float) -> Optional[float]:
+    try:
+        value = float(raw_value)
+    except (TypeError, ValueError):
+        return None
+    return value if -limit <= value <= limit else None
+
+
+def clean_records_bulk(
+    records_in: Union[pd.DataFrame, Iterable[Any]],
+    db_session: Optional[Session],
+    rejects: Optional[Dict[int, str]] = None,
+    passenger_stats: Optional[PassengerStats] = None,
+) -> List[Dict[str, Any]]:
+    """Clean a batch of records column-wise.
+
+    Accepts a DataFrame or an iterable of ``RecordIn`` payloads / dicts and
+    returns the same dicts ``clean_record`` would produce for each row.
+    Passenger imputation uses the running median as of the start of the batch.
+
+    With ``rejects``, rows whose timestamps cannot be parsed or whose
+    ``scheduled_time`` is missing are left out of the result instead of
+    raising (or failing the insert later); ``rejects`` maps their row
+    positions to the reason.
+
+    Imputation medians come from ``passenger_stats`` when given (training has
+    no database), otherwise from the session's database.
+    """
+    columns = _bulk_columns(records_in)
+    n = len(columns["route_id"])
+    if n == 0:
+        return []
+
+    scheduled = _parse_datetime_values(columns["scheduled_time"], "scheduled_time", rejects)
+    actual = _parse_datetime_values(columns["actual_time"], "actual_time", rejects)
+    if rejects is not None:
+        for row, value in enumerate(scheduled):
+            if value is None:
+                rejects.setdefault(row, "scheduled_time: missing or unparseable timestamp")
+
+    weather = _map_unique([str(value) for value in columns["weather"]], normalize_weather)
+    route_ids = _map_unique([str(value) for value in columns["route_id"]], _normalize_route)
+
+    passenger = _map_unique(columns["passenger_count"], _coerce_passenger)
+    rows_to_impute = [
+        i for i, value in enumerate(passenger)
+        if value is None or value < config.MIN_PASSENGER or value > config.MAX_PASSENGER
+    ]
+    if rows_to_impute:
+        scope = config.PASSENGER_IMPUTATION_SCOPE
+        stats = passenger_stats if passenger_stats is not None else get_passenger_stats(db_session)
+        imputed: Dict[tuple, int] = {}
+        for i in rows_to_impute:
+            key = (
+                route_ids[i] if scope in ("route", "route_hour") else None,
+                scheduled[i].hour if scope == "route_hour" and scheduled[i] is not None else None,
+            )
+            if key not in imputed:
+                value = stats.median(route_id=key[0], hour=key[1])
+                imputed[key] = 10 if value is None else value
+            passenger[i] = imputed[key]
+        logger.info("Imputed passenger_count for %s of %s records", len(rows_to_impute), n)
+
+    latitude = [_coerce_coordinate(value, 90) for value in columns["latitude"]]
+    longitude = [_coerce_coordinate(value, 180) for value in columns["longitude"]]
+    invalid_gps = sum(
+        (lat is None and raw_lat is not None) + (lon is None and raw_lon is not None)
+        for lat, lon, raw_lat, raw_lon in zip(latitude, longitude, columns["latitude"], columns["longitude"])
+    )
+    if invalid_gps:
+        logger.info("Set %s invalid GPS coordinates to None", invalid_gps)
+
+    cleaned_records = [
+        {
+            "route_id": route_ids[i],
+            "scheduled_time": scheduled[i],
+            "actual_time": actual[i],
+            "weather": weather[i],
+            "passenger_count": int(passenger[i]),
+            "latitude": latitude[i],
+            "longitude": longitude[i],
+            "cleaned": True,
+            "delay_minutes": _compute_delay(scheduled[i], actual[i]),
+        }
+        for i in range(n)
+        if not rejects or i not in rejects
+    ]
+    logger.info("Cleaned %s records in bulk", len(cleaned_records))
+    return cleaned_records
+
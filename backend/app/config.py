@@ -17,6 +17,17 @@ if not _MODEL_PATH_ENV:
 else:
     MODEL_PATH = _MODEL_PATH_ENV
 
+# Versioned model registry used for hot reloads and rollbacks
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "").strip() or str(_BACKEND_DIR / "model" / "registry")
+# Seconds between checks of MODEL_PATH and the registry for a new model (0 disables the watcher)
+MODEL_WATCH_INTERVAL_S = float(os.getenv("MODEL_WATCH_INTERVAL_S", "").strip() or 0)
+# joblib mmap_mode for model arrays ("r" shares pages across workers; unset loads into private memory)
+MODEL_MMAP_MODE = os.getenv("MODEL_MMAP_MODE", "").strip() or None
+# Load the model when app.main is imported, so `gunicorn --preload` shares it copy-on-write
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "").strip().lower() in ("1", "true", "yes")
+# Shared secret required in the X-Admin-Token header by admin endpoints; they are disabled (403) until it is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "").strip() or None
+
 # Handle empty string from environment variable (Railway might set it to empty)
 # If DATABASE_URL is not set or is empty, use SQLite default
 _DB_URL = os.getenv("DATABASE_URL", "").strip()
@@ -27,9 +38,64 @@ if not _DB_URL:
     DATABASE_URL = "sqlite:///./data/db.sqlite"
 else:
     DATABASE_URL = _DB_URL
+# Storage profile: "tuned" (SQLite WAL, pooled connections) or "default" (driver defaults)
+DB_STORAGE_PROFILE = os.getenv("DB_STORAGE_PROFILE", "").strip().lower() or "tuned"
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", "").strip() or 256 * 1024 * 1024)
+SQLITE_CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", "").strip() or 64 * 1024)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "").strip() or 5000)
+# SQLite's durability setting under the "tuned" profile; NORMAL trades the last commits on power loss for throughput
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "").strip().upper() or "FULL"
+# Records older than RECORD_RETENTION_MONTHS whole months are compacted into monthly archive
+# files every ARCHIVE_INTERVAL_S seconds (0 keeps everything hot). ARCHIVE_DIR defaults to a
+# directory next to the SQLite file.
+RECORD_RETENTION_MONTHS = int(os.getenv("RECORD_RETENTION_MONTHS", "").strip() or 0)
+ARCHIVE_INTERVAL_S = float(os.getenv("ARCHIVE_INTERVAL_S", "").strip() or 3600)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "").strip() or None
+# Optional JSON file overriding the baseline predictor weights (see model_server.BaselineRules)
+BASELINE_RULES_PATH = os.getenv("BASELINE_RULES_PATH", "").strip() or None
+# Optional micro-batching of concurrent single-row predictions
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "").strip().lower() in ("1", "true", "yes")
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "").strip() or 32)
+MICROBATCH_MAX_WAIT_US = int(os.getenv("MICROBATCH_MAX_WAIT_US", "").strip() or 2000)
+# Background prediction worker used by batch ingest
+PREDICTION_WORKER_CHUNK_SIZE = int(os.getenv("PREDICTION_WORKER_CHUNK_SIZE", "").strip() or 256)
+PREDICTION_WORKER_MAX_WAIT_MS = int(os.getenv("PREDICTION_WORKER_MAX_WAIT_MS", "").strip() or 50)
+# Metrics counters: persistence and optional reconciliation intervals (0 disables reconciliation)
+METRICS_PERSIST_INTERVAL_S = float(os.getenv("METRICS_PERSIST_INTERVAL_S", "").strip() or 30)
+METRICS_RECONCILE_INTERVAL_S = float(os.getenv("METRICS_RECONCILE_INTERVAL_S", "").strip() or 0)
+# Number of recently seen raw timestamp strings kept by the datetime parser
+DATETIME_CACHE_SIZE = int(os.getenv("DATETIME_CACHE_SIZE", "").strip() or 4096)
+# Thread pools used by async endpoints for blocking DB work and model inference
+DB_THREADPOOL_SIZE = int(os.getenv("DB_THREADPOOL_SIZE", "").strip() or 16)
+INFERENCE_THREADPOOL_SIZE = int(os.getenv("INFERENCE_THREADPOOL_SIZE", "").strip() or max(1, min(4, os.cpu_count() or 1)))
+# Connection pool for the "tuned" profile: DB_POOL_SIZE connections are kept open. SQLite opens overflow
+# connections without limit (sync endpoints and streaming responses hold sessions outside the DB thread pool);
+# other backends allow DB_MAX_OVERFLOW more
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "").strip() or DB_THREADPOOL_SIZE)
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "").strip() or 8)
+# Prediction cache: memory bound in bytes (0 disables), entry lifetime (0 = no expiry)
+# and the decimals feature vectors are rounded to before lookup
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", "").strip() or 16 * 1024 * 1024)
+PREDICTION_CACHE_TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", "").strip() or 300)
+PREDICTION_CACHE_DECIMALS = int(os.getenv("PREDICTION_CACHE_DECIMALS", "").strip() or 4)
+# Streaming CSV/NDJSON ingest: rows per cleaned/inserted chunk and rejects kept per job
+STREAM_INGEST_CHUNK_SIZE = int(os.getenv("STREAM_INGEST_CHUNK_SIZE", "").strip() or 1000)
+STREAM_INGEST_MAX_REJECTS = int(os.getenv("STREAM_INGEST_MAX_REJECTS", "").strip() or 1000)
+# Per-stage latency histograms, request metrics and DB query counts at /api/v1/metrics/prom
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "").strip().lower() in ("1", "true", "yes")
+# Rows per batch read and encoded by the bulk export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "").strip() or 10_000)
+# Request profiling: requests carrying X-Profile (or ?profile=1) and the admin token, plus a
+# random PROFILE_SAMPLE_RATE fraction, run under cProfile; the last PROFILE_BUFFER_SIZE are kept
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").strip().lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "").strip() or 0)
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "").strip() or 20)
 ALLOWED_WEATHER = ["sunny", "cloudy", "rainy", "snow", "clear", "fog"]
 MAX_PASSENGER = 200
 MIN_PASSENGER = 0
+# Imputation scope for missing passenger counts: "global", "route" or "route_hour".
+# Narrower scopes fall back to the wider distribution when they have no data yet.
+PASSENGER_IMPUTATION_SCOPE = os.getenv("PASSENGER_IMPUTATION_SCOPE", "global").strip() or "global"
 
 
 @dataclass
@@ -1,53 +1,216 @@
 """CRUD operations."""
 
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Sequence
 
+from sqlalchemy import insert, tuple_
 from sqlmodel import Session, select
 
+from .archive import get_archive
+from .instrumentation import stage, timed
+from .metrics_store import get_metrics_store
 from .models import Prediction, Record
+from .pagination import Cursor
+from .passenger_stats import peek_passenger_stats
+from .rollups import apply_deltas, bucket_key, prediction_deltas, record_deltas, recompute_buckets
 
 
+@timed("create_record")
 def create_record(session: Session, cleaned_record_dict: dict) -> Record:
     """Insert a cleaned record."""
+    metrics = get_metrics_store(session)
     record = Record(**cleaned_record_dict)
     session.add(record)
+    apply_deltas(session, record_deltas([record]))
+    with stage("db_commit"):
+        session.commit()
+    session.refresh(record)
+    metrics.record_inserted()
+    stats = peek_passenger_stats(session)
+    if stats is not None:
+        stats.observe(record.route_id, record.scheduled_time, record.passenger_count)
+    return record
+
+
+BULK_INSERT_CHUNK_SIZE = 500
+# Bind parameters allowed in one statement. SQLite builds before 3.32 cap
+# SQLITE_MAX_VARIABLE_NUMBER at 999; other backends allow far more.
+MAX_BIND_PARAMETERS = {"sqlite": 999}
+DEFAULT_MAX_BIND_PARAMETERS = 32767
+
+
+def _rows_per_statement(dialect, n_columns: int, chunk_size: int) -> int:
+    """Largest multi-VALUES row count, up to ``chunk_size``, that stays within the bind-parameter limit."""
+    limit = MAX_BIND_PARAMETERS.get(dialect.name, DEFAULT_MAX_BIND_PARAMETERS)
+    return max(1, min(chunk_size, limit // n_columns))
+
+
+def _insert_chunk(session: Session, rows: List[dict]) -> List[int]:
+    """Insert one chunk of record rows and return their primary keys in order.
+
+    ``rows`` must fit in one statement (see ``_rows_per_statement``): on SQLite
+    the ids are derived from ``lastrowid``, which only holds when every row is
+    written by a single multi-VALUES INSERT.
+    """
+    dialect = session.get_bind().dialect
+    if getattr(dialect, "full_returning", False):
+        result = session.execute(insert(Record).values(rows).returning(Record.id))
+        return [row[0] for row in result]
+    if dialect.name == "sqlite":
+        # A single multi-VALUES statement runs under SQLite's write lock and
+        # assigns consecutive rowids ending at lastrowid.
+        result = session.execute(insert(Record).values(rows))
+        last_id = result.lastrowid
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+    records = [Record(**row) for row in rows]
+    session.add_all(records)
+    session.flush()
+    return [record.id for record in records]
+
+
+def create_records_bulk(
+    session: Session, cleaned_record_dicts: Sequence[dict], chunk_size: int = BULK_INSERT_CHUNK_SIZE
+) -> List[Record]:
+    """Insert many cleaned records in a single transaction.
+
+    Rows are written with multi-row INSERT statements of at most ``chunk_size``
+    rows, fewer if the dialect's bind-parameter limit requires it. The
+    returned records carry their assigned ids but are not attached to the
+    session.
+    """
+    records = [Record(**cleaned) for cleaned in cleaned_record_dicts]
+    if not records:
+        return records
+    metrics = get_metrics_store(session)
+    columns = [column.name for column in Record.__table__.columns if column.name != "id"]
+    chunk_size = _rows_per_statement(session.get_bind().dialect, len(columns), chunk_size)
+    try:
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start:start + chunk_size]
+            ids = _insert_chunk(session, [{name: getattr(record, name) for name in columns} for record in chunk])
+            for record, record_id in zip(chunk, ids):
+                record.id = record_id
+        apply_deltas(session, record_deltas(records))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    metrics.record_inserted(len(records))
+    stats = peek_passenger_stats(session)
+    if stats is not None:
+        for record in records:
+            stats.observe(record.route_id, record.scheduled_time, record.passenger_count)
+    return records
+
+
+def apply_record_update(session: Session, record: Record, cleaned_record_dict: dict) -> Record:
+    """Apply cleaned values to an existing record."""
+    stats = peek_passenger_stats(session)
+    previous = (record.route_id, record.scheduled_time, record.passenger_count)
+    previous_bucket = bucket_key(record)
+    for key, value in cleaned_record_dict.items():
+        setattr(record, key, value)
+    session.add(record)
+    session.flush()
+    recompute_buckets(session, {previous_bucket, bucket_key(record)})
     session.commit()
     session.refresh(record)
+    if stats is not None:
+        stats.discard(*previous)
+        stats.observe(record.route_id, record.scheduled_time, record.passenger_count)
     return record
 
 
 def get_record(session: Session, record_id: int) -> Optional[Record]:
-    """Retrieve a record by id."""
-    return session.get(Record, record_id)
+    """Retrieve a record by id, from the hot table or the archive.
+
+    Archived records are detached copies; only hot records can be updated.
+    """
+    return session.get(Record, record_id) or get_archive(session).get_record(record_id)
+
 
+def list_records(
+    session: Session, limit: int = 100, offset: int = 0, after: Optional[Cursor] = None
+) -> List[Record]:
+    """List records oldest first, by offset or after a ``(created_at, id)`` keyset cursor.
 
-def list_records(session: Session, limit: int = 100, offset: int = 0) -> List[Record]:
-    """List records with pagination."""
-    statement = select(Record).offset(offset).limit(limit)
-    return list(session.exec(statement).all())
+    Archived months come first; the page continues in the hot table.
+    """
+    archived, offset = get_archive(session).list_records(limit, offset, after)
+    if len(archived) >= limit:
+        return archived
+    limit -= len(archived)
+    statement = select(Record).order_by(Record.created_at, Record.id)
+    if after is not None:
+        statement = statement.where(tuple_(Record.created_at, Record.id) > tuple_(*after))
+    else:
+        statement = statement.offset(offset)
+    return archived + list(session.exec(statement.limit(limit)).all())
 
 
+@timed("create_prediction")
 def create_prediction(session: Session, record_id: int, predicted_delay: float, model_version: str) -> Prediction:
     """Store a prediction linked to a record."""
+    metrics = get_metrics_store(session)
     prediction = Prediction(record_id=record_id, predicted_delay=predicted_delay, model_version=model_version)
     session.add(prediction)
-    session.commit()
+    apply_deltas(session, prediction_deltas(session, [(record_id, predicted_delay)]))
+    with stage("db_commit"):
+        session.commit()
     session.refresh(prediction)
+    metrics.prediction_inserted(model_version)
     return prediction
 
 
-def list_predictions_with_records(session: Session, limit: int = 20, offset: int = 0) -> List[tuple[Prediction, Record]]:
-    """List predictions with their associated records."""
-    statement = (
-        select(Prediction, Record)
-        .join(Record, Prediction.record_id == Record.id)
-        .order_by(Prediction.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-    )
-    results = session.exec(statement).all()
-    return [(pred, rec) for pred, rec in results]
-
-
-
-
+def create_predictions_bulk(
+    session: Session, predictions: Sequence[tuple[int, float]], model_version: str
+) -> int:
+    """Store many ``(record_id, predicted_delay)`` predictions in one commit."""
+    if not predictions:
+        return 0
+    metrics = get_metrics_store(session)
+    created_at = datetime.utcnow()
+    rows = [
+        {
+            "record_id": record_id,
+            "predicted_delay": predicted_delay,
+            "model_version": model_version,
+            "created_at": created_at,
+        }
+        for record_id, predicted_delay in predictions
+    ]
+    session.execute(insert(Prediction), rows)
+    apply_deltas(session, prediction_deltas(session, predictions))
+    session.commit()
+    metrics.prediction_inserted(model_version, len(rows))
+    return len(rows)
+
+
+def list_predictions_with_records(
+    session: Session, limit: int = 20, offset: int = 0, before: Optional[Cursor] = None
+) -> List[tuple[Prediction, Record]]:
+    """List predictions newest first with their records, by offset or before a keyset cursor.
+
+    With an archive, the newest ``offset + limit`` hot rows are merged with
+    archived predictions; partitions older than a full hot page are not read.
+    """
+    archive = get_archive(session)
+    statement = select(Prediction, Record).order_by(Prediction.created_at.desc(), Prediction.id.desc())
+    if before is not None:
+        statement = statement.where(tuple_(Prediction.created_at, Prediction.id) < tuple_(*before))
+        offset = 0
+    if not archive.partitions():
+        statement = statement.join(Record, Prediction.record_id == Record.id).offset(offset)
+        return [(pred, rec) for pred, rec in session.exec(statement.limit(limit)).all()]
+
+    wanted = offset + limit
+    # Outer join: predictions made after compaction may point at archived records.
+    statement = statement.join(Record, Prediction.record_id == Record.id, isouter=True)
+    results = list(session.exec(statement.limit(wanted)).all())
+    floor = (results[-1][0].created_at, results[-1][0].id) if len(results) == wanted else None
+    orphans = archive.get_records(pred.record_id for pred, rec in results if rec is None)
+    merged = [(pred, rec or orphans.get(pred.record_id)) for pred, rec in results]
+    merged += archive.list_predictions(wanted, before=before, floor=floor)
+    merged = [(pred, rec) for pred, rec in merged if rec is not None]
+    merged.sort(key=lambda row: (row[0].created_at, row[0].id), reverse=True)
+    return merged[offset:wanted]
@@ -0,0 +1,187 @@
+"""Layered timestamp parsing: compiled fast paths in front of dateutil.
+
+Tiers, cheapest first: a bounded LRU of recently seen raw strings, time-only
+patterns, ``datetime.fromisoformat`` for ISO-like strings, the strptime format
+that last succeeded for the same source, the remaining known strptime formats,
+and finally ``dateutil.parser.parse``. Every fast tier only accepts strings it
+parses exactly as dateutil would.
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, time
+from typing import Dict, Optional, Pattern, Tuple, Union
+
+from dateutil import parser
+
+from .config import DATETIME_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+_TIME_COLON = re.compile(r"^(?P<hour>\d{1,2}):(?P<minute>\d{2})$")
+_TIME_COMPACT = re.compile(r"^(?P<hour>\d{1,2})(?P<minute>\d{2})$")
+_TIME_AMPM = re.compile(r"^(?P<hour>\d{1,2})[.:](?P<minute>\d{2})(?P<ampm>[AaPp][Mm])$")
+
+# Strings fromisoformat accepts on every supported Python version.
+_ISO_LIKE = re.compile(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}(?:[ T][0-9]{2}:[0-9]{2}(?::[0-9]{2}(?:\.[0-9]{3}(?:[0-9]{3})?)?)?)?$")
+
+# Month-first only: dateutil's default (dayfirst=False) reading of ambiguous dates.
+KNOWN_FORMATS: Tuple[Tuple[str, Pattern[str]], ...] = tuple(
+    (fmt, re.compile(pattern))
+    for fmt, pattern in (
+        ("%Y/%m/%d %H:%M:%S", r"^[0-9]{4}/[0-9]{1,2}/[0-9]{1,2} [0-9]{1,2}:[0-9]{2}:[0-9]{2}$"),
+        ("%Y/%m/%d %H:%M", r"^[0-9]{4}/[0-9]{1,2}/[0-9]{1,2} [0-9]{1,2}:[0-9]{2}$"),
+        ("%m/%d/%Y %H:%M:%S", r"^[0-9]{1,2}/[0-9]{1,2}/[0-9]{4} [0-9]{1,2}:[0-9]{2}:[0-9]{2}$"),
+        ("%m/%d/%Y %H:%M", r"^[0-9]{1,2}/[0-9]{1,2}/[0-9]{4} [0-9]{1,2}:[0-9]{2}$"),
+        ("%m/%d/%Y %I:%M %p", r"^[0-9]{1,2}/[0-9]{1,2}/[0-9]{4} [0-9]{1,2}:[0-9]{2} [AaPp][Mm]$"),
+        ("%Y-%m-%d %I:%M %p", r"^[0-9]{4}-[0-9]{1,2}-[0-9]{1,2} [0-9]{1,2}:[0-9]{2} [AaPp][Mm]$"),
+    )
+)
+
+TIERS = ("cache", "time_only", "iso", "learned_format", "known_format", "dateutil", "failed")
+
+# Cached parse results: absolute datetimes, or times to combine with today's date.
+_Parsed = Union[datetime, time, None]
+
+
+def parse_time_only(value: str) -> Optional[time]:
+    """Parse time-only strings (``08:30``, ``0830``, ``8.45AM``) into a time."""
+    match = _TIME_COLON.match(value) or _TIME_COMPACT.match(value)
+    if match:
+        return time(int(match.group("hour")), int(match.group("minute")))
+    match = _TIME_AMPM.match(value)
+    if match:
+        hour = int(match.group("hour"))
+        minute = int(match.group("minute"))
+        ampm = match.group("ampm").lower()
+        if ampm == "pm" and hour != 12:
+            hour += 12
+        if ampm == "am" and hour == 12:
+            hour = 0
+        return time(hour, minute)
+    return None
+
+
+def parse_iso(value: str) -> Optional[datetime]:
+    """The ``iso`` tier on its own: ``fromisoformat`` for ISO-like strings, None for anything else."""
+    if not _ISO_LIKE.match(value):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+class TimestampParser:
+    """Parses timestamp strings through progressively slower tiers.
+
+    Tier counters are updated without locking and are approximate under
+    heavy concurrency.
+    """
+
+    def __init__(self, cache_size: int = 4096) -> None:
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, _Parsed]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._learned: Dict[str, int] = {}
+        self.hits: Dict[str, int] = {tier: 0 for tier in TIERS}
+
+    def parse(self, value: Optional[str], source: Optional[str] = None) -> Optional[datetime]:
+        """Parse ``value`` into a timezone-naive datetime, or None if unparseable."""
+        if value is None:
+            return None
+        value = value.strip()
+        if not value:
+            return None
+
+        with self._cache_lock:
+            cached = self._cache.get(value, self)
+            if cached is not self:
+                self._cache.move_to_end(value)
+        if cached is not self:
+            self.hits["cache"] += 1
+            return self._resolve(cached)
+
+        parsed = self._parse_uncached(value, source)
+        with self._cache_lock:
+            self._cache[value] = parsed
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return self._resolve(parsed)
+
+    def stats(self) -> Dict[str, object]:
+        """Return per-tier hit counts and rates."""
+        hits = dict(self.hits)
+        total = sum(hits.values())
+        return {
+            "parsed": total,
+            "hits": hits,
+            "hit_rates": {tier: (count / total if total else 0.0) for tier, count in hits.items()},
+            "cache_entries": len(self._cache),
+            "cache_size": self.cache_size,
+        }
+
+    def clear(self) -> None:
+        """Drop cached strings, learned formats and counters."""
+        with self._cache_lock:
+            self._cache.clear()
+        self._learned.clear()
+        self.hits = {tier: 0 for tier in TIERS}
+
+    @staticmethod
+    def _resolve(parsed: _Parsed) -> Optional[datetime]:
+        if isinstance(parsed, time):
+            return datetime.combine(datetime.utcnow().date(), parsed)
+        return parsed
+
+    def _parse_uncached(self, value: str, source: Optional[str]) -> _Parsed:
+        time_only = parse_time_only(value)
+        if time_only:
+            self.hits["time_only"] += 1
+            return time_only
+
+        parsed = parse_iso(value)
+        if parsed is not None:
+            self.hits["iso"] += 1
+            return parsed
+
+        learned = self._learned.get(source) if source is not None else None
+        if learned is not None:
+            parsed = self._try_format(learned, value)
+            if parsed is not None:
+                self.hits["learned_format"] += 1
+                return parsed
+        for idx in range(len(KNOWN_FORMATS)):
+            if idx == learned:
+                continue
+            parsed = self._try_format(idx, value)
+            if parsed is not None:
+                if source is not None:
+                    self._learned[source] = idx
+                self.hits["known_format"] += 1
+                return parsed
+
+        try:
+            parsed = parser.parse(value).replace(tzinfo=None)
+            self.hits["dateutil"] += 1
+            return parsed
+        except (ValueError, TypeError):
+            self.hits["failed"] += 1
+            logger.warning("Failed to parse datetime string '%s'", value)
+            return None
+
+    @staticmethod
+    def _try_format(idx: int, value: str) -> Optional[datetime]:
+        fmt, pattern = KNOWN_FORMATS[idx]
+        if not pattern.match(value):
+            return None
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            return None
+
+
+# Shared parser instance
+timestamp_parser = TimestampParser(cache_size=DATETIME_CACHE_SIZE)
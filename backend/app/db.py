@@ -1,23 +1,148 @@
 """Database setup and utilities."""
 
 from collections.abc import Generator
+from typing import Dict, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.schema import CreateTable
 from sqlmodel import Session, SQLModel, create_engine
 
-from .config import DATABASE_URL
+from .config import (
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_SIZE,
+    DB_STORAGE_PROFILE,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_KIB,
+    SQLITE_MMAP_SIZE,
+    SQLITE_SYNCHRONOUS,
+)
+
+STORAGE_PROFILES = ("default", "tuned")
+SQLITE_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def sqlite_pragmas() -> Dict[str, object]:
+    """PRAGMAs the "tuned" profile sets on every new SQLite connection.
+
+    WAL lets readers proceed while a write is in progress. ``synchronous``
+    comes from ``SQLITE_SYNCHRONOUS`` and stays at SQLite's FULL by default;
+    with NORMAL a commit no longer waits for an fsync (a power loss can drop
+    the last transactions but never corrupts the database).
+    """
+    if SQLITE_SYNCHRONOUS not in SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(
+            f"Unknown SQLITE_SYNCHRONOUS {SQLITE_SYNCHRONOUS!r}; expected one of {', '.join(SQLITE_SYNCHRONOUS_MODES)}"
+        )
+    return {
+        "journal_mode": "WAL",
+        "synchronous": SQLITE_SYNCHRONOUS,
+        "mmap_size": SQLITE_MMAP_SIZE,
+        "cache_size": -SQLITE_CACHE_SIZE_KIB,
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    }
+
+
+def _pragma_setter(pragmas: Dict[str, object]):
+    def set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return set_pragmas
+
+
+def build_engine(url: str = DATABASE_URL, profile: str = DB_STORAGE_PROFILE) -> Engine:
+    """Create an engine for ``url`` configured according to a storage profile.
+
+    "default" keeps the driver defaults. "tuned" applies :func:`sqlite_pragmas`
+    to file-backed SQLite databases and gives every backend a connection pool
+    sized for the DB thread pool (SQLite otherwise opens a new connection per
+    session). Sessions are also held by sync endpoints on anyio's thread pool
+    and by streaming responses, so SQLite's pool never makes a session wait:
+    connections beyond ``DB_POOL_SIZE`` are opened on demand and closed when
+    returned. In-memory SQLite databases are left untouched.
+    """
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile {profile!r}; expected one of {', '.join(STORAGE_PROFILES)}")
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        if profile == "default":
+            return create_engine(url, echo=False)
+        return create_engine(
+            url, echo=False, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_pre_ping=True
+        )
 
-engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False})
+    connect_args = {"check_same_thread": False}
+    if profile == "default" or parsed.database in (None, "", ":memory:"):
+        return create_engine(url, echo=False, connect_args=connect_args)
+    pragmas = sqlite_pragmas()
+    connect_args["timeout"] = SQLITE_BUSY_TIMEOUT_MS / 1000
+    engine = create_engine(
+        url,
+        echo=False,
+        connect_args=connect_args,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=-1,
+    )
+    event.listen(engine, "connect", _pragma_setter(pragmas))
+    return engine
+
+
+engine = build_engine()
 
 
 def create_db_and_tables() -> None:
-    """Create database tables."""
+    """Create database tables and any indexes missing from existing tables."""
     SQLModel.metadata.create_all(engine)
+    ensure_autoincrement()
+    ensure_indexes()
 
 
-def get_session() -> Generator[Session, None, None]:
-    """FastAPI dependency that yields a database session."""
-    with Session(engine) as session:
-        yield session
+def ensure_autoincrement(bind: Optional[Engine] = None) -> None:
+    """Migration step: rebuild SQLite tables declared ``sqlite_autoincrement`` that were created without it.
 
+    Without AUTOINCREMENT SQLite reuses the ids of deleted rows, which
+    collide with archived ones. The copy, drop and rename share one
+    transaction; indexes are recreated by :func:`ensure_indexes`.
+    """
+    bind = bind or engine
+    if bind.dialect.name != "sqlite":
+        return
+    with bind.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not table.dialect_options["sqlite"]["autoincrement"]:
+                continue
+            sql = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+            ).scalar()
+            if sql is None or "AUTOINCREMENT" in sql.upper():
+                continue
+            rebuilt = f"{table.name}__autoincrement"
+            create = str(CreateTable(table).compile(dialect=bind.dialect))
+            columns = ", ".join(column.name for column in table.columns)
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {rebuilt}")
+            conn.exec_driver_sql(create.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {rebuilt} ", 1))
+            conn.exec_driver_sql(f"INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {table.name}")
+            conn.exec_driver_sql(f"DROP TABLE {table.name}")
+            conn.exec_driver_sql(f"ALTER TABLE {rebuilt} RENAME TO {table.name}")
 
 
+def ensure_indexes(bind: Optional[Engine] = None) -> None:
+    """Migration step: add declared indexes to tables created before they existed."""
+    bind = bind or engine
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
 
+
+def get_session() -> Generator[Session, None, None]:
+    """FastAPI dependency that yields a database session."""
+    with Session(engine) as session:
+        yield session
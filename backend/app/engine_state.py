@@ -0,0 +1,55 @@
+"""In-process state kept per database engine and seeded from it on first use."""
+
+import threading
+import weakref
+from typing import Callable, Generic, Optional, TypeVar
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+T = TypeVar("T")
+
+
+def engine_for(session: Session) -> Engine:
+    """Return the engine a session is bound to."""
+    bind = session.get_bind()
+    return getattr(bind, "engine", bind)
+
+
+class EngineStateRegistry(Generic[T]):
+    """Holds one state object per engine, built by ``factory(session)`` on first use.
+
+    Keying by engine keeps state for different databases (e.g. per-test SQLite
+    files) apart without any explicit reset.
+    """
+
+    def __init__(self, factory: Callable[[Session], T]) -> None:
+        self._factory = factory
+        self._states: "weakref.WeakKeyDictionary[Engine, T]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, session: Session) -> T:
+        """Return the state for the session's engine, building it if needed."""
+        engine = engine_for(session)
+        with self._lock:
+            state = self._states.get(engine)
+            if state is None:
+                state = self._factory(session)
+                self._states[engine] = state
+        return state
+
+    def peek(self, session: Session) -> Optional[T]:
+        """Return the state for the session's engine only if it already exists."""
+        return self._states.get(engine_for(session))
+
+    def peek_engine(self, engine: Engine) -> Optional[T]:
+        """Return the state for ``engine`` only if it already exists."""
+        return self._states.get(engine)
+
+    def rebuild(self, engine: Engine) -> T:
+        """Build fresh state for ``engine`` (e.g. at startup) and register it."""
+        with Session(engine) as session:
+            state = self._factory(session)
+        with self._lock:
+            self._states[engine] = state
+        return state
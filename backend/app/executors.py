@@ -0,0 +1,42 @@
+"""Bounded thread pools that keep blocking work off the event loop."""
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+from .config import DB_THREADPOOL_SIZE, INFERENCE_THREADPOOL_SIZE
+from .profiling import profile_in_thread
+
+T = TypeVar("T")
+
+# Synchronous SQLAlchemy sessions and cleaning (which may query the DB).
+db_executor = ThreadPoolExecutor(max_workers=DB_THREADPOOL_SIZE, thread_name_prefix="db")
+# CPU-bound model inference, kept separate so slow queries cannot starve it.
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_THREADPOOL_SIZE, thread_name_prefix="inference")
+
+
+async def _run_in(executor: ThreadPoolExecutor, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # Like asyncio.to_thread, carry the caller's context variables (e.g. the
+    # per-request query counter) into the worker thread, and profile the call
+    # there if the request is being profiled.
+    context = contextvars.copy_context()
+    call = profile_in_thread(partial(func, *args, **kwargs))
+    return await asyncio.get_running_loop().run_in_executor(executor, context.run, call)
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking database work on the DB pool."""
+    return await _run_in(db_executor, func, *args, **kwargs)
+
+
+async def run_inference(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run model inference on the inference pool."""
+    return await _run_in(inference_executor, func, *args, **kwargs)
+
+
+def shutdown_executors() -> None:
+    """Wait for queued work and release the pools."""
+    db_executor.shutdown(wait=True)
+    inference_executor.shutdown(wait=True)
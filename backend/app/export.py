@@ -0,0 +1,277 @@
+"""Streaming export of records joined with their predictions.
+
+Rows are read through a server-side cursor in batches of ``batch_size`` and
+encoded batch by batch, so memory stays flat regardless of the result size.
+Parquet and Arrow IPC need the optional ``pyarrow`` package (see
+``requirements-optional.txt``); gzip-compressed CSV is always available and its
+columns are accepted by ``train_model.py --csv``.
+"""
+
+import csv
+import io
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from .archive import get_archive
+from .models import Prediction, Record
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+RECORD_COLUMNS = (
+    "record_id",
+    "route_id",
+    "scheduled_time",
+    "actual_time",
+    "weather",
+    "passenger_count",
+    "latitude",
+    "longitude",
+    "cleaned",
+    "delay_minutes",
+    "created_at",
+)
+PREDICTION_COLUMNS = ("prediction_id", "predicted_delay", "model_version", "predicted_at")
+
+Row = Tuple[object, ...]
+Batch = List[Row]
+
+
+class ExportFormatError(ValueError):
+    """Raised for an unknown export format or one whose dependency is missing."""
+
+
+@dataclass(frozen=True)
+class ExportQuery:
+    """Filters of an export: ``scheduled_time`` in ``[start, end)`` and an optional route."""
+
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    route_id: Optional[str] = None
+    include_predictions: bool = True
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        return RECORD_COLUMNS + (PREDICTION_COLUMNS if self.include_predictions else ())
+
+
+def _record_row(record: Record) -> Row:
+    return (
+        record.id,
+        record.route_id,
+        record.scheduled_time,
+        record.actual_time,
+        record.weather,
+        record.passenger_count,
+        record.latitude,
+        record.longitude,
+        record.cleaned,
+        record.delay_minutes,
+        record.created_at,
+    )
+
+
+def _archived_rows(session: Session, query: ExportQuery, batch_size: int) -> Iterator[Row]:
+    # Partitions are decoded ``batch_size`` records at a time, outside the partition cache.
+    batches = get_archive(session).iter_record_batches(
+        query.start,
+        query.end,
+        batch_size,
+        route_id=query.route_id,
+        with_predictions=query.include_predictions,
+        cache=False,
+    )
+    for batch in batches:
+        for record, predictions in batch:
+            row = _record_row(record)
+            if not query.include_predictions:
+                yield row
+            elif not predictions:
+                yield row + (None,) * len(PREDICTION_COLUMNS)
+            else:
+                for prediction in sorted(predictions, key=lambda p: p.id):
+                    yield row + (
+                        prediction.id, prediction.predicted_delay, prediction.model_version, prediction.created_at
+                    )
+
+
+def iter_batches(session: Session, query: ExportQuery, batch_size: int = 10_000) -> Iterator[Batch]:
+    """Yield export rows in batches of at most ``batch_size``: archived months first, then the hot tables."""
+    batch: Batch = []
+    for row in _archived_rows(session, query, batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+    columns = [
+        Record.id,
+        Record.route_id,
+        Record.scheduled_time,
+        Record.actual_time,
+        Record.weather,
+        Record.passenger_count,
+        Record.latitude,
+        Record.longitude,
+        Record.cleaned,
+        Record.delay_minutes,
+        Record.created_at,
+    ]
+    if query.include_predictions:
+        columns += [Prediction.id, Prediction.predicted_delay, Prediction.model_version, Prediction.created_at]
+    statement = select(*columns)
+    if query.include_predictions:
+        statement = statement.join(Prediction, Prediction.record_id == Record.id, isouter=True)
+        statement = statement.order_by(Record.id, Prediction.id)
+    else:
+        statement = statement.order_by(Record.id)
+    if query.start is not None:
+        statement = statement.where(Record.scheduled_time >= query.start)
+    if query.end is not None:
+        statement = statement.where(Record.scheduled_time < query.end)
+    if query.route_id is not None:
+        statement = statement.where(Record.route_id == query.route_id)
+    result = session.exec(statement.execution_options(stream_results=True, yield_per=batch_size))
+    for partition in result.partitions(batch_size):
+        yield [tuple(row) for row in partition]
+
+
+def _csv_gz(batches: Iterable[Batch], columns: Tuple[str, ...]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        data = compressor.compress(buffer.getvalue().encode())
+        buffer.seek(0)
+        buffer.truncate()
+        if data:
+            yield data
+    yield compressor.compress(buffer.getvalue().encode()) + compressor.flush()
+
+
+class _DrainingSink:
+    """Write-only file object handed to pyarrow; its bytes are drained after every batch."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(columns: Tuple[str, ...]):
+    timestamp = pa.timestamp("us")
+    types = {
+        "record_id": pa.int64(),
+        "route_id": pa.string(),
+        "scheduled_time": timestamp,
+        "actual_time": timestamp,
+        "weather": pa.string(),
+        "passenger_count": pa.int64(),
+        "latitude": pa.float64(),
+        "longitude": pa.float64(),
+        "cleaned": pa.bool_(),
+        "delay_minutes": pa.float64(),
+        "created_at": timestamp,
+        "prediction_id": pa.int64(),
+        "predicted_delay": pa.float64(),
+        "model_version": pa.string(),
+        "predicted_at": timestamp,
+    }
+    return pa.schema([(name, types[name]) for name in columns])
+
+
+def _arrow(batches: Iterable[Batch], columns: Tuple[str, ...], open_writer) -> Iterator[bytes]:
+    schema = _arrow_schema(columns)
+    sink = _DrainingSink()
+    writer = open_writer(pa.PythonFile(sink, mode="w"), schema)
+    for batch in batches:
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def _parquet(batches: Iterable[Batch], columns: Tuple[str, ...]) -> Iterator[bytes]:
+    # One row group per batch.
+    return _arrow(batches, columns, lambda sink, schema: pq.ParquetWriter(sink, schema, compression="snappy"))
+
+
+def _arrow_ipc(batches: Iterable[Batch], columns: Tuple[str, ...]) -> Iterator[bytes]:
+    return _arrow(batches, columns, pa.ipc.new_stream)
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    """An output encoding: file extension, media type and batch encoder."""
+
+    extension: str
+    media_type: str
+    encode: Callable[[Iterable[Batch], Tuple[str, ...]], Iterator[bytes]]
+    needs_pyarrow: bool = False
+
+
+FORMATS: Dict[str, ExportFormat] = {
+    "parquet": ExportFormat("parquet", "application/vnd.apache.parquet", _parquet, needs_pyarrow=True),
+    "arrow": ExportFormat("arrows", "application/vnd.apache.arrow.stream", _arrow_ipc, needs_pyarrow=True),
+    "csv.gz": ExportFormat("csv.gz", "application/gzip", _csv_gz),
+}
+
+
+def available_formats() -> List[str]:
+    """Return the formats usable in this environment."""
+    return [name for name, fmt in FORMATS.items() if pa is not None or not fmt.needs_pyarrow]
+
+
+def default_format() -> str:
+    """Parquet when pyarrow is installed, gzip CSV otherwise."""
+    return available_formats()[0]
+
+
+def get_format(name: str) -> ExportFormat:
+    """Look up an export format, checking its optional dependency."""
+    fmt = FORMATS.get(name)
+    if fmt is None:
+        raise ExportFormatError(f"Unknown export format {name!r}; expected one of {', '.join(FORMATS)}")
+    if fmt.needs_pyarrow and pa is None:
+        raise ExportFormatError(f"Export format {name!r} requires pyarrow; available: {', '.join(available_formats())}")
+    return fmt
+
+
+def stream_export(session: Session, query: ExportQuery, fmt: ExportFormat, batch_size: int = 10_000) -> Iterator[bytes]:
+    """Yield the encoded export chunk by chunk."""
+    yield from fmt.encode(iter_batches(session, query, batch_size), query.columns)
@@ -1,11 +1,16 @@
 """Feature engineering utilities."""
 
+import logging
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Sequence
 
+import numpy as np
 import pandas as pd
 
 from .cleaning import _normalize_route, normalize_weather
+from .instrumentation import timed
+
+logger = logging.getLogger(__name__)
 
 
 def _time_of_day(hour: int) -> str:
@@ -42,8 +47,6 @@ def extract_route_number(route_id: str) -> int:
         MIN_TRAINED_ROUTE = 1
         
         if route_num > MAX_TRAINED_ROUTE:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.warning(
                 f"Route number {route_num} exceeds training range (1-4). "
                 f"Clamping to {MAX_TRAINED_ROUTE} to prevent out-of-distribution prediction."
@@ -72,76 +75,92 @@ def _get_route_frequency(route_id: str) -> int:
         return 30
 
 
-def create_features(cleaned_record: Dict[str, object]) -> pd.DataFrame:
-    """Create a single-row DataFrame of model features from a cleaned record.
-    
-    Feature order must match exactly what the model was trained with:
-    1. hour, 2. day_of_week, 3. is_weekend, 4. weather_severity, 5. route_frequency,
-    6. passenger_count, 7. latitude, 8. longitude, 9. route_num,
-    10. time_of_day_afternoon, 11. time_of_day_evening, 12. time_of_day_morning, 13. time_of_day_night
+# Model input schema: the exact column order the model was trained with
+# (base features followed by the pd.get_dummies() time_of_day columns).
+FEATURE_COLUMNS = (
+    "hour", "day_of_week", "is_weekend", "weather_severity", "route_frequency",
+    "passenger_count", "latitude", "longitude", "route_num",
+    "time_of_day_afternoon", "time_of_day_evening", "time_of_day_morning", "time_of_day_night",
+)
+N_FEATURES = len(FEATURE_COLUMNS)
+FEATURE_INDEX = {name: idx for idx, name in enumerate(FEATURE_COLUMNS)}
+
+_TIME_OF_DAY_OFFSET = FEATURE_INDEX["time_of_day_afternoon"]
+_TIME_OF_DAY_SLOTS = {"afternoon": 0, "evening": 1, "morning": 2, "night": 3}
+
+# Use median GPS coordinates from training data if missing
+# Training data has no missing coordinates, so 0,0 would be out-of-distribution
+TRAINING_LAT_MEDIAN = 24.52131986
+TRAINING_LON_MEDIAN = 32.53798372
+
+
+def _fill_feature_row(row: np.ndarray, cleaned_record: Dict[str, object]) -> bool:
+    """Write the features of one cleaned record into ``row`` in FEATURE_COLUMNS order.
+
+    Returns True when GPS coordinates were missing and replaced by training medians.
     """
     scheduled: datetime = cleaned_record.get("scheduled_time")
     hour = scheduled.hour if scheduled else 0
     day_of_week = scheduled.weekday() if scheduled else 0
-    is_weekend = 1 if day_of_week >= 5 else 0
-    time_of_day_str = _time_of_day(hour)
-    
+
     route_id = str(cleaned_record.get("route_id", ""))
-    route_num = extract_route_number(route_id)
-    route_frequency = _get_route_frequency(route_id)
 
-    # Use median GPS coordinates from training data if missing
-    # Training data has no missing coordinates, so 0,0 would be out-of-distribution
-    TRAINING_LAT_MEDIAN = 24.52131986
-    TRAINING_LON_MEDIAN = 32.53798372
-    
     latitude = cleaned_record.get("latitude")
     longitude = cleaned_record.get("longitude")
-    
+    gps_missing = False
     # If coordinates are None or invalid (0,0), use training median
     if latitude is None or (latitude == 0 and longitude == 0):
-        import logging
-        logger = logging.getLogger(__name__)
-        if latitude is None or longitude is None:
-            logger.warning(
-                "Missing GPS coordinates. Using training data median "
-                f"({TRAINING_LAT_MEDIAN}, {TRAINING_LON_MEDIAN}) to prevent out-of-distribution prediction."
-            )
+        gps_missing = latitude is None or longitude is None
         latitude = TRAINING_LAT_MEDIAN if latitude is None or latitude == 0 else latitude
         longitude = TRAINING_LON_MEDIAN if longitude is None or longitude == 0 else longitude
 
-    # Create features in the EXACT order the model expects
-    # This order matches what pd.get_dummies() produces when combined with base features
-    features_dict = {
-        "hour": hour,
-        "day_of_week": day_of_week,
-        "is_weekend": is_weekend,
-        "weather_severity": _weather_severity(str(cleaned_record.get("weather", "unknown"))),
-        "route_frequency": route_frequency,
-        "passenger_count": float(cleaned_record.get("passenger_count") or 0),
-        "latitude": float(latitude),
-        "longitude": float(longitude),
-        "route_num": route_num,
-        "time_of_day_afternoon": 1 if time_of_day_str == "afternoon" else 0,
-        "time_of_day_evening": 1 if time_of_day_str == "evening" else 0,
-        "time_of_day_morning": 1 if time_of_day_str == "morning" else 0,
-        "time_of_day_night": 1 if time_of_day_str == "night" else 0,
-    }
-
-    # Create DataFrame with features in the exact order (don't sort!)
-    # The order here must match the training script's output
-    df = pd.DataFrame([features_dict])
-    
-    # Ensure columns are in the correct order (matching model.feature_names_in_)
-    expected_columns = [
-        "hour", "day_of_week", "is_weekend", "weather_severity", "route_frequency",
-        "passenger_count", "latitude", "longitude", "route_num",
-        "time_of_day_afternoon", "time_of_day_evening", "time_of_day_morning", "time_of_day_night"
-    ]
-    df = df[expected_columns]
-    
-    return df
-
+    row[0] = hour
+    row[1] = day_of_week
+    row[2] = 1 if day_of_week >= 5 else 0
+    row[3] = _weather_severity(str(cleaned_record.get("weather", "unknown")))
+    row[4] = _get_route_frequency(route_id)
+    row[5] = float(cleaned_record.get("passenger_count") or 0)
+    row[6] = float(latitude)
+    row[7] = float(longitude)
+    row[8] = extract_route_number(route_id)
+    row[_TIME_OF_DAY_OFFSET:] = 0
+    row[_TIME_OF_DAY_OFFSET + _TIME_OF_DAY_SLOTS[_time_of_day(hour)]] = 1
+    return gps_missing
+
+
+def _warn_missing_gps(count: int) -> None:
+    logger.warning(
+        "Missing GPS coordinates for %s record(s). Using training data median "
+        "(%s, %s) to prevent out-of-distribution prediction.",
+        count, TRAINING_LAT_MEDIAN, TRAINING_LON_MEDIAN,
+    )
+
+
+@timed("create_feature_matrix")
+def create_feature_matrix(cleaned_records: Sequence[Dict[str, object]]) -> np.ndarray:
+    """Build a contiguous float64 feature matrix (N x N_FEATURES) from cleaned records."""
+    matrix = np.empty((len(cleaned_records), N_FEATURES), dtype=np.float64)
+    missing_gps = 0
+    for row, cleaned_record in zip(matrix, cleaned_records):
+        missing_gps += _fill_feature_row(row, cleaned_record)
+    if missing_gps:
+        _warn_missing_gps(missing_gps)
+    return matrix
+
+
+@timed("create_features")
+def create_feature_vector(cleaned_record: Dict[str, object]) -> np.ndarray:
+    """Build a single-row (1 x N_FEATURES) feature matrix for one cleaned record."""
+    buffer = np.empty((1, N_FEATURES), dtype=np.float64)
+    if _fill_feature_row(buffer[0], cleaned_record):
+        _warn_missing_gps(1)
+    return buffer
 
 
+def create_features(cleaned_record: Dict[str, object]) -> pd.DataFrame:
+    """Create a single-row DataFrame of model features from a cleaned record.
 
+    Kept for tooling that wants named columns; the serving path uses
+    ``create_feature_vector`` / ``create_feature_matrix`` directly.
+    """
+    return pd.DataFrame(create_feature_vector(cleaned_record), columns=list(FEATURE_COLUMNS))
@@ -0,0 +1,333 @@
+"""Per-stage latency histograms, request metrics and DB query counts in Prometheus text format.
+
+Stages are timed with the ``timed`` decorator or the ``stage`` context
+manager. Both resolve their histogram once, so an observation costs two
+``perf_counter`` calls and a short locked update. When instrumentation is
+disabled, ``timed`` returns the function unchanged, ``stage`` returns a shared
+no-op context manager, and no request middleware or query hook is installed.
+"""
+
+import contextlib
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import INSTRUMENTATION_ENABLED
+
+F = TypeVar("F", bound=Callable)
+
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+STAGE_SECONDS = "busdelay_stage_duration_seconds"
+STAGE_ERRORS = "busdelay_stage_errors_total"
+REQUEST_SECONDS = "busdelay_http_request_duration_seconds"
+REQUESTS = "busdelay_http_requests_total"
+REQUEST_QUERIES = "busdelay_http_request_db_queries"
+DB_QUERIES = "busdelay_db_queries_total"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a running sum and count."""
+
+    __slots__ = ("buckets", "_counts", "_sum", "_lock")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """Return cumulative bucket counts (last is +Inf), the sum and the count."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, running
+
+
+class Counter:
+    """Monotonic counter."""
+
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self) -> None:
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Instrumentation:
+    """Registry of labelled histograms and counters rendered as Prometheus text."""
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, Counter]] = {}
+        self.describe(STAGE_SECONDS, "histogram", "Time spent in each request-pipeline stage")
+        self.describe(STAGE_ERRORS, "counter", "Exceptions raised by each request-pipeline stage")
+        self.describe(REQUEST_SECONDS, "histogram", "HTTP request latency by route")
+        self.describe(REQUESTS, "counter", "HTTP requests by route, method and status")
+        self.describe(REQUEST_QUERIES, "histogram", "Database queries issued per HTTP request")
+        self.describe(DB_QUERIES, "counter", "Database queries issued by this process")
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        """Register the TYPE and HELP lines of a metric family."""
+        self._help[name] = (kind, help_text)
+
+    def histogram(
+        self, name: str, labels: Optional[Dict[str, str]] = None, buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        """Return the histogram for ``name`` and ``labels``, creating it on first use."""
+        key = _label_key(labels)
+        family = self._histograms.get(name)
+        histogram = family.get(key) if family is not None else None
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, {}).setdefault(key, Histogram(buckets))
+        return histogram
+
+    def counter(self, name: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+        """Return the counter for ``name`` and ``labels``, creating it on first use."""
+        key = _label_key(labels)
+        family = self._counters.get(name)
+        counter = family.get(key) if family is not None else None
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(name, {}).setdefault(key, Counter())
+        return counter
+
+    def render(self, gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+        """Render all series, plus ``gauges`` given as ``name -> (help, value)``, in text format 0.0.4."""
+        with self._lock:
+            histograms = {name: dict(series) for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+        lines: List[str] = []
+
+        def header(name: str, default_kind: str) -> None:
+            kind, help_text = self._help.get(name, (default_kind, name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name in sorted(histograms):
+            header(name, "histogram")
+            for labels, histogram in sorted(histograms[name].items()):
+                cumulative, total, count = histogram.snapshot()
+                bounds = [_format_value(bound) for bound in histogram.buckets] + ["+Inf"]
+                for bound, value in zip(bounds, cumulative):
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {value}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for name in sorted(counters):
+            header(name, "counter")
+            for labels, counter in sorted(counters[name].items()):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(counter.value)}")
+        for name, (help_text, value) in sorted((gauges or {}).items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared registry; enabled by INSTRUMENTATION_ENABLED at import time
+instrumentation = Instrumentation(enabled=INSTRUMENTATION_ENABLED)
+
+
+def timed(name: str, registry: Optional[Instrumentation] = None) -> Callable[[F], F]:
+    """Decorator recording each call of a function (sync or async) as stage ``name``.
+
+    A disabled registry returns the function itself, so there is no cost at all.
+    """
+
+    def decorate(func: F) -> F:
+        reg = registry or instrumentation
+        if not reg.enabled:
+            return func
+        histogram = reg.histogram(STAGE_SECONDS, {"stage": name})
+        errors = reg.counter(STAGE_ERRORS, {"stage": name})
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    errors.inc()
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - started)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "errors", "started")
+
+    def __init__(self, histogram: Histogram, errors: Counter) -> None:
+        self.histogram = histogram
+        self.errors = errors
+
+    def __enter__(self) -> "_StageTimer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.histogram.observe(time.perf_counter() - self.started)
+        if exc_type is not None:
+            self.errors.inc()
+
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def stage(name: str, registry: Optional[Instrumentation] = None):
+    """Context manager timing a block as stage ``name``; a shared no-op when disabled."""
+    reg = registry or instrumentation
+    if not reg.enabled:
+        return _NULL_STAGE
+    return _StageTimer(reg.histogram(STAGE_SECONDS, {"stage": name}), reg.counter(STAGE_ERRORS, {"stage": name}))
+
+
+# Query count of the HTTP request being served, if any. Holds a one-item
+# list so that copies of the context (thread pools) update the same count.
+_request_queries: "contextvars.ContextVar[Optional[List[int]]]" = contextvars.ContextVar(
+    "request_queries", default=None
+)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+    _query_total.inc()
+
+
+_query_total = instrumentation.counter(DB_QUERIES)
+_hook_lock = threading.Lock()
+_hook_installed = False
+
+
+def install_query_counter() -> None:
+    """Count statements executed by every engine in this process."""
+    global _hook_installed
+    with _hook_lock:
+        if not _hook_installed:
+            event.listen(Engine, "before_cursor_execute", _count_query)
+            _hook_installed = True
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording latency, status and DB query count per route template."""
+
+    def __init__(self, app, registry: Optional[Instrumentation] = None) -> None:
+        self.app = app
+        self.registry = registry or instrumentation
+        self._routes: Dict[Callable, str] = {}
+
+    def _route_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        label = self._routes.get(endpoint)
+        if label is None:
+            app = scope.get("app")
+            for route in getattr(app, "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    label = route.path
+                    break
+            else:
+                label = getattr(endpoint, "__name__", "unknown")
+            self._routes[endpoint] = label
+        return label
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        queries = [0]
+        token = _request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_queries.reset(token)
+            route = self._route_label(scope)
+            self.registry.histogram(REQUEST_SECONDS, {"route": route}).observe(elapsed)
+            self.registry.histogram(REQUEST_QUERIES, {"route": route}, QUERY_COUNT_BUCKETS).observe(queries[0])
+            self.registry.counter(
+                REQUESTS, {"route": route, "method": scope["method"], "status": str(status["code"])}
+            ).inc()
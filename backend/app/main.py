@@ -1,15 +1,40 @@
 """Application entrypoint."""
 
+import gc
 import logging
 import os
+from typing import Optional
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .api.v1 import health, ingest, predict, records
-from .config import MODEL_PATH
-from .db import create_db_and_tables
+from .api.deps import is_admin_token
+from .api.v1 import archive, export, health, ingest, models, predict, profiles, records, stats
+from .archive import RetentionJob, reserve_archived_ids
+from .config import (
+    ARCHIVE_INTERVAL_S,
+    BASELINE_RULES_PATH,
+    METRICS_PERSIST_INTERVAL_S,
+    METRICS_RECONCILE_INTERVAL_S,
+    MICROBATCH_ENABLED,
+    MICROBATCH_MAX_SIZE,
+    MICROBATCH_MAX_WAIT_US,
+    MODEL_PATH,
+    MODEL_PRELOAD,
+    MODEL_WATCH_INTERVAL_S,
+    PROFILING_ENABLED,
+    RECORD_RETENTION_MONTHS,
+)
+from .db import create_db_and_tables, engine
+from .executors import shutdown_executors
+from .instrumentation import RequestMetricsMiddleware, install_query_counter, instrumentation
+from .metrics_store import MetricsPersister, seed_metrics_store
+from .model_registry import ModelWatcher, load_initial_model, model_registry
 from .model_server import model_server
+from .passenger_stats import seed_passenger_stats
+from .prediction_worker import prediction_worker
+from .profiling import ProfilingMiddleware, profile_sync_endpoints
+from .rollups import ensure_rollups
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -42,16 +67,23 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+if instrumentation.enabled:
+    app.add_middleware(RequestMetricsMiddleware)
+    install_query_counter()
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, authorize=is_admin_token)
 
-@app.on_event("startup")
-def on_startup() -> None:
-    """Initialize database and load model."""
-    create_db_and_tables()
+metrics_persister: Optional[MetricsPersister] = None
+model_watcher: Optional[ModelWatcher] = None
+retention_job: Optional[RetentionJob] = None
+
+
+def _load_model() -> None:
+    """Load the startup model, logging rather than raising on failure."""
     try:
-        import os
         logger.info("Attempting to load model from: %s", MODEL_PATH)
         logger.info("Model file exists: %s", os.path.exists(MODEL_PATH))
-        model_server.load_model(MODEL_PATH)
+        load_initial_model(model_server, model_registry, MODEL_PATH)
         if model_server.loaded:
             logger.info("Model loaded successfully. Version: %s", model_server.model_version)
         else:
@@ -60,6 +92,59 @@ def on_startup() -> None:
         logger.exception("Failed to load model from %s: %s", MODEL_PATH, exc)
 
 
+if MODEL_PRELOAD:
+    # Runs once in the gunicorn master with --preload; forked workers inherit
+    # the model. Freezing moves it out of the GC's reach so collections do not
+    # touch (and un-share) its pages.
+    _load_model()
+    gc.freeze()
+
+
+@app.on_event("startup")
+def on_startup() -> None:
+    """Initialize database and load model."""
+    create_db_and_tables()
+    reserve_archived_ids(engine)
+    ensure_rollups(engine)
+    seed_passenger_stats(engine)
+    seed_metrics_store(engine)
+    global metrics_persister, model_watcher, retention_job
+    metrics_persister = MetricsPersister(engine, METRICS_PERSIST_INTERVAL_S, METRICS_RECONCILE_INTERVAL_S)
+    metrics_persister.start()
+    if BASELINE_RULES_PATH:
+        try:
+            model_server.load_baseline_rules(BASELINE_RULES_PATH)
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logger.exception("Failed to load baseline rules from %s: %s", BASELINE_RULES_PATH, exc)
+    if MICROBATCH_ENABLED:
+        model_server.enable_micro_batching(MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_US)
+    if MODEL_PRELOAD and model_server.loaded:
+        logger.info("Using preloaded model. Version: %s", model_server.model_version)
+    else:
+        _load_model()
+    if MODEL_WATCH_INTERVAL_S > 0:
+        model_watcher = ModelWatcher(model_server, model_registry, MODEL_PATH, MODEL_WATCH_INTERVAL_S)
+        model_watcher.start()
+    if RECORD_RETENTION_MONTHS > 0:
+        retention_job = RetentionJob(engine, RECORD_RETENTION_MONTHS, ARCHIVE_INTERVAL_S)
+        retention_job.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    """Drain queued background predictions, flush micro-batches, persist metrics and close connections."""
+    if model_watcher is not None:
+        model_watcher.stop()
+    if retention_job is not None:
+        retention_job.stop()
+    prediction_worker.stop(timeout=30)
+    model_server.disable_micro_batching()
+    if metrics_persister is not None:
+        metrics_persister.stop()
+    shutdown_executors()
+    engine.dispose()
+
+
 @app.get("/")
 def root():
     """Root endpoint - redirects to API docs."""
@@ -70,9 +155,15 @@ def root():
         "health": "/api/v1/health"
     }
 
+app.include_router(archive.router)
+app.include_router(export.router)
 app.include_router(health.router)
 app.include_router(ingest.router)
+app.include_router(models.router)
 app.include_router(predict.router)
+app.include_router(profiles.router)
 app.include_router(records.router)
+app.include_router(stats.router)
 
-
+if PROFILING_ENABLED:
+    profile_sync_endpoints(app.routes)
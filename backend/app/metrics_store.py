@@ -0,0 +1,225 @@
+"""Service counters kept in memory and periodically persisted to the stats table."""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from .archive import get_archive
+from .engine_state import EngineStateRegistry, engine_for
+from .models import Prediction, Record, ServiceStat
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("total_records", "total_predictions")
+LAST_MODEL_VERSION = "last_model_version"
+
+
+class MetricsStore:
+    """Record/prediction counters answered from memory in constant time.
+
+    The stats table holds the shared totals; each process adds its unflushed
+    deltas on top, and ``flush`` pushes those deltas as atomic increments so
+    several workers can share one database.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._base: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self._pending: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self._last_model_version: Optional[str] = None
+        self._version_dirty = False
+
+    def record_inserted(self, n: int = 1) -> None:
+        """Count ``n`` newly committed records."""
+        with self._lock:
+            self._pending["total_records"] += n
+
+    def prediction_inserted(self, model_version: str, n: int = 1) -> None:
+        """Count ``n`` newly committed predictions made by ``model_version``."""
+        with self._lock:
+            self._pending["total_predictions"] += n
+            self._last_model_version = model_version
+            self._version_dirty = True
+
+    def snapshot(self) -> Dict[str, object]:
+        """Return current totals and the last model version."""
+        with self._lock:
+            payload: Dict[str, object] = {name: self._base[name] + self._pending[name] for name in COUNTERS}
+            payload[LAST_MODEL_VERSION] = self._last_model_version
+        return payload
+
+    def seed(self, session: Session) -> None:
+        """Load totals from the stats table, initializing it from the data if empty."""
+        stats = {stat.name: stat for stat in session.exec(select(ServiceStat)).all()}
+        if all(name in stats for name in COUNTERS):
+            with self._lock:
+                for name in COUNTERS:
+                    self._base[name] = stats[name].int_value
+                version = stats.get(LAST_MODEL_VERSION)
+                self._last_model_version = version.str_value if version else None
+            return
+        self._write_totals(session, self._count(session))
+
+    def flush(self, session: Session) -> None:
+        """Persist unflushed deltas and refresh totals written by other processes."""
+        with self._lock:
+            deltas = {name: delta for name, delta in self._pending.items() if delta}
+            version = self._last_model_version if self._version_dirty else None
+            for name in deltas:
+                self._pending[name] -= deltas[name]
+            self._version_dirty = False
+        now = datetime.utcnow()
+        try:
+            for name, delta in deltas.items():
+                session.execute(
+                    update(ServiceStat)
+                    .where(ServiceStat.name == name)
+                    .values(int_value=ServiceStat.int_value + delta, updated_at=now)
+                )
+            if version is not None:
+                self._upsert(session, LAST_MODEL_VERSION, str_value=version)
+            session.commit()
+        except Exception:
+            session.rollback()
+            with self._lock:
+                for name, delta in deltas.items():
+                    self._pending[name] += delta
+                self._version_dirty = self._version_dirty or version is not None
+            raise
+        stats = {stat.name: stat.int_value for stat in session.exec(select(ServiceStat)).all()}
+        with self._lock:
+            for name in COUNTERS:
+                self._base[name] = stats.get(name, self._base[name])
+
+    def reconcile(self, session: Session) -> None:
+        """Replace the persisted totals with true counts from the data tables.
+
+        Inserts committed while the counts run may be off by their own size
+        until the next reconciliation.
+        """
+        self.flush(session)
+        self._write_totals(session, self._count(session))
+        logger.info("Reconciled service metrics: %s", self.snapshot())
+
+    def _count(self, session: Session) -> Dict[str, object]:
+        archived_records, archived_predictions = get_archive(session).counts()
+        return {
+            "total_records": session.exec(select(func.count()).select_from(Record)).one() + archived_records,
+            "total_predictions": (
+                session.exec(select(func.count()).select_from(Prediction)).one() + archived_predictions
+            ),
+            LAST_MODEL_VERSION: session.exec(
+                select(Prediction.model_version).order_by(Prediction.created_at.desc())
+            ).first(),
+        }
+
+    def _write_totals(self, session: Session, totals: Dict[str, object]) -> None:
+        try:
+            for name in COUNTERS:
+                self._upsert(session, name, int_value=totals[name])
+            self._upsert(session, LAST_MODEL_VERSION, str_value=totals[LAST_MODEL_VERSION])
+            session.commit()
+        except IntegrityError:
+            # Another process initialized the table first; use its values.
+            session.rollback()
+            self.seed(session)
+            return
+        with self._lock:
+            for name in COUNTERS:
+                self._base[name] = totals[name]
+            if not self._version_dirty:
+                self._last_model_version = totals[LAST_MODEL_VERSION]
+
+    @staticmethod
+    def _upsert(session: Session, name: str, **values: object) -> None:
+        stat = session.get(ServiceStat, name) or ServiceStat(name=name)
+        for key, value in values.items():
+            setattr(stat, key, value)
+        stat.updated_at = datetime.utcnow()
+        session.add(stat)
+        session.flush()
+
+
+def _seeded_store(session: Session) -> MetricsStore:
+    store = MetricsStore()
+    with Session(engine_for(session)) as own_session:
+        store.seed(own_session)
+    return store
+
+
+_registry: EngineStateRegistry[MetricsStore] = EngineStateRegistry(_seeded_store)
+
+
+def get_metrics_store(session: Session) -> MetricsStore:
+    """Return the metrics store for the session's database, seeding on first use.
+
+    Writers fetch the store before inserting so the seed never counts their rows twice.
+    """
+    return _registry.get(session)
+
+
+def seed_metrics_store(engine: Engine) -> MetricsStore:
+    """Seed (or reseed) the metrics store for ``engine`` at startup."""
+    return _registry.rebuild(engine)
+
+
+def reconcile_metrics(engine: Engine) -> None:
+    """Recount totals for ``engine`` from the data tables."""
+    store = _registry.peek_engine(engine)
+    if store is None:
+        return
+    with Session(engine) as session:
+        store.reconcile(session)
+
+
+class MetricsPersister:
+    """Background thread that flushes metrics and optionally reconciles them."""
+
+    def __init__(self, engine: Engine, interval_s: float = 30.0, reconcile_interval_s: float = 0.0) -> None:
+        self.engine = engine
+        self.interval_s = interval_s
+        self.reconcile_interval_s = reconcile_interval_s
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-persister", daemon=True)
+
+    def start(self) -> None:
+        """Start periodic persistence."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the thread after a final flush."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _tick(self, reconcile: bool) -> None:
+        store = _registry.peek_engine(self.engine)
+        if store is None:
+            return
+        with Session(self.engine) as session:
+            if reconcile:
+                store.reconcile(session)
+            else:
+                store.flush(session)
+
+    def _run(self) -> None:
+        since_reconcile = 0.0
+        while not self._stop.wait(self.interval_s):
+            since_reconcile += self.interval_s
+            reconcile = 0 < self.reconcile_interval_s <= since_reconcile
+            if reconcile:
+                since_reconcile = 0.0
+            try:
+                self._tick(reconcile)
+            except Exception:  # pragma: no cover - defensive logging
+                logger.exception("Failed to persist service metrics")
+        try:
+            self._tick(False)
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception("Failed to persist service metrics on shutdown")
@@ -0,0 +1,177 @@
+"""Micro-batching scheduler that coalesces concurrent single-row predictions."""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PredictFn = Callable[[np.ndarray, bool], np.ndarray]
+
+# Upper bound on how long ``submit`` waits for a queued row
+SUBMIT_TIMEOUT_S = 30.0
+
+
+class BatcherClosedError(RuntimeError):
+    """Raised when a row is queued on (or left behind by) a stopped batcher."""
+
+
+@dataclass
+class _PendingPrediction:
+    """A queued single-row prediction waiting for its batch to flush."""
+
+    row: np.ndarray
+    use_baseline: bool
+    enqueued_at: float
+    future: Future = field(default_factory=Future)
+
+
+class MicroBatcher:
+    """Collects single-row predictions into batches run by one worker thread.
+
+    A batch is flushed when it holds ``max_batch_size`` rows or when the oldest
+    queued row has waited ``max_wait_us`` microseconds, whichever comes first.
+    """
+
+    def __init__(self, predict_fn: PredictFn, max_batch_size: int = 32, max_wait_us: int = 2000) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_us = max_wait_us
+        self._queue: "queue.Queue[Optional[_PendingPrediction]]" = queue.Queue()
+        # Guards ``_closed`` so no row can be queued behind the stop sentinel.
+        self._state_lock = threading.Lock()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._queue_delay_total_us = 0.0
+        self._queue_delay_max_us = 0.0
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def enqueue(self, row: np.ndarray, use_baseline: bool = False) -> Future:
+        """Queue one feature row and return a future resolving to its prediction.
+
+        Raises BatcherClosedError once ``stop`` has been called.
+        """
+        pending = _PendingPrediction(row=row, use_baseline=bool(use_baseline), enqueued_at=time.perf_counter())
+        with self._state_lock:
+            if self._closed:
+                raise BatcherClosedError("Micro-batcher is stopped")
+            self._queue.put(pending)
+        return pending.future
+
+    def submit(
+        self, row: np.ndarray, use_baseline: bool = False, timeout: Optional[float] = SUBMIT_TIMEOUT_S
+    ) -> np.ndarray:
+        """Queue one feature row and wait up to ``timeout`` seconds for its prediction."""
+        return self.enqueue(row, use_baseline).result(timeout=timeout)
+
+    def stop(self) -> None:
+        """Flush outstanding work and stop the worker thread.
+
+        Rows queued before the call are still predicted; later ``enqueue`` calls
+        raise, and anything left in the queue fails with BatcherClosedError.
+        """
+        with self._state_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item.future.set_running_or_notify_cancel():
+                _resolve(item.future, exception=BatcherClosedError("Micro-batcher stopped before this row ran"))
+
+    def stats(self) -> Dict[str, float]:
+        """Return batch fill ratio and queueing delay metrics."""
+        with self._stats_lock:
+            batches = self._batches
+            rows = self._rows
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_us": self.max_wait_us,
+                "batches": batches,
+                "predictions": rows,
+                "queue_depth": self._queue.qsize(),
+                "avg_batch_fill_ratio": rows / (batches * self.max_batch_size) if batches else 0.0,
+                "avg_queue_delay_us": self._queue_delay_total_us / rows if rows else 0.0,
+                "max_queue_delay_us": self._queue_delay_max_us,
+            }
+
+    def _run(self) -> None:
+        max_wait = self.max_wait_us / 1_000_000
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = first.enqueued_at + max_wait
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            if stopping:
+                return
+
+    def _flush(self, batch: List[_PendingPrediction]) -> None:
+        # Callers may cancel a queued row (an async request that timed out); those are dropped here
+        batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        delays_us = [(started - item.enqueued_at) * 1_000_000 for item in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += len(batch)
+            self._queue_delay_total_us += sum(delays_us)
+            self._queue_delay_max_us = max(self._queue_delay_max_us, max(delays_us))
+
+        for use_baseline in (False, True):
+            group = [item for item in batch if item.use_baseline is use_baseline]
+            if not group:
+                continue
+            try:
+                predictions = self.predict_fn(np.vstack([item.row for item in group]), use_baseline)
+            except Exception as exc:
+                logger.warning("Micro-batch of %s predictions failed: %s", len(group), exc)
+                for item in group:
+                    _resolve(item.future, exception=exc)
+                continue
+            for idx, item in enumerate(group):
+                _resolve(item.future, result=predictions[idx:idx + 1])
+
+
+def _resolve(future: Future, result: object = None, exception: Optional[BaseException] = None) -> None:
+    """Complete ``future``; a future that is already done is logged rather than killing the worker."""
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        logger.warning("Dropped the result of an already completed micro-batch prediction")
@@ -0,0 +1,242 @@
+"""Versioned on-disk model registry, hot activation and rollback.
+
+Layout under the registry root::
+
+    <version>/model.joblib   immutable copy of a published model
+    <version>/meta.json      publish time and source path
+    active.json              {"version": ..., "history": [older versions]}
+
+Versions are the first 12 hex digits of the model file's SHA-256, so
+republishing identical bytes is a no-op.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .config import MODEL_REGISTRY_DIR
+
+if TYPE_CHECKING:
+    from .model_server import ModelServer
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILENAME = "model.joblib"
+MAX_HISTORY = 20
+
+
+class UnknownModelVersionError(KeyError):
+    """Raised when a version is not present in the registry."""
+
+
+def file_version(path: str) -> str:
+    """Return the content-hash version of a model file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _write_json_atomic(path: Path, data: dict) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        json.dump(data, handle, indent=2)
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    """Directory of immutable, content-addressed model versions."""
+
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    @property
+    def _active_path(self) -> Path:
+        return self.root / "active.json"
+
+    def publish(self, source_path: str) -> str:
+        """Copy a model file into the registry and return its version."""
+        version = file_version(source_path)
+        target_dir = self.root / version
+        if (target_dir / MODEL_FILENAME).exists():
+            return version
+        target_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target_dir, prefix=f".{MODEL_FILENAME}.")
+        os.close(fd)
+        shutil.copyfile(source_path, tmp)
+        os.replace(tmp, target_dir / MODEL_FILENAME)
+        _write_json_atomic(
+            target_dir / "meta.json",
+            {"version": version, "published_at": datetime.utcnow().isoformat(), "source": str(source_path)},
+        )
+        logger.info("Published model %s from %s", version, source_path)
+        return version
+
+    def path_for(self, version: str) -> str:
+        """Return the model file for ``version``."""
+        path = self.root / version / MODEL_FILENAME
+        if not path.is_file():
+            raise UnknownModelVersionError(version)
+        return str(path)
+
+    def versions(self) -> List[Dict[str, str]]:
+        """Return metadata for every published version, oldest first."""
+        if not self.root.is_dir():
+            return []
+        found = []
+        for entry in self.root.iterdir():
+            if not (entry / MODEL_FILENAME).is_file():
+                continue
+            try:
+                meta = json.loads((entry / "meta.json").read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                meta = {"version": entry.name, "published_at": ""}
+            found.append(meta)
+        return sorted(found, key=lambda meta: meta.get("published_at", ""))
+
+    def state(self) -> Tuple[Optional[str], List[str]]:
+        """Return the active version and the activation history (most recent last)."""
+        try:
+            data = json.loads(self._active_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None, []
+        return data.get("version"), list(data.get("history", []))
+
+    def current(self) -> Optional[str]:
+        """Return the active version, if one has been recorded."""
+        return self.state()[0]
+
+    def set_current(self, version: str) -> None:
+        """Record ``version`` as active, pushing the previous one onto the history."""
+        self.path_for(version)
+        with self._lock:
+            current, history = self.state()
+            if current is not None and current != version:
+                history.append(current)
+            self._save(version, history)
+
+    def pop_previous(self) -> str:
+        """Make the most recent historical version active again and return it."""
+        with self._lock:
+            current, history = self.state()
+            while history:
+                version = history.pop()
+                if version != current and (self.root / version / MODEL_FILENAME).is_file():
+                    self._save(version, history)
+                    return version
+        raise UnknownModelVersionError("no previous model version to roll back to")
+
+    def _save(self, version: str, history: List[str]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        _write_json_atomic(self._active_path, {"version": version, "history": history[-MAX_HISTORY:]})
+
+
+def activate(server: "ModelServer", registry: ModelRegistry, version: str) -> str:
+    """Load ``version`` and swap it in, then record it as active.
+
+    The model is loaded before the swap, so predictions keep using the
+    previous model until the new one is ready.
+    """
+    server.load_model(registry.path_for(version), version=version)
+    registry.set_current(version)
+    return version
+
+
+def publish_and_activate(server: "ModelServer", registry: ModelRegistry, source_path: str) -> str:
+    """Publish a model file and make it active."""
+    return activate(server, registry, registry.publish(source_path))
+
+
+def rollback(server: "ModelServer", registry: ModelRegistry) -> str:
+    """Reactivate the previously active version."""
+    version = registry.pop_previous()
+    server.load_model(registry.path_for(version), version=version)
+    return version
+
+
+def load_initial_model(server: "ModelServer", registry: ModelRegistry, model_path: str) -> None:
+    """Load the registry's active version, falling back to ``model_path``.
+
+    Memory-mapped models are always served from the registry: its files are
+    never rewritten in place, which would corrupt live mappings.
+    """
+    current = registry.current()
+    if current is not None:
+        try:
+            server.load_model(registry.path_for(current), version=current)
+            return
+        except UnknownModelVersionError:
+            logger.warning("Active model version %s missing from registry; using %s", current, model_path)
+    if server.mmap_mode and os.path.exists(model_path):
+        publish_and_activate(server, registry, model_path)
+        return
+    server.load_model(model_path)
+
+
+# Shared registry instance
+model_registry = ModelRegistry(MODEL_REGISTRY_DIR)
+
+
+class ModelWatcher:
+    """Background thread that hot-swaps models without a restart.
+
+    Each tick it follows the registry's active version (so one worker's
+    activation or rollback propagates to every worker sharing the registry)
+    and publishes ``model_path`` whenever its contents change.
+    """
+
+    def __init__(self, server: "ModelServer", registry: ModelRegistry, model_path: str, interval_s: float = 5.0) -> None:
+        self.server = server
+        self.registry = registry
+        self.model_path = model_path
+        self.interval_s = interval_s
+        self._last_stat: Optional[Tuple[int, int]] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+
+    def start(self) -> None:
+        """Start watching."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def tick(self) -> None:
+        """Check the registry and model file once."""
+        current = self.registry.current()
+        if current is not None and current != self.server.model_version:
+            logger.info("Active model changed to %s; loading", current)
+            self.server.load_model(self.registry.path_for(current), version=current)
+
+        try:
+            stat = os.stat(self.model_path)
+        except FileNotFoundError:
+            return
+        signature = (stat.st_mtime_ns, stat.st_size)
+        previous, self._last_stat = self._last_stat, signature
+        # The first look only records the file: at startup the registry's
+        # active version wins, e.g. after a rollback.
+        if previous is None or signature == previous:
+            return
+        if file_version(self.model_path) != self.server.model_version:
+            logger.info("Model file %s changed; publishing", self.model_path)
+            publish_and_activate(self.server, self.registry, self.model_path)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.tick()
+            except Exception:  # pragma: no cover - defensive logging
+                logger.exception("Model watcher failed; keeping model %s", self.server.model_version)
@@ -1,21 +1,140 @@
 """Model loading and prediction service."""
 
+import asyncio
+import json
 import logging
 import os
-from dataclasses import dataclass
+import threading
+import time
+import warnings
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Tuple, Union
 
 import joblib
 import numpy as np
 import pandas as pd
 
+from .config import MODEL_MMAP_MODE, PREDICTION_CACHE_DECIMALS, PREDICTION_CACHE_MAX_BYTES, PREDICTION_CACHE_TTL_S
+from .executors import run_inference
+from .feature_engineering import FEATURE_COLUMNS, FEATURE_INDEX
+from .instrumentation import timed
+from .micro_batching import BatcherClosedError, MicroBatcher
+from .model_registry import file_version
+from .prediction_cache import CacheKey, PredictionCache
+
 # Baseline statistics from training data (used as fallback)
 # These are computed from cleaned_transport_dataset.csv
 TRAINING_DELAY_MEDIAN = 61.0  # Median delay in minutes
 TRAINING_DELAY_MEAN = 44.5    # Mean delay in minutes
 TRAINING_DELAY_STD = 191.8    # Standard deviation
 
+_TIME_OF_DAY_PREFIX = "time_of_day_"
+TIME_OF_DAY_NAMES = tuple(
+    column[len(_TIME_OF_DAY_PREFIX):] for column in FEATURE_COLUMNS if column.startswith(_TIME_OF_DAY_PREFIX)
+)
+
+
+@dataclass
+class BaselineRules:
+    """Tunable weights for the rule-based baseline predictor.
+
+    Time-of-day adjustments are keyed by the ``time_of_day_*`` feature suffix;
+    when several apply, the first listed wins. Invalid keys or values raise
+    ValueError on construction, so a bad rules file fails when it is loaded
+    rather than on the first prediction.
+    """
+
+    base_delay: float = TRAINING_DELAY_MEDIAN
+    weather_severity_adjustments: Dict[int, float] = field(default_factory=lambda: {3: 20.0, 2: 10.0, 1: 0.0})
+    time_of_day_adjustments: Dict[str, float] = field(default_factory=lambda: {"evening": 15.0, "afternoon": 5.0})
+    weekend_adjustment: float = -10.0
+    min_delay: float = 0.0
+    max_delay: float = 180.0
+
+    def __post_init__(self) -> None:
+        try:
+            self.weather_severity_adjustments = {
+                int(level): float(value) for level, value in self.weather_severity_adjustments.items()
+            }
+            self.time_of_day_adjustments = {
+                str(name): float(value) for name, value in self.time_of_day_adjustments.items()
+            }
+            for name in ("base_delay", "weekend_adjustment", "min_delay", "max_delay"):
+                setattr(self, name, float(getattr(self, name)))
+        except (AttributeError, TypeError, ValueError) as exc:
+            raise ValueError(f"Invalid baseline rules: {exc}") from exc
+        unknown = [name for name in self.time_of_day_adjustments if name not in TIME_OF_DAY_NAMES]
+        if unknown:
+            expected = ", ".join(TIME_OF_DAY_NAMES)
+            raise ValueError(f"Unknown time of day {', '.join(unknown)}; expected one of {expected}")
+        if self.min_delay > self.max_delay:
+            raise ValueError("Invalid baseline rules: min_delay exceeds max_delay")
+
+    @classmethod
+    def from_file(cls, path: str) -> "BaselineRules":
+        """Load rules from a JSON file; omitted keys keep their defaults."""
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        if not isinstance(data, dict):
+            raise ValueError(f"Baseline rules in {path} must be a JSON object")
+        unknown = set(data) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"Unknown baseline rule keys in {path}: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+
+# Clamp range for model output. Training data spans -1359 to 179 minutes;
+# -60 to 300 keeps predictions sane.
+PREDICTION_MIN = -60.0
+PREDICTION_MAX = 300.0
+
+
+@dataclass(frozen=True)
+class LinearFastPath:
+    """Fused dot-product-and-clip kernel for fitted sklearn linear models.
+
+    ``LinearModel.predict`` computes ``X @ coef_.T + intercept_`` after input
+    validation; this performs the same floating-point operations, so results
+    are bit-identical, without the validation and feature-name overhead.
+    """
+
+    coef: np.ndarray
+    intercept: float
+
+    @classmethod
+    def from_model(cls, model: object) -> Optional["LinearFastPath"]:
+        """Return a fast path for single-target dense linear models, else None."""
+        try:
+            from sklearn.linear_model._base import LinearModel
+        except ImportError:  # pragma: no cover - sklearn is a hard dependency today
+            return None
+        model_type = type(model)
+        if not (
+            isinstance(model, LinearModel)
+            and model_type.predict is LinearModel.predict
+            and model_type._decision_function is LinearModel._decision_function
+        ):
+            return None
+        coef = getattr(model, "coef_", None)
+        intercept = getattr(model, "intercept_", None)
+        if not isinstance(coef, np.ndarray) or coef.shape != (len(FEATURE_COLUMNS),) or coef.dtype != np.float64:
+            return None
+        if np.ndim(intercept) != 0:
+            return None
+        return cls(coef=np.ascontiguousarray(coef), intercept=float(intercept))
+
+    def __call__(self, X: np.ndarray) -> Optional[np.ndarray]:
+        """Predict and clip, or return None for inputs sklearn would reject (NaN/inf)."""
+        if X.dtype != np.float64 or X.shape[1] != self.coef.shape[0]:
+            return None
+        raw = X @ self.coef
+        if not np.isfinite(raw).all():
+            # Let sklearn raise its usual validation error.
+            return None
+        raw += self.intercept
+        return np.clip(raw, PREDICTION_MIN, PREDICTION_MAX, out=raw)
+
 
 class ModelNotLoadedError(Exception):
     """Raised when prediction requested without a loaded model."""
@@ -27,13 +146,28 @@ class LoadedModel:
 
     model: object
     version: str
+    path: Optional[str] = None
+    loaded_at: Optional[datetime] = None
+    load_seconds: Optional[float] = None
+    mmap_mode: Optional[str] = None
+    fast_path: Optional[LinearFastPath] = None
 
 
 class ModelServer:
     """Handles model lifecycle and predictions."""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        baseline_rules: Optional[BaselineRules] = None,
+        prediction_cache: Optional[PredictionCache] = None,
+        mmap_mode: Optional[str] = None,
+    ) -> None:
         self._loaded: Optional[LoadedModel] = None
+        self.mmap_mode = mmap_mode
+        self.baseline_rules = baseline_rules or BaselineRules()
+        self._batcher: Optional[MicroBatcher] = None
+        self.prediction_cache = prediction_cache
+        self._load_lock = threading.Lock()
         self.logger = logging.getLogger(__name__)
 
     @property
@@ -46,23 +180,103 @@ class ModelServer:
         """Return loaded model version if available."""
         return self._loaded.version if self._loaded else None
 
-    def load_model(self, path: str) -> None:
-        """Load model from disk."""
+    def load_model(self, path: str, version: Optional[str] = None) -> None:
+        """Load model from disk and swap it in atomically.
+
+        ``version`` defaults to the content hash of the file. The previous model
+        keeps serving until the new one has been deserialized. With ``mmap_mode``
+        set, numpy arrays stay memory-mapped from the file, so workers loading
+        the same file share those pages instead of holding private copies.
+        """
         if not os.path.exists(path):
             self.logger.warning("Model file missing at %s", path)
             self._loaded = None
+            self._invalidate_cache()
             return
-        model = joblib.load(path)
-        mod_time = os.path.getmtime(path)
-        version = datetime.utcfromtimestamp(mod_time).isoformat() if mod_time else "v1"
-        self._loaded = LoadedModel(model=model, version=version)
-        self.logger.info("Model loaded from %s (version %s)", path, version)
+        with self._load_lock:
+            started = time.perf_counter()
+            model = joblib.load(path, mmap_mode=self.mmap_mode)
+            load_seconds = time.perf_counter() - started
+            version = version or file_version(path)
+            self._loaded = LoadedModel(
+                model=model,
+                version=version,
+                path=path,
+                loaded_at=datetime.utcnow(),
+                load_seconds=load_seconds,
+                mmap_mode=self.mmap_mode,
+                fast_path=LinearFastPath.from_model(model),
+            )
+            self._invalidate_cache()
+        self.logger.info("Model loaded from %s (version %s) in %.3fs", path, version, load_seconds)
+
+    def model_info(self) -> Optional[LoadedModel]:
+        """Return metadata of the loaded model, if any."""
+        return self._loaded
+
+    def load_baseline_rules(self, path: str) -> None:
+        """Replace the baseline rule weights with those from a JSON file."""
+        self.baseline_rules = BaselineRules.from_file(path)
+        self._invalidate_cache()
+        self.logger.info("Baseline rules loaded from %s", path)
+
+    def enable_micro_batching(self, max_batch_size: int = 32, max_wait_us: int = 2000) -> None:
+        """Coalesce concurrent single-row predictions into shared batches."""
+        self.disable_micro_batching()
+        self._batcher = MicroBatcher(self._predict_matrix, max_batch_size=max_batch_size, max_wait_us=max_wait_us)
+        self.logger.info("Micro-batching enabled (max %s rows, max wait %s us)", max_batch_size, max_wait_us)
+
+    def disable_micro_batching(self) -> None:
+        """Flush pending micro-batches and return to direct per-call prediction."""
+        batcher, self._batcher = self._batcher, None
+        if batcher is not None:
+            batcher.stop()
+
+    def batching_stats(self) -> Optional[dict]:
+        """Return micro-batching metrics, or None when batching is disabled."""
+        return self._batcher.stats() if self._batcher else None
+
+    def cache_stats(self) -> Optional[dict]:
+        """Return prediction cache metrics, or None when caching is disabled."""
+        return self.prediction_cache.stats() if self.prediction_cache else None
+
+    def _invalidate_cache(self) -> None:
+        if self.prediction_cache is not None:
+            self.prediction_cache.clear()
 
-    def predict(self, df: pd.DataFrame, use_baseline: bool = False):
+    def _cache_lookup(
+        self, X: np.ndarray, use_baseline: bool
+    ) -> Tuple[Optional[List[CacheKey]], Optional[np.ndarray], List[int]]:
+        """Return cache keys, cached values and the row indices still to predict."""
+        cache = self.prediction_cache
+        if cache is None:
+            return None, None, list(range(X.shape[0]))
+        keys = cache.keys_for(X, self.model_version or "v1", use_baseline)
+        values, missing = cache.lookup(keys)
+        return keys, values, missing
+
+    def _cache_fill(
+        self, keys: List[CacheKey], values: np.ndarray, missing: List[int], computed: np.ndarray
+    ) -> np.ndarray:
+        """Merge freshly computed rows into ``values`` and cache them."""
+        computed = np.asarray(computed, dtype=np.float64).ravel()
+        values[missing] = computed
+        self.prediction_cache.store([keys[idx] for idx in missing], computed)
+        return values
+
+    @staticmethod
+    def _as_matrix(features: Union[np.ndarray, pd.DataFrame]) -> np.ndarray:
+        """Return features as a 2-D float64 array in FEATURE_COLUMNS order."""
+        if isinstance(features, pd.DataFrame):
+            features = features.loc[:, list(FEATURE_COLUMNS)].to_numpy(dtype=np.float64)
+        return np.atleast_2d(np.asarray(features, dtype=np.float64))
+
+    @timed("model_predict")
+    def predict(self, features: Union[np.ndarray, pd.DataFrame], use_baseline: bool = False):
         """Run prediction with the loaded model.
         
         Args:
-            df: Feature dataframe
+            features: Feature matrix (N x 13, FEATURE_COLUMNS order) or DataFrame
             use_baseline: If True, use simple baseline instead of model
                           (useful when model quality is poor)
         
@@ -71,60 +285,123 @@ class ModelServer:
         """
         if not self._loaded:
             raise ModelNotLoadedError("Model not loaded")
-        
+
+        X = self._as_matrix(features)
+        keys, values, missing = self._cache_lookup(X, use_baseline)
+        if keys is None:
+            return self._predict_uncached(X, use_baseline)
+        if not missing:
+            return values
+        return self._cache_fill(keys, values, missing, self._predict_uncached(X[missing], use_baseline))
+
+    def _predict_uncached(self, X: np.ndarray, use_baseline: bool) -> np.ndarray:
+        batcher = self._batcher
+        if batcher is not None and X.shape[0] == 1:
+            try:
+                return batcher.submit(X[0], use_baseline)
+            except BatcherClosedError:
+                pass  # batching was disabled or replaced after we read it; predict directly
+        return self._predict_matrix(X, use_baseline)
+
+    @timed("model_predict")
+    async def predict_async(self, features: Union[np.ndarray, pd.DataFrame], use_baseline: bool = False):
+        """Like ``predict`` but never blocks the event loop.
+
+        Cache hits return immediately, micro-batched rows are awaited on the
+        batcher and everything else runs on the inference thread pool.
+        """
+        if not self._loaded:
+            raise ModelNotLoadedError("Model not loaded")
+
+        X = self._as_matrix(features)
+        keys, values, missing = self._cache_lookup(X, use_baseline)
+        if keys is None:
+            return await self._predict_uncached_async(X, use_baseline)
+        if not missing:
+            return values
+        return self._cache_fill(keys, values, missing, await self._predict_uncached_async(X[missing], use_baseline))
+
+    async def _predict_uncached_async(self, X: np.ndarray, use_baseline: bool) -> np.ndarray:
+        batcher = self._batcher
+        if batcher is not None and X.shape[0] == 1:
+            try:
+                return await asyncio.wrap_future(batcher.enqueue(X[0], use_baseline))
+            except BatcherClosedError:
+                pass  # batching was disabled or replaced after we read it; predict directly
+        return await run_inference(self._predict_matrix, X, use_baseline)
+
+    @timed("model_inference")
+    def _predict_matrix(self, X: np.ndarray, use_baseline: bool) -> np.ndarray:
+        """Predict a feature matrix directly, without batching."""
+        loaded = self._loaded
+        if not loaded:
+            raise ModelNotLoadedError("Model not loaded")
+
         if use_baseline:
             # Use rule-based baseline that adjusts for weather and time
             # This is more reliable than the poor-quality model (R² = 0.26)
-            predictions = self._baseline_predict(df)
+            predictions = self._baseline_predict(X)
             self.logger.info(f"Using baseline predictor: {predictions[0]:.1f} min")
             return predictions
-        
-        predictions = self._loaded.model.predict(df)
+
+        if loaded.fast_path is not None:
+            predictions = loaded.fast_path(X)
+            if predictions is not None:
+                return predictions
+
+        with warnings.catch_warnings():
+            # Models fitted on DataFrames warn about unnamed arrays; column order is fixed by FEATURE_COLUMNS.
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            predictions = loaded.model.predict(X)
         
         # Clamp predictions to reasonable range
-        # Based on training data: -1359 to 179 minutes, but clamp to -60 to 300 for sanity
-        predictions = np.clip(predictions, -60.0, 300.0)
+        predictions = np.clip(predictions, PREDICTION_MIN, PREDICTION_MAX)
         
         return predictions
     
-    def _baseline_predict(self, df: pd.DataFrame) -> np.ndarray:
+    def _baseline_predict(self, X: np.ndarray) -> np.ndarray:
         """Simple rule-based baseline predictor.
         
-        Adjusts median delay based on weather severity and time of day.
+        Adjusts median delay based on weather severity, time of day and weekend
+        using the weights in ``self.baseline_rules``, vectorized over all rows.
         More reliable than the poor-quality linear regression model.
         """
-        predictions = []
-        
-        for _, row in df.iterrows():
-            base_delay = TRAINING_DELAY_MEDIAN  # Start with median (61 min)
-            
-            # Adjust for weather (higher severity = more delay)
-            weather_severity = row.get('weather_severity', 2)
-            if weather_severity == 3:  # Rainy/Snow
-                base_delay += 20
-            elif weather_severity == 2:  # Cloudy/Fog
-                base_delay += 10
-            # weather_severity == 1 (Clear/Sunny) stays at base
-            
-            # Adjust for time of day (evening rush hour = more delay)
-            if row.get('time_of_day_evening', 0) == 1:  # Evening (6-10 PM)
-                base_delay += 15
-            elif row.get('time_of_day_afternoon', 0) == 1:  # Afternoon (12-5 PM)
-                base_delay += 5
-            # Morning and night stay at base
-            
-            # Adjust for weekend (usually less traffic)
-            if row.get('is_weekend', 0) == 1:
-                base_delay -= 10
-            
-            # Clamp to reasonable range
-            base_delay = max(0, min(180, base_delay))
-            predictions.append(base_delay)
-        
-        return np.array(predictions)
+        rules = self.baseline_rules
+        predictions = np.full(X.shape[0], rules.base_delay, dtype=np.float64)
+
+        # Adjust for weather (higher severity = more delay); np.select rejects
+        # an empty condition list, so empty mappings are skipped
+        severity = X[:, FEATURE_INDEX["weather_severity"]]
+        if rules.weather_severity_adjustments:
+            predictions += np.select(
+                [severity == level for level in rules.weather_severity_adjustments],
+                list(rules.weather_severity_adjustments.values()),
+                default=0.0,
+            )
+
+        # Adjust for time of day (e.g. evening rush hour = more delay)
+        if rules.time_of_day_adjustments:
+            predictions += np.select(
+                [X[:, FEATURE_INDEX[f"time_of_day_{name}"]] == 1 for name in rules.time_of_day_adjustments],
+                list(rules.time_of_day_adjustments.values()),
+                default=0.0,
+            )
+
+        # Adjust for weekend (usually less traffic)
+        predictions += np.where(X[:, FEATURE_INDEX["is_weekend"]] == 1, rules.weekend_adjustment, 0.0)
+
+        # Clamp to reasonable range
+        return np.clip(predictions, rules.min_delay, rules.max_delay)
 
 
 # Shared model server instance
-model_server = ModelServer()
+model_server = ModelServer(
+    prediction_cache=PredictionCache(
+        max_bytes=PREDICTION_CACHE_MAX_BYTES, ttl_s=PREDICTION_CACHE_TTL_S, decimals=PREDICTION_CACHE_DECIMALS
+    )
+    if PREDICTION_CACHE_MAX_BYTES > 0
+    else None,
+    mmap_mode=MODEL_MMAP_MODE,
+)
 
 
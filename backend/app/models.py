@@ -3,12 +3,19 @@
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Index
 from sqlmodel import Column, DateTime, Field, SQLModel
 
 
 class Record(SQLModel, table=True):
     """Represents an ingested bus record."""
 
+    # AUTOINCREMENT: ids of archived (deleted) rows must never be handed out again
+    __table_args__ = (
+        Index("ix_record_route_id_scheduled_time", "route_id", "scheduled_time"),
+        {"sqlite_autoincrement": True},
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     route_id: str
     scheduled_time: datetime
@@ -20,21 +27,51 @@ class Record(SQLModel, table=True):
     cleaned: bool = Field(default=False)
     delay_minutes: Optional[float] = None
     created_at: datetime = Field(
-        default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=False))
+        default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=False), index=True)
     )
 
 
 class Prediction(SQLModel, table=True):
     """Stores predictions linked to a record."""
 
+    __table_args__ = {"sqlite_autoincrement": True}
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    record_id: int = Field(foreign_key="record.id")
+    record_id: int = Field(foreign_key="record.id", index=True)
     predicted_delay: float
     model_version: str
     created_at: datetime = Field(
+        default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=False), index=True)
+    )
+
+
+class ServiceStat(SQLModel, table=True):
+    """Persisted service counter backing the metrics endpoint."""
+
+    name: str = Field(primary_key=True)
+    int_value: int = 0
+    str_value: Optional[str] = None
+    updated_at: datetime = Field(
         default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=False))
     )
 
 
+class DelayRollup(SQLModel, table=True):
+    """Running delay aggregates per route, hour bucket, weather and metric.
+
+    ``metric`` is ``"actual"`` (``Record.delay_minutes``) or ``"predicted"``
+    (``Prediction.predicted_delay``); ``bucket`` is ``scheduled_time``
+    truncated to the hour.
+    """
 
+    __table_args__ = (Index("ix_delayrollup_metric_bucket", "metric", "bucket"),)
 
+    route_id: str = Field(primary_key=True)
+    bucket: datetime = Field(primary_key=True)
+    weather: str = Field(primary_key=True)
+    metric: str = Field(primary_key=True)
+    count: int = 0
+    value_sum: float = 0.0
+    value_sum_sq: float = 0.0
+    value_min: Optional[float] = None
+    value_max: Optional[float] = None
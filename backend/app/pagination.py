@@ -0,0 +1,28 @@
+"""Opaque keyset-pagination cursors."""
+
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+Cursor = Tuple[datetime, int]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode the ``(created_at, id)`` of the last row on a page."""
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Decode a cursor produced by ``encode_cursor``."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursorError(f"Invalid cursor: {cursor!r}") from exc
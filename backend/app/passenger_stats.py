@@ -0,0 +1,183 @@
+"""Incrementally maintained passenger-count distributions used for imputation."""
+
+import itertools
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from .archive import get_archive
+from .engine_state import EngineStateRegistry
+from .models import Record
+
+logger = logging.getLogger(__name__)
+
+
+class PassengerHistogram:
+    """Histogram of passenger counts with a cached median.
+
+    Passenger counts are small bounded integers, so the number of distinct keys
+    stays tiny regardless of how many records have been observed. Updates are
+    O(1) and the median is recomputed lazily over the distinct keys only.
+    """
+
+    def __init__(self) -> None:
+        self._counts: Dict[int, int] = {}
+        self._total = 0
+        self._median: Optional[int] = None
+        self._dirty = False
+
+    @property
+    def total(self) -> int:
+        """Return number of observed values."""
+        return self._total
+
+    def add(self, value: int, n: int = 1) -> None:
+        """Record ``n`` observations of ``value``."""
+        self._counts[value] = self._counts.get(value, 0) + n
+        self._total += n
+        self._dirty = True
+
+    def remove(self, value: int, n: int = 1) -> None:
+        """Forget ``n`` observations of ``value`` if present."""
+        current = self._counts.get(value, 0)
+        if current <= 0:
+            return
+        n = min(n, current)
+        if current == n:
+            del self._counts[value]
+        else:
+            self._counts[value] = current - n
+        self._total -= n
+        self._dirty = True
+
+    def median(self) -> Optional[int]:
+        """Return the median as ``int(statistics.median(values))`` would."""
+        if self._total == 0:
+            return None
+        if self._dirty or self._median is None:
+            lower_idx = (self._total - 1) // 2
+            upper_idx = self._total // 2
+            lower = upper = None
+            seen = 0
+            for value in sorted(self._counts):
+                seen += self._counts[value]
+                if lower is None and seen > lower_idx:
+                    lower = value
+                if seen > upper_idx:
+                    upper = value
+                    break
+            self._median = int((lower + upper) / 2) if lower != upper else int(lower)
+            self._dirty = False
+        return self._median
+
+
+class PassengerStats:
+    """Passenger-count distributions overall, per route and per route/hour."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.overall = PassengerHistogram()
+        self._by_route: Dict[str, PassengerHistogram] = defaultdict(PassengerHistogram)
+        self._by_route_hour: Dict[Tuple[str, int], PassengerHistogram] = defaultdict(PassengerHistogram)
+
+    def __getstate__(self) -> Dict[str, object]:
+        with self._lock:
+            return {key: value for key, value in self.__dict__.items() if key != "_lock"}
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _histograms(self, route_id: Optional[str], scheduled_time: Optional[datetime]):
+        yield self.overall
+        if route_id is not None:
+            yield self._by_route[route_id]
+            if scheduled_time is not None:
+                yield self._by_route_hour[(route_id, scheduled_time.hour)]
+
+    def observe(
+        self, route_id: Optional[str], scheduled_time: Optional[datetime], passenger_count: Optional[int]
+    ) -> None:
+        """Add a stored record's passenger count to the distributions."""
+        if passenger_count is None:
+            return
+        with self._lock:
+            for histogram in self._histograms(route_id, scheduled_time):
+                histogram.add(int(passenger_count))
+
+    def discard(
+        self, route_id: Optional[str], scheduled_time: Optional[datetime], passenger_count: Optional[int]
+    ) -> None:
+        """Remove a previously observed passenger count (e.g. before an update)."""
+        if passenger_count is None:
+            return
+        with self._lock:
+            for histogram in self._histograms(route_id, scheduled_time):
+                histogram.remove(int(passenger_count))
+
+    def median(self, route_id: Optional[str] = None, hour: Optional[int] = None) -> Optional[int]:
+        """Return the most specific non-empty median for the requested scope."""
+        with self._lock:
+            if route_id is not None:
+                if hour is not None:
+                    bucket = self._by_route_hour.get((route_id, hour))
+                    if bucket is not None and bucket.total:
+                        return bucket.median()
+                bucket = self._by_route.get(route_id)
+                if bucket is not None and bucket.total:
+                    return bucket.median()
+            return self.overall.median()
+
+    def seed(self, session: Session) -> None:
+        """Rebuild the distributions from the stored records, archived months included.
+
+        Compaction leaves live statistics untouched, so seeding from the archive
+        too keeps imputation identical across restarts and workers.
+        """
+        statement = (
+            select(Record.route_id, Record.scheduled_time, Record.passenger_count)
+            .where(Record.passenger_count.is_not(None))
+            .execution_options(yield_per=1000)
+        )
+        with self._lock:
+            self.overall = PassengerHistogram()
+            self._by_route.clear()
+            self._by_route_hour.clear()
+            rows = itertools.chain(get_archive(session).passenger_counts(), session.exec(statement))
+            for route_id, scheduled_time, passenger_count in rows:
+                for histogram in self._histograms(route_id, scheduled_time):
+                    histogram.add(int(passenger_count))
+        logger.info("Seeded passenger statistics from %s records", self.overall.total)
+
+
+def _seeded_stats(session: Session) -> PassengerStats:
+    stats = PassengerStats()
+    stats.seed(session)
+    return stats
+
+
+_registry: EngineStateRegistry[PassengerStats] = EngineStateRegistry(_seeded_stats)
+
+
+def get_passenger_stats(session: Session) -> PassengerStats:
+    """Return passenger statistics for the session's database, seeding on first use."""
+    return _registry.get(session)
+
+
+def peek_passenger_stats(session: Session) -> Optional[PassengerStats]:
+    """Return already-seeded statistics for the session's database, if any.
+
+    Writers use this so that inserts made before the first seed are not counted
+    twice once the seed query picks them up from the database.
+    """
+    return _registry.peek(session)
+
+
+def seed_passenger_stats(engine: Engine) -> PassengerStats:
+    """Seed (or reseed) passenger statistics for ``engine`` at startup."""
+    return _registry.rebuild(engine)
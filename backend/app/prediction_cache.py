@@ -0,0 +1,111 @@
+"""Bounded LRU/TTL cache of predictions keyed by quantized feature vectors."""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Approximate bookkeeping cost of one entry beyond its key bytes: the
+# OrderedDict slot and links, the key tuple, and the (value, expiry) tuple.
+_ENTRY_OVERHEAD_BYTES = 240
+
+CacheKey = Tuple[str, bool, bytes]
+
+
+class PredictionCache:
+    """Thread-safe LRU of single-row predictions with optional expiry.
+
+    Rows are rounded to ``decimals`` places before hashing, so feature vectors
+    that differ only by GPS jitter share an entry. Keys include the model
+    version and the baseline flag; a new model version therefore never sees
+    stale entries, and ``clear`` drops the old ones on reload.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, ttl_s: float = 300.0, decimals: int = 4) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.decimals = decimals
+        self._entries: "OrderedDict[CacheKey, Tuple[float, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def keys_for(self, X: np.ndarray, version: str, use_baseline: bool) -> List[CacheKey]:
+        """Return one cache key per row of ``X``."""
+        # Adding 0.0 folds -0.0 into 0.0 so both hash alike.
+        quantized = np.ascontiguousarray(np.round(X, self.decimals) + 0.0)
+        use_baseline = bool(use_baseline)
+        return [(version, use_baseline, row.tobytes()) for row in quantized]
+
+    def lookup(self, keys: List[CacheKey]) -> Tuple[np.ndarray, List[int]]:
+        """Return cached values (NaN where missing) and the indices of misses."""
+        values = np.full(len(keys), np.nan, dtype=np.float64)
+        missing: List[int] = []
+        now = time.monotonic()
+        with self._lock:
+            for idx, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] < now:
+                    self._drop(key)
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    missing.append(idx)
+                    continue
+                self._entries.move_to_end(key)
+                values[idx] = entry[0]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        return values, missing
+
+    def store(self, keys: List[CacheKey], values: np.ndarray) -> None:
+        """Insert predictions for ``keys``, evicting least recently used entries."""
+        if self.max_bytes <= 0:
+            return
+        expires = time.monotonic() + self.ttl_s if self.ttl_s > 0 else float("inf")
+        with self._lock:
+            for key, value in zip(keys, values):
+                if key in self._entries:
+                    self._drop(key)
+                self._entries[key] = (float(value), expires)
+                self._bytes += self._entry_size(key)
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss/eviction counters and current memory use."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "approx_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "decimals": self.decimals,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _drop(self, key: CacheKey) -> None:
+        del self._entries[key]
+        self._bytes -= self._entry_size(key)
+
+    @staticmethod
+    def _entry_size(key: CacheKey) -> int:
+        return sys.getsizeof(key[2]) + sys.getsizeof(key[0]) + _ENTRY_OVERHEAD_BYTES
@@ -0,0 +1,154 @@
+"""Background worker that predicts and stores ingested records in chunks."""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from . import db
+from .config import PREDICTION_WORKER_CHUNK_SIZE, PREDICTION_WORKER_MAX_WAIT_MS
+from .crud import create_predictions_bulk
+from .feature_engineering import create_feature_matrix
+from .model_server import ModelNotLoadedError, model_server
+from .models import Record
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionWorker:
+    """Drains pending record ids and predicts them as one matrix per chunk.
+
+    Each chunk loads its records with a single ``IN (...)`` query, runs one
+    vectorized prediction and bulk-inserts the results in one commit.
+    """
+
+    def __init__(self, chunk_size: int = 256, max_wait_ms: int = 50) -> None:
+        self.chunk_size = chunk_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: Deque[Tuple[int, float]] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._in_flight = 0
+        self._batches = 0
+        self._processed = 0
+        self._failed = 0
+        self._last_lag_s = 0.0
+
+    def start(self) -> None:
+        """Start the worker thread if it is not already running."""
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="prediction-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Process whatever is queued, then stop the worker thread."""
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+
+    def submit(self, record_ids: Iterable[int]) -> int:
+        """Queue record ids for prediction and return how many were queued."""
+        now = time.monotonic()
+        items = [(record_id, now) for record_id in record_ids]
+        if not items:
+            return 0
+        self.start()
+        with self._cond:
+            self._pending.extend(items)
+            self._cond.notify_all()
+        return len(items)
+
+    def wait_idle(self, timeout: float = 10.0) -> bool:
+        """Block until the queue is drained; return False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        """Return queue depth, lag and throughput counters."""
+        with self._cond:
+            oldest = self._pending[0][1] if self._pending else None
+            return {
+                "queue_depth": len(self._pending),
+                "in_flight": self._in_flight,
+                "lag_seconds": time.monotonic() - oldest if oldest is not None else 0.0,
+                "last_batch_lag_seconds": self._last_lag_s,
+                "batches": self._batches,
+                "processed": self._processed,
+                "failed": self._failed,
+            }
+
+    def _next_chunk(self) -> Optional[List[Tuple[int, float]]]:
+        with self._cond:
+            while not self._pending and not self._stopping:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            deadline = self._pending[0][1] + self.max_wait_ms / 1000
+            while len(self._pending) < self.chunk_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            chunk = [self._pending.popleft() for _ in range(min(self.chunk_size, len(self._pending)))]
+            self._in_flight = len(chunk)
+            return chunk
+
+    def _run(self) -> None:
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return
+            ok = False
+            try:
+                self._process([record_id for record_id, _ in chunk])
+                ok = True
+            except ModelNotLoadedError:
+                logger.warning("Model not loaded; dropped %s queued predictions", len(chunk))
+            except Exception:  # pragma: no cover - defensive logging
+                logger.exception("Prediction worker failed on a chunk of %s records", len(chunk))
+            with self._cond:
+                self._batches += 1
+                if ok:
+                    self._processed += len(chunk)
+                else:
+                    self._failed += len(chunk)
+                self._last_lag_s = time.monotonic() - chunk[0][1]
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def _process(self, record_ids: List[int]) -> None:
+        if not model_server.loaded:
+            raise ModelNotLoadedError("Model not loaded")
+        with Session(db.engine) as session:
+            records = session.exec(select(Record).where(Record.id.in_(record_ids))).all()
+            if not records:
+                return
+            features = create_feature_matrix([record.dict() for record in records])
+            predictions = model_server.predict(features)
+            create_predictions_bulk(
+                session,
+                [(record.id, float(value)) for record, value in zip(records, predictions)],
+                model_server.model_version or "v1",
+            )
+
+
+# Shared prediction worker instance
+prediction_worker = PredictionWorker(
+    chunk_size=PREDICTION_WORKER_CHUNK_SIZE, max_wait_ms=PREDICTION_WORKER_MAX_WAIT_MS
+)
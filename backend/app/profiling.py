@@ -0,0 +1,328 @@
+"""On-demand cProfile capture of whole requests, kept in a bounded ring buffer.
+
+A request is profiled when it asks for it (``X-Profile: 1`` or ``?profile=1``
+together with the admin token) or is picked at random with probability
+``PROFILE_SAMPLE_RATE``. cProfile only sees the thread it is enabled in, so a
+request's profile merges the event-loop thread with one profile per call it
+hands to a worker thread: ``run_db``/``run_inference`` work through
+``profile_in_thread`` and sync endpoint bodies through ``profile_sync_endpoints``.
+The event-loop profile also sees other coroutines that run while the request
+awaits, so only one request is profiled at a time.
+"""
+
+import contextvars
+import cProfile
+import functools
+import inspect
+import io
+import itertools
+import marshal
+import pstats
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import PurePath
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple, TypeVar
+from urllib.parse import parse_qs
+
+from .config import PROFILE_BUFFER_SIZE, PROFILE_SAMPLE_RATE
+
+T = TypeVar("T")
+
+# cProfile's raw stats: (file, line, function) -> (primitive calls, calls, own time, cumulative time, callers)
+FuncKey = Tuple[str, int, str]
+RawStats = Dict[FuncKey, Tuple[int, int, float, float, Dict[FuncKey, Tuple[int, int, float, float]]]]
+
+SORT_KEYS = {"cumulative": 3, "tottime": 2, "ncalls": 1}
+PROFILES_PATH = "/api/v1/profiles"
+_TRUE = ("1", "true", "yes")
+
+
+def _label(func: FuncKey) -> str:
+    filename, line, name = func
+    if filename == "~":  # built-in
+        return name.replace(";", ",")
+    return f"{name} ({'/'.join(PurePath(filename).parts[-2:])}:{line})".replace(";", ",")
+
+
+class _Snapshot:
+    """Adapter letting ``pstats.Stats`` load a copy of stored raw stats."""
+
+    def __init__(self, stats: RawStats) -> None:
+        self.stats = dict(stats)
+
+    def create_stats(self) -> None:
+        pass
+
+
+@dataclass
+class RequestProfile:
+    """A finished request's merged profile."""
+
+    id: int
+    method: str
+    path: str
+    status: int
+    trigger: str
+    started_at: datetime
+    duration_s: float
+    threads: int
+    stats: RawStats = field(repr=False)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_s * 1000, 3),
+            "threads": self.threads,
+            "functions": len(self.stats),
+        }
+
+    def top(self, limit: int = 40, sort: str = "cumulative") -> List[Dict[str, Any]]:
+        """The ``limit`` functions with the highest ``sort`` value."""
+        index = SORT_KEYS[sort]
+        ranked = sorted(self.stats.items(), key=lambda item: item[1][index], reverse=True)[:limit]
+        return [
+            {
+                "function": _label(func),
+                "ncalls": nc,
+                "primitive_calls": cc,
+                "tottime_ms": round(tt * 1000, 3),
+                "cumtime_ms": round(ct * 1000, 3),
+            }
+            for func, (cc, nc, tt, ct, _) in ranked
+        ]
+
+    def pstats_report(self, limit: int = 40, sort: str = "cumulative") -> str:
+        """The standard ``pstats`` table of the top ``limit`` functions."""
+        buffer = io.StringIO()
+        pstats.Stats(_Snapshot(self.stats), stream=buffer).sort_stats(sort).print_stats(limit)
+        return buffer.getvalue()
+
+    def dump(self) -> bytes:
+        """The profile in ``pstats``' binary format, loadable by ``pstats.Stats`` or snakeviz."""
+        return marshal.dumps(self.stats)
+
+    def collapsed(self, min_fraction: float = 1e-4) -> str:
+        """Collapsed stacks (``a;b;c <microseconds>``) for flamegraph.pl, speedscope or inferno.
+
+        cProfile keeps caller/callee edges rather than whole stacks, so stacks are
+        rebuilt from the roots and each function's time is split between its
+        callers in proportion to the time spent under each of them. Branches
+        below ``min_fraction`` of the total are dropped.
+        """
+        children: Dict[FuncKey, List[Tuple[FuncKey, float]]] = defaultdict(list)
+        roots = []
+        for func, (_, _, _, ct, callers) in self.stats.items():
+            if not callers:
+                roots.append((func, ct))
+            for caller, edge in callers.items():
+                children[caller].append((func, edge[3]))
+        threshold = sum(ct for _, ct in roots) * min_fraction
+        totals: Dict[str, float] = defaultdict(float)
+        pending = [(func, ct, ()) for func, ct in roots]
+        while pending:
+            func, budget, path = pending.pop()
+            _, _, tt, ct, _ = self.stats[func]
+            scale = budget / ct if ct > 0 else 0.0
+            stack = path + (func,)
+            if tt * scale > 0:
+                totals[";".join(_label(frame) for frame in stack)] += tt * scale
+            for child, edge_ct in children.get(func, ()):
+                if child not in stack and edge_ct * scale >= threshold:
+                    pending.append((child, edge_ct * scale, stack))
+        lines = (f"{stack} {round(seconds * 1e6)}" for stack, seconds in sorted(totals.items()) if seconds >= 5e-7)
+        return "".join(f"{line}\n" for line in lines)
+
+
+class _Capture:
+    """Per-thread profiles of one in-flight request."""
+
+    def __init__(self) -> None:
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def add(self, profile: cProfile.Profile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call ``func`` under a profiler for the current thread."""
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            self.add(profile)
+
+    def merged(self) -> Tuple[RawStats, int]:
+        with self._lock:
+            profiles = list(self._profiles)
+        return pstats.Stats(*profiles).stats, len(profiles)
+
+
+# Capture of the request being served, if it is profiled; copied into worker threads.
+_capture: "contextvars.ContextVar[Optional[_Capture]]" = contextvars.ContextVar("profile_capture", default=None)
+
+
+def profile_in_thread(call: Callable[[], T]) -> Callable[[], T]:
+    """Wrap work about to be handed to a worker thread so it is profiled with the current request."""
+    capture = _capture.get()
+    if capture is None:
+        return call
+    return functools.partial(capture.run, call)
+
+
+def profile_sync_endpoints(routes: Iterable[Any]) -> None:
+    """Profile the bodies of sync endpoints, which FastAPI runs on its own thread pool."""
+    for route in routes:
+        dependant = getattr(route, "dependant", None)
+        call = getattr(dependant, "call", None)
+        if call is None or inspect.iscoroutinefunction(call) or getattr(call, "_profiled", False):
+            continue
+        dependant.call = _profiled_endpoint(call)
+
+
+def _profiled_endpoint(func: Callable[..., T]) -> Callable[..., T]:
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        capture = _capture.get()
+        if capture is None:
+            return func(*args, **kwargs)
+        return capture.run(func, *args, **kwargs)
+
+    wrapper._profiled = True  # type: ignore[attr-defined]
+    return wrapper
+
+
+class RequestProfiler:
+    """Ring buffer of recent request profiles; lets one request be profiled at a time."""
+
+    def __init__(self, capacity: int = 20, sample_rate: float = 0.0) -> None:
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self._profiles: Deque[RequestProfile] = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._busy = False
+        # Requests that asked to be profiled while another one was
+        self.skipped = 0
+
+    def try_begin(self) -> Optional[int]:
+        """Claim the profiler, returning the new profile's id, or None if it is busy."""
+        with self._lock:
+            if self._busy:
+                self.skipped += 1
+                return None
+            self._busy = True
+            return next(self._ids)
+
+    def finish(self, profile: Optional[RequestProfile]) -> None:
+        """Store ``profile`` (if any) and release the profiler."""
+        with self._lock:
+            if profile is not None:
+                self._profiles.append(profile)
+            self._busy = False
+
+    def profiles(self) -> List[RequestProfile]:
+        """Stored profiles, newest first."""
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+# Shared profile buffer
+request_profiler = RequestProfiler(capacity=PROFILE_BUFFER_SIZE, sample_rate=PROFILE_SAMPLE_RATE)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware running requested or sampled requests under cProfile.
+
+    ``authorize`` receives the ``X-Admin-Token`` header of a request asking to be
+    profiled. Profiled responses carry an ``X-Profile-Id`` header.
+    """
+
+    def __init__(
+        self,
+        app,
+        profiler: Optional[RequestProfiler] = None,
+        authorize: Callable[[Optional[str]], bool] = lambda token: True,
+    ) -> None:
+        self.app = app
+        self.profiler = profiler or request_profiler
+        self.authorize = authorize
+
+    def _trigger(self, scope) -> Optional[str]:
+        headers = dict(scope["headers"])
+        requested = headers.get(b"x-profile", b"").decode("latin-1").lower() in _TRUE
+        query = scope.get("query_string", b"")
+        if not requested and b"profile=" in query:
+            values = parse_qs(query.decode("latin-1")).get("profile", [])
+            requested = any(value.lower() in _TRUE for value in values)
+        if requested:
+            token = headers.get(b"x-admin-token")
+            return "request" if self.authorize(token.decode("latin-1") if token is not None else None) else None
+        rate = self.profiler.sample_rate
+        if rate > 0 and not scope["path"].startswith(PROFILES_PATH) and random.random() < rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        profile_id = self.profiler.try_begin() if trigger is not None else None
+        if profile_id is None:
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", b"%d" % profile_id)]}
+            await send(message)
+
+        capture = _Capture()
+        token = _capture.set(capture)
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        loop_profile = cProfile.Profile()
+        loop_profile.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            loop_profile.disable()
+            elapsed = time.perf_counter() - started
+            _capture.reset(token)
+            capture.add(loop_profile)
+            result: Optional[RequestProfile] = None
+            try:
+                stats, threads = capture.merged()
+                result = RequestProfile(
+                    id=profile_id,
+                    method=scope["method"],
+                    path=scope["path"],
+                    status=status["code"],
+                    trigger=trigger,
+                    started_at=started_at,
+                    duration_s=elapsed,
+                    threads=threads,
+                    stats=stats,
+                )
+            finally:
+                self.profiler.finish(result)
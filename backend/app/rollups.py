@@ -0,0 +1,293 @@
+"""Incrementally maintained delay rollups for dashboard statistics.
+
+Every insert of a record (actual ``delay_minutes``) or prediction
+(``predicted_delay``) adds its value to one ``DelayRollup`` row in the same
+transaction, keyed by route, hour bucket and weather. Statistics endpoints
+then aggregate rollup rows instead of raw records, so their cost depends on
+the number of buckets, not the number of rows.
+"""
+
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import case, delete, extract, func
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from .archive import get_archive
+from .models import DelayRollup, Prediction, Record
+
+logger = logging.getLogger(__name__)
+
+METRIC_ACTUAL = "actual"
+METRIC_PREDICTED = "predicted"
+METRICS = (METRIC_ACTUAL, METRIC_PREDICTED)
+GROUPINGS = ("route", "hour", "weather", "bucket")
+
+BucketKey = Tuple[str, datetime, str]
+RollupKey = Tuple[str, datetime, str, str]
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    """Truncate a timestamp to the start of its hour."""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class RollupDeltas:
+    """Aggregates of new values per rollup key, ready to be added to the table."""
+
+    def __init__(self) -> None:
+        self.rows: Dict[RollupKey, List[float]] = {}
+
+    def add(self, route_id: str, scheduled_time: datetime, weather: str, metric: str, value: Optional[float]) -> None:
+        if value is None or scheduled_time is None:
+            return
+        value = float(value)
+        key = (route_id, hour_bucket(scheduled_time), weather, metric)
+        acc = self.rows.get(key)
+        if acc is None:
+            self.rows[key] = [1, value, value * value, value, value]
+        else:
+            acc[0] += 1
+            acc[1] += value
+            acc[2] += value * value
+            acc[3] = min(acc[3], value)
+            acc[4] = max(acc[4], value)
+
+    def as_rows(self) -> List[dict]:
+        return [
+            {
+                "route_id": route_id,
+                "bucket": bucket,
+                "weather": weather,
+                "metric": metric,
+                "count": count,
+                "value_sum": total,
+                "value_sum_sq": total_sq,
+                "value_min": low,
+                "value_max": high,
+            }
+            for (route_id, bucket, weather, metric), (count, total, total_sq, low, high) in self.rows.items()
+        ]
+
+
+def record_deltas(records: Iterable[Record]) -> RollupDeltas:
+    """Return rollup deltas for the actual delays of ``records``."""
+    deltas = RollupDeltas()
+    for record in records:
+        deltas.add(record.route_id, record.scheduled_time, record.weather, METRIC_ACTUAL, record.delay_minutes)
+    return deltas
+
+
+def prediction_deltas(session: Session, predictions: Sequence[Tuple[int, float]]) -> RollupDeltas:
+    """Return rollup deltas for ``(record_id, predicted_delay)`` pairs, loading record keys in one query."""
+    deltas = RollupDeltas()
+    if not predictions:
+        return deltas
+    keys = {
+        record_id: (route_id, scheduled_time, weather)
+        for record_id, route_id, scheduled_time, weather in session.exec(
+            select(Record.id, Record.route_id, Record.scheduled_time, Record.weather).where(
+                Record.id.in_({record_id for record_id, _ in predictions})
+            )
+        )
+    }
+    for record_id, predicted_delay in predictions:
+        key = keys.get(record_id)
+        if key is not None:
+            deltas.add(*key, METRIC_PREDICTED, predicted_delay)
+    return deltas
+
+
+def apply_deltas(session: Session, deltas: RollupDeltas) -> None:
+    """Add ``deltas`` to the rollup table inside the caller's transaction.
+
+    SQLite and PostgreSQL use one atomic ``INSERT .. ON CONFLICT DO UPDATE``
+    so concurrent workers never lose increments.
+    """
+    rows = deltas.as_rows()
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        table = DelayRollup.__table__
+        statement = dialect_insert(table)
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.route_id, table.c.bucket, table.c.weather, table.c.metric],
+            set_={
+                "count": table.c.count + excluded.count,
+                "value_sum": table.c.value_sum + excluded.value_sum,
+                "value_sum_sq": table.c.value_sum_sq + excluded.value_sum_sq,
+                "value_min": case((excluded.value_min < table.c.value_min, excluded.value_min), else_=table.c.value_min),
+                "value_max": case((excluded.value_max > table.c.value_max, excluded.value_max), else_=table.c.value_max),
+            },
+        )
+        session.execute(statement, rows)
+        return
+    for row in rows:
+        key = (row["route_id"], row["bucket"], row["weather"], row["metric"])
+        rollup = session.get(DelayRollup, key)
+        if rollup is None:
+            session.add(DelayRollup(**row))
+            continue
+        rollup.count += row["count"]
+        rollup.value_sum += row["value_sum"]
+        rollup.value_sum_sq += row["value_sum_sq"]
+        rollup.value_min = min(rollup.value_min, row["value_min"])
+        rollup.value_max = max(rollup.value_max, row["value_max"])
+        session.add(rollup)
+    session.flush()
+
+
+def bucket_key(record: Record) -> BucketKey:
+    """Return the route/bucket/weather key a record contributes to."""
+    return record.route_id, hour_bucket(record.scheduled_time), record.weather
+
+
+def recompute_buckets(session: Session, keys: Set[BucketKey]) -> None:
+    """Rebuild the given buckets (both metrics) from the source tables.
+
+    Used when values are changed or removed, since min/max cannot be
+    decremented. Archived records in the bucket are included. Runs inside
+    the caller's transaction.
+    """
+    archive = get_archive(session)
+    for route_id, bucket, weather in keys:
+        in_bucket = (
+            Record.route_id == route_id,
+            Record.weather == weather,
+            Record.scheduled_time >= bucket,
+            Record.scheduled_time < bucket + timedelta(hours=1),
+        )
+        session.execute(
+            delete(DelayRollup).where(
+                DelayRollup.route_id == route_id, DelayRollup.bucket == bucket, DelayRollup.weather == weather
+            )
+        )
+        deltas = RollupDeltas()
+        for scheduled_time, delay in session.exec(
+            select(Record.scheduled_time, Record.delay_minutes).where(*in_bucket, Record.delay_minutes.is_not(None))
+        ):
+            deltas.add(route_id, scheduled_time, weather, METRIC_ACTUAL, delay)
+        for scheduled_time, predicted in session.exec(
+            select(Record.scheduled_time, Prediction.predicted_delay)
+            .join(Prediction, Prediction.record_id == Record.id)
+            .where(*in_bucket)
+        ):
+            deltas.add(route_id, scheduled_time, weather, METRIC_PREDICTED, predicted)
+        for record, predictions in archive.iter_records(bucket, bucket + timedelta(hours=1)):
+            if record.route_id == route_id and record.weather == weather:
+                _add_archived(deltas, record, predictions)
+        apply_deltas(session, deltas)
+
+
+def _add_archived(deltas: RollupDeltas, record: Record, predictions: Iterable[Prediction]) -> None:
+    if record.delay_minutes is not None:
+        deltas.add(record.route_id, record.scheduled_time, record.weather, METRIC_ACTUAL, record.delay_minutes)
+    for prediction in predictions:
+        deltas.add(record.route_id, record.scheduled_time, record.weather, METRIC_PREDICTED, prediction.predicted_delay)
+
+
+def rebuild_rollups(session: Session, batch_size: int = 5000) -> int:
+    """Recompute the whole rollup table from records, predictions and the archive; return its row count."""
+    session.execute(delete(DelayRollup))
+    deltas = RollupDeltas()
+    statement = select(Record.route_id, Record.scheduled_time, Record.weather, Record.delay_minutes).where(
+        Record.delay_minutes.is_not(None)
+    )
+    for route_id, scheduled_time, weather, delay in session.exec(statement.execution_options(yield_per=batch_size)):
+        deltas.add(route_id, scheduled_time, weather, METRIC_ACTUAL, delay)
+    statement = select(Record.route_id, Record.scheduled_time, Record.weather, Prediction.predicted_delay).join(
+        Prediction, Prediction.record_id == Record.id
+    )
+    for route_id, scheduled_time, weather, predicted in session.exec(
+        statement.execution_options(yield_per=batch_size)
+    ):
+        deltas.add(route_id, scheduled_time, weather, METRIC_PREDICTED, predicted)
+    for record, predictions in get_archive(session).iter_records():
+        _add_archived(deltas, record, predictions)
+    apply_deltas(session, deltas)
+    session.commit()
+    return len(deltas.rows)
+
+
+def ensure_rollups(engine: Engine) -> None:
+    """Backfill the rollup table once for databases that predate it."""
+    with Session(engine) as session:
+        if session.exec(select(DelayRollup.route_id).limit(1)).first() is not None:
+            return
+        if session.exec(select(Record.id).limit(1)).first() is None:
+            return
+        rows = rebuild_rollups(session)
+    logger.info("Backfilled %s delay rollup rows", rows)
+
+
+def query_stats(
+    session: Session,
+    group_by: str,
+    metric: str = METRIC_ACTUAL,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    route_id: Optional[str] = None,
+    weather: Optional[str] = None,
+) -> List[Dict[str, object]]:
+    """Aggregate rollup rows by route, hour of day, weather or hour bucket.
+
+    Rollups only resolve whole hours, so ``start``/``end`` are widened to
+    hour boundaries: the hour containing ``start`` is included, and ``end`` is
+    rounded up so a partial last hour counts whole (``end`` itself stays
+    exclusive when it falls on the hour). ``std`` is the population standard
+    deviation; rounding in ``E[x^2] - mean^2`` is clamped at zero, and groups
+    whose values are all equal report exactly zero.
+    """
+    group = {
+        "route": DelayRollup.route_id,
+        "hour": extract("hour", DelayRollup.bucket),
+        "weather": DelayRollup.weather,
+        "bucket": DelayRollup.bucket,
+    }[group_by].label("group")
+    statement = select(
+        group,
+        func.sum(DelayRollup.count),
+        func.sum(DelayRollup.value_sum),
+        func.sum(DelayRollup.value_sum_sq),
+        func.min(DelayRollup.value_min),
+        func.max(DelayRollup.value_max),
+    ).where(DelayRollup.metric == metric)
+    if start is not None:
+        statement = statement.where(DelayRollup.bucket >= hour_bucket(start))
+    if end is not None:
+        end_bucket = hour_bucket(end)
+        if end_bucket < end:
+            end_bucket += timedelta(hours=1)
+        statement = statement.where(DelayRollup.bucket < end_bucket)
+    if route_id is not None:
+        statement = statement.where(DelayRollup.route_id == route_id)
+    if weather is not None:
+        statement = statement.where(DelayRollup.weather == weather)
+    statement = statement.group_by(group).order_by(group)
+
+    results = []
+    for key, count, total, total_sq, low, high in session.exec(statement):
+        if not count:
+            continue
+        mean = total / count
+        variance = 0.0 if low == high else max(total_sq / count - mean * mean, 0.0)
+        results.append(
+            {
+                group_by: int(key) if group_by == "hour" else key,
+                "count": int(count),
+                "mean": mean,
+                "std": math.sqrt(variance),
+                "min": low,
+                "max": high,
+            }
+        )
+    return results
@@ -55,6 +55,14 @@ class HealthOut(BaseModel):
     status: str
     model_loaded: bool
     model_path: str
+    model_version: Optional[str] = None
+    model_load_seconds: Optional[float] = Field(None, description="Time spent deserializing the loaded model")
+    model_mmap_mode: Optional[str] = None
+    worker_pid: Optional[int] = None
+    rss_bytes: Optional[int] = Field(None, description="Resident memory of this worker process")
+    rss_shared_bytes: Optional[int] = Field(
+        None, description="Part of rss_bytes backed by files or shared memory (includes mmapped model arrays)"
+    )
 
 
 class PredictionWithRecord(BaseModel):
@@ -0,0 +1,265 @@
+"""Incremental CSV / NDJSON ingestion in bounded-size chunks."""
+
+import csv
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlmodel import Session
+
+from .cleaning import clean_records_bulk
+from .crud import create_records_bulk
+from .executors import run_db
+from .model_server import model_server
+from .prediction_worker import prediction_worker
+from .schemas import RecordIn
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+REQUIRED_CSV_COLUMNS = ("route_id", "scheduled_time", "weather")
+_RECORD_FIELDS = tuple(RecordIn.__fields__)
+INVALID_UTF8 = "line is not valid UTF-8"
+
+
+class StreamFormatError(ValueError):
+    """Raised when an upload cannot be parsed at all (e.g. a CSV without required columns)."""
+
+
+@dataclass
+class IngestJob:
+    """Progress of one streaming upload; rejects beyond ``max_rejects`` are only counted."""
+
+    id: str
+    format: str
+    max_rejects: int = 1000
+    status: str = "running"
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    bytes_read: int = 0
+    rows_read: int = 0
+    ingested: int = 0
+    rejected: int = 0
+    predictions_scheduled: int = 0
+    chunks: int = 0
+    error: Optional[str] = None
+    rejects: List[Dict[str, Any]] = field(default_factory=list)
+
+    def reject(self, line: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.rejects) < self.max_rejects:
+            self.rejects.append({"line": line, "error": error})
+
+    def summary(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["rejects_truncated"] = self.rejected > len(self.rejects)
+        return data
+
+
+class IngestJobRegistry:
+    """Keeps the most recent jobs so progress can be polled while uploads run."""
+
+    def __init__(self, max_jobs: int = 50) -> None:
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, fmt: str, job_id: Optional[str] = None, max_rejects: int = 1000) -> IngestJob:
+        job = IngestJob(id=job_id or uuid.uuid4().hex, format=fmt, max_rejects=max_rejects)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._jobs.move_to_end(job.id)
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+
+# Shared job registry
+ingest_jobs = IngestJobRegistry()
+
+
+def _decode_line(raw: bytes, first: bool) -> Optional[str]:
+    try:
+        return raw.decode("utf-8-sig" if first else "utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        return None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], job: IngestJob) -> AsyncIterator[Tuple[int, Optional[str]]]:
+    """Yield ``(line_number, text)`` from a byte stream, holding at most one partial line.
+
+    Lines that are not valid UTF-8 are yielded with ``text`` None so the row can be rejected.
+    """
+    pending = b""
+    line_number = 0
+    first = True
+    async for chunk in chunks:
+        job.bytes_read += len(chunk)
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for raw in lines:
+            line_number += 1
+            text = _decode_line(raw, first)
+            first = False
+            yield line_number, text
+    if pending:
+        yield line_number + 1, _decode_line(pending, first)
+
+
+def _normalize_csv_value(name: str, value: Optional[str]) -> Any:
+    if value is None or value == "":
+        return None
+    if name == "passenger_count":
+        # Exports write counts as floats ("250.0"); keep non-integral values for cleaning to reject.
+        try:
+            number = float(value)
+        except ValueError:
+            return value
+        return int(number) if number.is_integer() else value
+    return value
+
+
+async def iter_csv_rows(lines: AsyncIterator[Tuple[int, Optional[str]]]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield ``(line_number, payload dict or error string)`` for each CSV record.
+
+    Quoted fields may span lines; a record is complete once its quotes balance.
+    """
+    header: Optional[List[str]] = None
+    buffered: List[str] = []
+    start = 0
+    async for line_number, text in lines:
+        if text is None:
+            if header is None:
+                raise StreamFormatError("CSV header is not valid UTF-8")
+            # A bad line inside a quoted field rejects the whole record.
+            yield (start if buffered else line_number), INVALID_UTF8
+            buffered = []
+            continue
+        if not buffered:
+            start = line_number
+            if not text.strip():
+                continue
+        buffered.append(text)
+        joined = "\n".join(buffered)
+        if joined.count('"') % 2:
+            continue
+        buffered = []
+        try:
+            values = next(csv.reader([joined]))
+        except csv.Error as exc:
+            yield start, f"invalid CSV: {exc}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            missing = [name for name in REQUIRED_CSV_COLUMNS if name not in header]
+            if missing:
+                raise StreamFormatError(f"CSV header is missing required columns: {', '.join(missing)}")
+            continue
+        if len(values) != len(header):
+            yield start, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        row = dict(zip(header, values))
+        yield start, {name: _normalize_csv_value(name, row.get(name)) for name in _RECORD_FIELDS}
+    if buffered:
+        yield start, "unterminated quoted field"
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[Tuple[int, Optional[str]]]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield ``(line_number, payload dict or error string)`` for each NDJSON line."""
+    async for line_number, text in lines:
+        if text is None:
+            yield line_number, INVALID_UTF8
+            continue
+        if not text.strip():
+            continue
+        try:
+            payload = json.loads(text)
+        except ValueError as exc:
+            yield line_number, f"invalid JSON: {exc}"
+            continue
+        if not isinstance(payload, dict):
+            yield line_number, "expected a JSON object"
+            continue
+        yield line_number, payload
+
+
+def _store_chunk(session: Session, records: List[RecordIn]) -> Tuple[List[int], Dict[int, str]]:
+    """Clean and insert one chunk; runs on the DB pool.
+
+    Returns the new record ids and, by position in ``records``, the rows cleaning rejected.
+    """
+    rejects: Dict[int, str] = {}
+    cleaned = clean_records_bulk(records, session, rejects)
+    return [record.id for record in create_records_bulk(session, cleaned)], rejects
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in exc.errors())
+
+
+async def ingest_stream(
+    chunks: AsyncIterator[bytes], job: IngestJob, session: Session, chunk_size: int = 1000
+) -> IngestJob:
+    """Parse, validate, clean and insert an upload ``chunk_size`` rows at a time.
+
+    Each chunk is committed on its own, so rows stored before a failure stay
+    stored; the job records how far the upload got.
+    """
+    parse_rows = iter_csv_rows if job.format == "csv" else iter_ndjson_rows
+    batch: List[RecordIn] = []
+    batch_lines: List[int] = []
+
+    async def flush() -> None:
+        ids, rejects = await run_db(_store_chunk, session, batch)
+        for position, error in sorted(rejects.items()):
+            job.reject(batch_lines[position], error)
+        job.ingested += len(ids)
+        job.chunks += 1
+        if model_server.loaded:
+            job.predictions_scheduled += prediction_worker.submit(ids)
+        batch.clear()
+        batch_lines.clear()
+
+    try:
+        async for line_number, row in parse_rows(iter_lines(chunks, job)):
+            job.rows_read += 1
+            if isinstance(row, str):
+                job.reject(line_number, row)
+                continue
+            try:
+                batch.append(RecordIn(**row))
+            except ValidationError as exc:
+                job.reject(line_number, _format_validation_error(exc))
+                continue
+            batch_lines.append(line_number)
+            if len(batch) >= chunk_size:
+                await flush()
+        if batch:
+            await flush()
+        job.status = "completed"
+    except Exception as exc:
+        job.status = "failed"
+        job.error = str(exc)
+        if not isinstance(exc, StreamFormatError):
+            logger.exception("Streaming ingest %s failed after %s rows", job.id, job.rows_read)
+        raise
+    finally:
+        job.finished_at = datetime.utcnow()
+    logger.info(
+        "Streaming ingest %s: %s rows, %s ingested, %s rejected", job.id, job.rows_read, job.ingested, job.rejected
+    )
+    return job
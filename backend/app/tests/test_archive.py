@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, SQLModel, create_engine, func, select
+
+from app.archive import archive_before, get_archive
+from app.crud import (
+    apply_record_update,
+    create_predictions_bulk,
+    create_records_bulk,
+    get_record,
+    list_predictions_with_records,
+    list_records,
+)
+from app.models import DelayRollup, Record
+from app.rollups import rebuild_rollups
+
+
+def _cleaned(i):
+    scheduled = datetime(2025, 1, 1, 6) + timedelta(minutes=25 * (i % 40))
+    return {
+        "route_id": f"R{i % 3 + 1}",
+        "scheduled_time": scheduled,
+        "actual_time": scheduled + timedelta(minutes=i % 40),
+        "weather": ["sunny", "rainy"][i % 2],
+        "passenger_count": None if i % 7 == 0 else 10 + i,
+        "cleaned": True,
+        "delay_minutes": float(i % 40),
+        "created_at": datetime(2025, 1, 1) + timedelta(days=i),
+    }
+
+
+def _rollups(session):
+    return sorted(
+        (r.route_id, r.bucket, r.weather, r.metric, r.count, round(r.value_sum, 6), r.value_min, r.value_max)
+        for r in session.exec(select(DelayRollup)).all()
+    )
+
+
+def _pages(fetch, key):
+    rows, cursor = [], None
+    while True:
+        page = fetch(cursor)
+        rows += page
+        if len(page) < 7:
+            return rows
+        cursor = key(page[-1])
+
+
+def test_archived_months_stay_queryable(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'hot.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        records = create_records_bulk(session, [_cleaned(i) for i in range(120)])
+        create_predictions_bulk(session, [(r.id, r.delay_minutes + 1) for r in records[::2]], "v1")
+        create_predictions_bulk(session, [(r.id, r.delay_minutes + 2) for r in records[::3]], "v2")
+        expected_records = [r.id for r in list_records(session, limit=500)]
+        expected_predictions = [(p.id, r.id) for p, r in list_predictions_with_records(session, limit=500)]
+        expected_rollups = _rollups(session)
+
+    written = archive_before(engine, datetime(2025, 3, 15))
+    assert [part.month for part in written] == ["2025-01", "2025-02"]
+
+    with Session(engine) as session:
+        assert session.exec(select(func.count()).select_from(Record)).one() == 120 - 59
+        assert get_archive(session).counts()[0] == 59
+        archived = get_record(session, records[3].id)
+        assert archived.dict() == records[3].dict()
+
+        by_cursor = _pages(
+            lambda cursor: list_records(session, limit=7, after=cursor), lambda r: (r.created_at, r.id)
+        )
+        assert [r.id for r in by_cursor] == expected_records
+        assert [r.id for r in list_records(session, limit=10, offset=55)] == expected_records[55:65]
+
+        predictions = _pages(
+            lambda cursor: list_predictions_with_records(session, limit=7, before=cursor),
+            lambda row: (row[0].created_at, row[0].id),
+        )
+        assert [(p.id, r.id) for p, r in predictions] == expected_predictions
+        page = list_predictions_with_records(session, limit=5, offset=30)
+        assert [(p.id, r.id) for p, r in page] == expected_predictions[30:35]
+
+        # Rollups keep archived history, survive a rebuild, and a bucket
+        # recomputed after an update still counts its archived records.
+        assert _rollups(session) == expected_rollups
+        rebuild_rollups(session)
+        assert _rollups(session) == expected_rollups
+        hot = session.get(Record, records[80].id)
+        apply_record_update(session, hot, {"delay_minutes": hot.delay_minutes})
+        assert _rollups(session) == expected_rollups
+
+
+def test_passenger_stats_seed_includes_archived_rows(tmp_path):
+    from app.passenger_stats import PassengerStats
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        create_records_bulk(session, [_cleaned(i) for i in range(90)])
+        before = PassengerStats()
+        before.seed(session)
+    archive_before(engine, datetime(2025, 3, 1))
+    with Session(engine) as session:
+        assert session.exec(select(func.count()).select_from(Record)).one() < 90
+        after = PassengerStats()
+        after.seed(session)
+    assert after.overall.total == before.overall.total
+    for route_id, hour in (("R1", None), ("R2", 6), ("R3", 9), (None, None)):
+        assert after.median(route_id, hour) == before.median(route_id, hour)
+
+
+def test_ids_are_not_reused_after_archiving_everything(tmp_path):
+    from sqlalchemy import text
+    from sqlalchemy.schema import CreateTable
+
+    from app.archive import reserve_archived_ids
+    from app.db import ensure_autoincrement, ensure_indexes
+    from app.models import Prediction
+
+    for legacy in (False, True):
+        engine = create_engine(f"sqlite:///{tmp_path / f'ids-{legacy}.db'}")
+        if legacy:  # tables created before AUTOINCREMENT was declared
+            with engine.begin() as conn:
+                for table in (Record.__table__, Prediction.__table__):
+                    create = str(CreateTable(table).compile(dialect=engine.dialect))
+                    conn.exec_driver_sql(create.replace(" AUTOINCREMENT", ""))
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            records = create_records_bulk(session, [_cleaned(i) for i in range(10)])
+            create_predictions_bulk(session, [(r.id, 1.0) for r in records], "v1")
+        archive_before(engine, datetime(2025, 6, 1))
+        if legacy:  # startup migration
+            ensure_autoincrement(engine)
+            ensure_indexes(engine)
+            reserve_archived_ids(engine)
+            with engine.connect() as conn:
+                schema = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'record'")).scalar()
+            assert "AUTOINCREMENT" in schema
+
+        with Session(engine) as session:
+            assert session.exec(select(func.count()).select_from(Record)).one() == 0
+            new = create_records_bulk(session, [_cleaned(i) for i in range(3)])
+            create_predictions_bulk(session, [(r.id, 2.0) for r in new], "v1")
+            ids = [r.id for r in list_records(session, limit=100)]
+            assert len(ids) == 13 and len(set(ids)) == 13
+            assert min(r.id for r in new) > max(r.id for r in records)
+            prediction_ids = [p.id for p, _ in list_predictions_with_records(session, limit=100)]
+            assert len(set(prediction_ids)) == 13
+            assert get_record(session, records[0].id).dict() == records[0].dict()
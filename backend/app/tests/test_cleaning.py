@@ -0,0 +1,41 @@
+import pandas as pd
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.cleaning import clean_record, clean_records_bulk
+
+
+def test_bulk_cleaning_matches_clean_record():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    payloads = [
+        {"route_id": "Route-04", "scheduled_time": "2025-12-07 08:30", "actual_time": "8.45AM",
+         "weather": "Clody", "passenger_count": 250, "latitude": 999, "longitude": 30},
+        {"route_id": "3", "scheduled_time": "08:30", "actual_time": "0850",
+         "weather": "sun", "passenger_count": 12, "latitude": 25.7, "longitude": 32.64},
+        {"route_id": "R2", "scheduled_time": "2025-12-07T21:15:30", "actual_time": "Dec 7 2025 9:40pm",
+         "weather": "hail", "passenger_count": None, "latitude": None, "longitude": -181},
+        {"route_id": "bus", "scheduled_time": "not a time", "actual_time": None,
+         "weather": " RAINY ", "passenger_count": 0, "latitude": -90, "longitude": 180},
+    ]
+    with Session(engine) as session:
+        expected = [clean_record(payload, session) for payload in payloads]
+        assert clean_records_bulk(payloads, session) == expected
+        assert clean_records_bulk(pd.DataFrame(payloads), session) == expected
+
+
+def test_timestamp_parser_tiers_match_dateutil():
+    from dateutil import parser as dateutil_parser
+
+    from app.datetime_parsing import TimestampParser
+
+    parser = TimestampParser(cache_size=8)
+    values = ["2025-12-07 08:30", "12/07/2025 08:30", "12/08/2025 09:15", "Dec 7 2025 10am", "2025-12-07 08:30"]
+    for value in values:
+        assert parser.parse(value, source="scheduled_time") == dateutil_parser.parse(value)
+
+    hits = parser.stats()["hits"]
+    assert hits["iso"] == 1
+    assert hits["known_format"] == 1
+    assert hits["learned_format"] == 1
+    assert hits["dateutil"] == 1
+    assert hits["cache"] == 1
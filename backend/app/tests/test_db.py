@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import text
+
+from app.db import build_engine
+
+
+def test_tuned_profile_sets_sqlite_pragmas(tmp_path, monkeypatch):
+    tuned = build_engine(f"sqlite:///{tmp_path / 'tuned.db'}", "tuned")
+    default = build_engine(f"sqlite:///{tmp_path / 'default.db'}", "default")
+
+    with tuned.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 2  # FULL unless opted out
+    with default.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+
+    monkeypatch.setattr("app.db.SQLITE_SYNCHRONOUS", "NORMAL")
+    with build_engine(f"sqlite:///{tmp_path / 'normal.db'}", "tuned").connect() as conn:
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+
+    with pytest.raises(ValueError):
+        build_engine(f"sqlite:///{tmp_path / 'x.db'}", "fast")
+    monkeypatch.setattr("app.db.SQLITE_SYNCHRONOUS", "FAST")
+    with pytest.raises(ValueError):
+        build_engine(f"sqlite:///{tmp_path / 'x.db'}", "tuned")
+
+
+def test_tuned_sqlite_pool_never_waits_for_a_connection(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.db.DB_POOL_SIZE", 2)
+    engine = build_engine(f"sqlite:///{tmp_path / 'pool.db'}", "tuned")
+
+    # More concurrent sessions than DB_POOL_SIZE + DB_MAX_OVERFLOW, as sync endpoints and streams can hold
+    connections = [engine.connect() for _ in range(20)]
+    assert all(conn.execute(text("SELECT 1")).scalar() == 1 for conn in connections)
+    for conn in connections:
+        conn.close()
+    assert engine.pool.checkedin() == 2
+
+
+def test_bulk_insert_fits_sqlite_bind_parameter_limit(tmp_path):
+    import sqlite3
+    from datetime import datetime
+
+    from sqlalchemy import event
+    from sqlmodel import Session, SQLModel, create_engine
+
+    from app.crud import create_records_bulk
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'limit.db'}")
+
+    @event.listens_for(engine, "connect")
+    def _old_sqlite_limit(dbapi_connection, connection_record):
+        # Emulate SQLite < 3.32, where SQLITE_MAX_VARIABLE_NUMBER defaults to 999.
+        dbapi_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+
+    SQLModel.metadata.create_all(engine)
+    rows = [
+        {"route_id": "R1", "scheduled_time": datetime(2025, 1, 1, 8), "weather": "sunny", "passenger_count": i}
+        for i in range(600)
+    ]
+    with Session(engine) as session:
+        records = create_records_bulk(session, rows)
+    assert [record.id for record in records] == list(range(1, 601))
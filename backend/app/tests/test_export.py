@@ -0,0 +1,118 @@
+import csv
+import gzip
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from app import archive as archive_module
+from app import export
+from app.archive import archive_before, get_archive
+from app.crud import create_predictions_bulk, create_records_bulk
+from app.export import ExportFormatError, ExportQuery, get_format, stream_export
+
+
+def _cleaned(i):
+    scheduled = datetime(2025, 1, 1, 6) + timedelta(hours=i)
+    return {
+        "route_id": f"R{i % 2 + 1}",
+        "scheduled_time": scheduled,
+        "actual_time": scheduled + timedelta(minutes=i % 30),
+        "weather": "sunny",
+        "passenger_count": None if i % 5 == 0 else i,
+        "cleaned": True,
+        "delay_minutes": float(i % 30),
+        "created_at": datetime(2025, 1, 1) + timedelta(days=i),
+    }
+
+
+def _read_csv(chunks):
+    with gzip.open(io.BytesIO(b"".join(chunks)), "rt", newline="") as handle:
+        return list(csv.DictReader(handle))
+
+
+def test_csv_export_covers_hot_and_archived_rows(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        records = create_records_bulk(session, [_cleaned(i) for i in range(60)])
+        create_predictions_bulk(session, [(r.id, 1.5) for r in records[::3]], "v1")
+    archive_before(engine, datetime(2025, 2, 1))
+
+    decoded = []
+    original_decode = archive_module._decode
+
+    def spy_decode(prefix, model, columns, index):
+        rows = original_decode(prefix, model, columns, index)
+        decoded.append((prefix, len(rows)))
+        return rows
+
+    monkeypatch.setattr(archive_module, "_decode", spy_decode)
+    fmt = get_format("csv.gz")
+    with Session(engine) as session:
+        rows = _read_csv(stream_export(session, ExportQuery(), fmt, batch_size=7))
+        # Archived months are decoded a batch at a time and kept out of the partition cache.
+        assert decoded and max(count for prefix, count in decoded if prefix == "record") <= 7
+        assert not get_archive(session)._cache
+        assert sorted(int(row["record_id"]) for row in rows) == [r.id for r in records]
+        assert sum(row["prediction_id"] != "" for row in rows) == 20
+        assert rows[0]["passenger_count"] == "" and rows[0]["scheduled_time"] == "2025-01-01 06:00:00"
+
+        query = ExportQuery(
+            start=datetime(2025, 1, 1, 10), end=datetime(2025, 1, 3, 10), route_id="R2", include_predictions=False
+        )
+        rows = _read_csv(stream_export(session, query, fmt, batch_size=7))
+        assert [int(row["record_id"]) for row in rows] == [r.id for r in records if 4 <= r.id - 1 < 52 and r.id % 2 == 0]
+        assert "prediction_id" not in rows[0]
+
+
+def test_unknown_or_unavailable_format_is_rejected(monkeypatch):
+    with pytest.raises(ExportFormatError):
+        get_format("xlsx")
+    monkeypatch.setattr(export, "pa", None)
+    with pytest.raises(ExportFormatError):
+        get_format("parquet")
+    assert export.default_format() == "csv.gz"
+
+
+@pytest.mark.parametrize("name", ["parquet", "arrow"])
+def test_arrow_formats_round_trip(tmp_path, name):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        records = create_records_bulk(session, [_cleaned(i) for i in range(30)])
+        create_predictions_bulk(session, [(r.id, 1.5) for r in records[::3]], "v1")
+        data = b"".join(stream_export(session, ExportQuery(), get_format(name), batch_size=7))
+
+    if name == "parquet":
+        table = pq.read_table(io.BytesIO(data))
+    else:
+        table = pa.ipc.open_stream(data).read_all()
+    assert table.num_rows == 30
+    assert table.column_names == list(export.RECORD_COLUMNS + export.PREDICTION_COLUMNS)
+    assert table.schema.field("record_id").type == pa.int64()
+    assert table.schema.field("scheduled_time").type == pa.timestamp("us")
+    assert table.schema.field("passenger_count").type == pa.int64()
+    assert table.schema.field("predicted_delay").type == pa.float64()
+    assert table.column("prediction_id").null_count == 20
+    assert sorted(table.column("record_id").to_pylist()) == [r.id for r in records]
+
+
+def test_endpoint_answers_400_without_pyarrow(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.api import deps
+    from app.main import app
+
+    monkeypatch.setattr(deps, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(export, "pa", None)
+    response = TestClient(app).get(
+        "/api/v1/export/records", params={"format": "parquet"}, headers={"X-Admin-Token": "secret"}
+    )
+    assert response.status_code == 400
+    assert "requires pyarrow" in response.json()["detail"]
@@ -4,6 +4,13 @@ from sqlmodel import Session, SQLModel, create_engine
 
 from app import db
 from app.main import app
+from app.model_server import LoadedModel, model_server
+from app.prediction_worker import prediction_worker
+
+
+class DummyModel:
+    def predict(self, X):
+        return [0 for _ in range(len(X))]
 
 
 @pytest.fixture
@@ -41,5 +48,124 @@ def test_ingest_cleans_and_imputes(client: TestClient):
     assert record["latitude"] is None
 
 
+def test_batch_ingest_inserts_all_records(client: TestClient):
+    payload = [
+        {
+            "route_id": f"R{i % 4 + 1}",
+            "scheduled_time": "2025-12-07 08:30",
+            "actual_time": "2025-12-07 08:45",
+            "weather": "sunny",
+            "passenger_count": i % 200,
+            "latitude": 25.7,
+            "longitude": 32.64,
+        }
+        for i in range(1200)
+    ]
+    response = client.post("/api/v1/records/batch_ingest", json=payload)
+    assert response.status_code == 202
+    assert response.json()["ingested"] == 1200
+
+    records = client.get("/api/v1/records/", params={"limit": 500, "offset": 700}).json()
+    assert [r["id"] for r in records] == list(range(701, 1201))
+    assert records[-1]["passenger_count"] == 199
+    assert records[-1]["delay_minutes"] == 15.0
+
+
+def test_batch_ingest_predictions_are_stored_by_worker(client: TestClient):
+    model_server._loaded = LoadedModel(model=DummyModel(), version="test")
+    try:
+        payload = [
+            {"route_id": "R1", "scheduled_time": "2025-12-07 18:00", "weather": "rainy", "passenger_count": 40}
+            for _ in range(300)
+        ]
+        response = client.post("/api/v1/records/batch_ingest", json=payload)
+        assert response.json() == {"ingested": 300, "predictions_scheduled": 300}
+        assert prediction_worker.wait_idle(timeout=10)
+    finally:
+        model_server._loaded = None
+
+    metrics = client.get("/api/v1/metrics").json()
+    assert metrics["total_predictions"] == 300
+    assert metrics["last_model_version"] == "test"
+    assert metrics["prediction_worker"]["queue_depth"] == 0
+
+
+def test_records_cursor_pagination_walks_all_pages(client: TestClient):
+    payload = [
+        {"route_id": "R2", "scheduled_time": "2025-12-07 08:30", "weather": "sunny", "passenger_count": 5}
+        for _ in range(25)
+    ]
+    client.post("/api/v1/records/batch_ingest", json=payload)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/records/", params=params)
+        seen.extend(r["id"] for r in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == list(range(1, 26))
+    assert client.get("/api/v1/records/", params={"cursor": "not-a-cursor"}).status_code == 400
+
 
+def test_stream_ingest_csv_in_chunks_reports_rejects(client: TestClient, monkeypatch):
+    from app.api.v1 import ingest
+
+    monkeypatch.setattr(ingest, "STREAM_INGEST_CHUNK_SIZE", 7)
+    model_server._loaded = None
+    lines = ["route_id,scheduled_time,actual_time,weather,passenger_count,latitude,longitude,valid_gps"]
+    lines += [f"R{i % 4 + 1},2025-01-01 08:{i % 60:02d},,\"sunny\",{i % 150}.0,24.5,32.5,True" for i in range(50)]
+    lines.insert(10, 'R1,2025-01-01 08:00,,"multi\nline",3,24.5,32.5,True')
+    lines.insert(20, "R2,2025-01-01 09:00,,cloudy,1,not-a-float,32.5,True")
+    lines.insert(30, "R3,too,few")
+    body = "\n".join(lines).encode()
+
+    def chunks():
+        for start in range(0, len(body), 64):
+            yield body[start:start + 64]
+
+    response = client.post(
+        "/api/v1/records/stream_ingest?job_id=csv-test", content=chunks(), headers={"Content-Type": "text/csv"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "completed"
+    assert data["rows_read"] == 53
+    assert data["ingested"] == 51
+    assert data["chunks"] == 8
+    assert [reject["line"] for reject in data["rejects"]] == [22, 32]
+    assert client.get("/api/v1/records/stream_ingest/jobs/csv-test").json()["ingested"] == 51
+    assert len(client.get("/api/v1/records/?limit=100").json()) == 51
+
+
+def test_stream_ingest_rejects_unparseable_rows_individually(client: TestClient):
+    good = b'{"route_id": "R1", "scheduled_time": "2025-01-01 08:30", "weather": "sunny"}'
+    body = b"\n".join([
+        good,
+        b'{"route_id": "R1", "scheduled_time": "garbage", "weather": "sunny"}',
+        good,
+        b'{"route_id": "R1", "scheduled_time": "25:30", "weather": "sunny"}',
+        b'{"route_id": "R1", "scheduled_time": "2025-01-01 08:30", "weather": "sun\xffny"}',
+        good,
+    ])
+    response = client.post("/api/v1/records/stream_ingest?format=ndjson", content=body)
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["status"], data["ingested"], data["rejected"]) == ("completed", 3, 3)
+    assert sorted(reject["line"] for reject in data["rejects"]) == [2, 4, 5]
+    errors = {reject["line"]: reject["error"] for reject in data["rejects"]}
+    assert errors[2].startswith("scheduled_time") and "hour" in errors[4] and "UTF-8" in errors[5]
+
+
+def test_stream_ingest_ndjson_and_bad_header(client: TestClient):
+    body = '{"route_id": "R1", "scheduled_time": "08:30", "weather": "sunny"}\n{oops}\n[1]\n'
+    response = client.post("/api/v1/records/stream_ingest?format=ndjson", content=body)
+    data = response.json()
+    assert (data["ingested"], data["rejected"]) == (1, 2)
 
+    response = client.post("/api/v1/records/stream_ingest", content="a,b\n1,2\n", headers={"Content-Type": "text/csv"})
+    assert response.status_code == 400
+    response = client.post("/api/v1/records/stream_ingest", content="x")
+    assert response.status_code == 415
@@ -0,0 +1,38 @@
+import pytest
+
+from app.instrumentation import STAGE_ERRORS, STAGE_SECONDS, Instrumentation, stage, timed
+
+
+def test_timed_records_stage_histograms_and_errors():
+    registry = Instrumentation(enabled=True)
+
+    @timed("parse", registry)
+    def parse(value):
+        if value is None:
+            raise ValueError("missing")
+        return int(value)
+
+    assert parse("3") == 3
+    with pytest.raises(ValueError):
+        parse(None)
+    with stage("commit", registry):
+        pass
+
+    text = registry.render({"busdelay_records": ("Stored records", 7)})
+    assert f'{STAGE_SECONDS}_count{{stage="parse"}} 2' in text
+    assert f'{STAGE_SECONDS}_bucket{{stage="parse",le="+Inf"}} 2' in text
+    assert f'{STAGE_SECONDS}_count{{stage="commit"}} 1' in text
+    assert f'{STAGE_ERRORS}{{stage="parse"}} 1' in text
+    assert "# TYPE busdelay_records gauge\nbusdelay_records 7" in text
+
+
+def test_disabled_instrumentation_leaves_functions_untouched():
+    registry = Instrumentation(enabled=False)
+
+    def parse(value):
+        return int(value)
+
+    assert timed("parse", registry)(parse) is parse
+    with stage("commit", registry):
+        pass
+    assert STAGE_SECONDS not in registry.render()
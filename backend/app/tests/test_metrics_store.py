@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.crud import create_prediction, create_record
+from app.metrics_store import MetricsStore, get_metrics_store
+
+
+def test_metrics_counters_persist_and_reconcile(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    SQLModel.metadata.create_all(engine)
+    cleaned = {"route_id": "R1", "scheduled_time": datetime(2025, 1, 1, 8), "weather": "sunny", "passenger_count": 3}
+
+    with Session(engine) as session:
+        record = create_record(session, cleaned)
+        create_prediction(session, record.id, 12.0, "v-test")
+        create_record(session, cleaned)
+        store = get_metrics_store(session)
+        assert store.snapshot() == {"total_records": 2, "total_predictions": 1, "last_model_version": "v-test"}
+        store.flush(session)
+
+        # A second process sharing the database starts from the persisted totals.
+        other = MetricsStore()
+        other.seed(session)
+        assert other.snapshot() == store.snapshot()
+
+        other.record_inserted(5)
+        other.reconcile(session)
+        assert other.snapshot()["total_records"] == 2
@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.micro_batching import MicroBatcher
+
+
+def test_micro_batcher_returns_each_callers_row():
+    calls = []
+
+    def predict_fn(X, use_baseline):
+        calls.append(len(X))
+        return X[:, 0] * (2 if use_baseline else 1)
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_us=20000)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda i: batcher.submit(np.array([float(i), 0.0]), i % 2 == 1), range(64)))
+    finally:
+        batcher.stop()
+
+    assert [float(r[0]) for r in results] == [float(i * (2 if i % 2 else 1)) for i in range(64)]
+    stats = batcher.stats()
+    assert stats["predictions"] == 64
+    assert stats["batches"] < 64
+    assert 0 < stats["avg_batch_fill_ratio"] <= 1
+
+
+def test_stopped_batcher_refuses_rows_and_model_server_falls_back():
+    import pytest
+
+    from app.micro_batching import BatcherClosedError
+    from app.model_server import LoadedModel, ModelServer
+
+    batcher = MicroBatcher(lambda X, use_baseline: X[:, 0], max_batch_size=4, max_wait_us=1000)
+    batcher.stop()
+    batcher.stop()  # idempotent
+    with pytest.raises(BatcherClosedError):
+        batcher.submit(np.array([1.0]))
+
+    class Model:
+        def predict(self, X):
+            return X[:, 0] + 1
+
+    server = ModelServer()
+    server._loaded = LoadedModel(model=Model(), version="v1")
+    server.enable_micro_batching(max_batch_size=4, max_wait_us=1000)
+    stale = server._batcher
+    server.disable_micro_batching()
+    server._batcher = stale  # a request that read the batcher just before it was stopped
+    assert float(server._predict_uncached(np.full((1, 13), 5.0), False)[0]) == 6.0
+
+
+def test_cancelled_row_does_not_stop_the_batcher():
+    import threading
+
+    release = threading.Event()
+
+    def predict_fn(X, use_baseline):
+        release.wait(5)
+        return X[:, 0]
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=1, max_wait_us=0)
+    try:
+        running = batcher.enqueue(np.array([1.0]))
+        cancelled = batcher.enqueue(np.array([2.0]))  # queued behind the blocked batch
+        assert cancelled.cancel()
+        release.set()
+
+        assert float(running.result(timeout=5)[0]) == 1.0
+        assert float(batcher.submit(np.array([3.0]), timeout=5)[0]) == 3.0
+        assert batcher._thread.is_alive()
+    finally:
+        batcher.stop()
+    assert batcher.stats()["predictions"] == 2
@@ -0,0 +1,103 @@
+import joblib
+import numpy as np
+
+from app.model_registry import ModelRegistry, ModelWatcher, activate, file_version, load_initial_model, rollback
+from app.model_server import ModelServer
+
+
+class ConstantModel:
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, X):
+        return np.full(len(X), self.value)
+
+
+def _predict(server):
+    return float(server.predict(np.zeros((1, 13)))[0])
+
+
+def test_publish_activate_and_rollback(tmp_path):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    server = ModelServer()
+    source = tmp_path / "model.joblib"
+
+    joblib.dump(ConstantModel(1.0), source)
+    first = registry.publish(str(source))
+    assert first == file_version(str(source))
+    assert registry.publish(str(source)) == first
+    activate(server, registry, first)
+
+    joblib.dump(ConstantModel(2.0), source)
+    second = registry.publish(str(source))
+    activate(server, registry, second)
+    assert server.model_version == second and _predict(server) == 2.0
+    assert registry.state() == (second, [first])
+    assert [meta["version"] for meta in registry.versions()] == [first, second]
+
+    assert rollback(server, registry) == first
+    assert server.model_version == first and _predict(server) == 1.0
+    assert registry.state() == (first, [])
+
+
+def test_watcher_publishes_changed_file_and_follows_registry(tmp_path):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    server = ModelServer()
+    source = tmp_path / "model.joblib"
+    joblib.dump(ConstantModel(1.0), source)
+    server.load_model(str(source))
+    watcher = ModelWatcher(server, registry, str(source))
+    watcher.tick()
+
+    joblib.dump(ConstantModel(3.0), source)
+    watcher.tick()
+    assert _predict(server) == 3.0
+    assert registry.current() == server.model_version
+
+    # Another worker activates a version; this one follows on its next tick.
+    joblib.dump(ConstantModel(4.0), tmp_path / "other.joblib")
+    other_version = activate(ModelServer(), registry, registry.publish(str(tmp_path / "other.joblib")))
+    watcher.tick()
+    assert server.model_version == other_version
+    assert _predict(server) == 4.0
+
+
+class ArrayModel:
+    def __init__(self, coef):
+        self.coef_ = coef
+
+    def predict(self, X):
+        return X @ self.coef_
+
+
+def test_mmap_mode_serves_model_from_registry(tmp_path):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    server = ModelServer(mmap_mode="r")
+    source = tmp_path / "model.joblib"
+    joblib.dump(ArrayModel(np.ones(13)), source)
+
+    load_initial_model(server, registry, str(source))
+
+    info = server.model_info()
+    assert isinstance(info.model.coef_, np.memmap)
+    assert info.path == registry.path_for(info.version)
+    assert info.mmap_mode == "r" and info.load_seconds >= 0
+    assert float(server.predict(np.ones((1, 13)))[0]) == 13.0
+
+
+def test_admin_endpoints_refuse_without_configured_token(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+
+    from app.api import deps
+    from app.main import app
+
+    client = TestClient(app)
+    monkeypatch.setattr(deps, "ADMIN_TOKEN", None)
+    for path in ("/api/v1/models/reload", "/api/v1/models/activate/abc", "/api/v1/models/rollback"):
+        assert client.post(path, headers={"X-Admin-Token": "anything"}).status_code == 403
+
+    monkeypatch.setattr(deps, "ADMIN_TOKEN", "secret")
+    outside = tmp_path / "evil.joblib"
+    joblib.dump(ConstantModel(1.0), outside)
+    response = client.post("/api/v1/models/reload", json={"path": str(outside)}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 400
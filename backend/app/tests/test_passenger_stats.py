@@ -0,0 +1,19 @@
+import random
+from statistics import median
+
+from app.passenger_stats import PassengerHistogram
+
+
+def test_histogram_median_matches_statistics_median():
+    rng = random.Random(0)
+    histogram = PassengerHistogram()
+    values = []
+    for _ in range(500):
+        value = rng.randint(0, 200)
+        values.append(value)
+        histogram.add(value)
+        assert histogram.median() == int(median(values))
+
+    for value in values[:250]:
+        histogram.remove(value)
+    assert histogram.median() == int(median(values[250:]))
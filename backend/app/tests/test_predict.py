@@ -60,5 +60,40 @@ def test_predict_with_dummy_model(client: TestClient):
     assert data["record_id"] is None
 
 
+def test_linear_fast_path_matches_sklearn():
+    import numpy as np
+    from sklearn.linear_model import LinearRegression, Ridge
+    from sklearn.tree import DecisionTreeRegressor
 
+    from app.model_server import LinearFastPath
 
+    rng = np.random.default_rng(1)
+    X = rng.normal(0, 50, size=(500, 13))
+    y = X @ rng.normal(size=13) + 40
+    model = LinearRegression().fit(X, y)
+
+    fast = LinearFastPath.from_model(model)
+    assert fast is not None
+    assert np.array_equal(fast(X), np.clip(model.predict(X), -60.0, 300.0))
+    assert fast(np.full((1, 13), np.nan)) is None
+    assert LinearFastPath.from_model(Ridge().fit(X, y)) is not None
+    assert LinearFastPath.from_model(DecisionTreeRegressor().fit(X, y)) is None
+
+
+def test_baseline_rules_validate_on_load_and_allow_empty_mappings(tmp_path):
+    import json
+
+    import numpy as np
+
+    from app.model_server import BaselineRules, ModelServer
+
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"weather_severity_adjustments": {}, "time_of_day_adjustments": {}}))
+    server = ModelServer()
+    server.load_baseline_rules(str(path))
+    assert server._baseline_predict(np.zeros((2, 13))).tolist() == [61.0, 61.0]
+
+    for bad in ({"time_of_day_adjustments": {"rush": 5}}, {"weather_severity_adjustments": {"x": 1}}, {"typo": 1}):
+        path.write_text(json.dumps(bad))
+        with pytest.raises(ValueError):
+            BaselineRules.from_file(str(path))
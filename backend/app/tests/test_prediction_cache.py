@@ -0,0 +1,59 @@
+import numpy as np
+
+from app.model_server import LoadedModel, ModelServer
+from app.prediction_cache import PredictionCache
+
+
+class CountingModel:
+    def __init__(self):
+        self.rows = 0
+
+    def predict(self, X):
+        self.rows += len(X)
+        return X[:, 0] + X[:, 6]
+
+
+def _server(cache):
+    server = ModelServer(prediction_cache=cache)
+    model = CountingModel()
+    server._loaded = LoadedModel(model=model, version="v1")
+    return server, model
+
+
+def test_repeat_predictions_hit_cache_and_reload_invalidates():
+    cache = PredictionCache(max_bytes=1 << 20, ttl_s=60, decimals=3)
+    server, model = _server(cache)
+    X = np.zeros((3, 13))
+    X[:, 0] = [8, 9, 8]
+    X[:, 6] = [24.5, 24.5, 24.50001]
+
+    first = server.predict(X)
+    assert model.rows == 3
+    second = server.predict(X)
+    assert model.rows == 3
+    assert np.allclose(first, second)
+    assert second[2] == second[0]  # rows 0 and 2 share a quantized key
+    stats = cache.stats()
+    assert stats["hits"] == 3 and stats["misses"] == 3
+
+    server._loaded = LoadedModel(model=model, version="v2")
+    server.predict(X[:1])
+    assert model.rows == 4
+
+
+def test_cache_respects_memory_bound_and_ttl():
+    cache = PredictionCache(max_bytes=2000, ttl_s=60, decimals=4)
+    keys = cache.keys_for(np.arange(130, dtype=np.float64).reshape(10, 13), "v1", False)
+    cache.store(keys, np.arange(10, dtype=np.float64))
+    stats = cache.stats()
+    assert 0 < stats["entries"] < 10
+    assert stats["approx_bytes"] <= 2000
+    assert stats["evictions"] == 10 - stats["entries"]
+    _, missing = cache.lookup(keys[-1:])
+    assert missing == []
+
+    expiring = PredictionCache(max_bytes=1 << 20, ttl_s=1e-9)
+    expiring.store(keys[:1], np.zeros(1))
+    _, missing = expiring.lookup(keys[:1])
+    assert missing == [0]
+    assert expiring.stats()["expirations"] == 1
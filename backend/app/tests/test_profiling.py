@@ -0,0 +1,68 @@
+import pstats
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import deps
+from app.executors import run_db
+from app.profiling import ProfilingMiddleware, RequestProfiler, profile_sync_endpoints
+
+
+def _blocking_work(n):
+    return sum(i * i for i in range(n))
+
+
+def _app(profiler, authorize=lambda token: token == "secret"):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, profiler=profiler, authorize=authorize)
+
+    @app.get("/async")
+    async def async_endpoint():
+        return {"total": await run_db(_blocking_work, 1000)}
+
+    @app.get("/sync")
+    def sync_endpoint():
+        return {"total": _blocking_work(1000)}
+
+    profile_sync_endpoints(app.routes)
+    return app
+
+
+def test_requested_profiles_cover_worker_threads(tmp_path):
+    profiler = RequestProfiler(capacity=2)
+    client = TestClient(_app(profiler))
+
+    assert "x-profile-id" not in client.get("/async").headers
+    assert "x-profile-id" not in client.get("/async", headers={"X-Profile": "1"}).headers  # no admin token
+    response = client.get("/async", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+    profile = profiler.get(int(response.headers["x-profile-id"]))
+    assert profile.status == 200 and profile.threads == 2
+    assert any("_blocking_work" in row["function"] for row in profile.top(100))
+    assert "_blocking_work" in profile.collapsed()
+    assert "function calls" in profile.pstats_report(limit=5)
+
+    dump = tmp_path / "sync.prof"
+    response = client.get("/sync?profile=1", headers={"X-Admin-Token": "secret"})
+    dump.write_bytes(profiler.get(int(response.headers["x-profile-id"])).dump())
+    assert any(name == "_blocking_work" for _, _, name in pstats.Stats(str(dump)).stats)
+
+    client.get("/sync", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+    assert [profile.id for profile in profiler.profiles()] == [3, 2]  # ring buffer keeps the newest
+
+
+def test_sampling_rate():
+    profiler = RequestProfiler(capacity=5, sample_rate=1.0)
+    client = TestClient(_app(profiler))
+    client.get("/sync")
+    assert [profile.trigger for profile in profiler.profiles()] == ["sample"]
+
+
+def test_profiling_refused_without_configured_admin_token(monkeypatch):
+    from app.main import app
+
+    monkeypatch.setattr(deps, "ADMIN_TOKEN", None)
+    profiler = RequestProfiler(capacity=2)
+    client = TestClient(_app(profiler, authorize=deps.is_admin_token))
+    response = client.get("/sync?profile=1", headers={"X-Profile": "1", "X-Admin-Token": ""})
+    assert "x-profile-id" not in response.headers and profiler.profiles() == []
+    assert TestClient(app).get("/api/v1/profiles").status_code == 403
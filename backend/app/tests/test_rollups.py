@@ -0,0 +1,76 @@
+import math
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.crud import apply_record_update, create_prediction, create_predictions_bulk, create_record, create_records_bulk
+from app.models import DelayRollup, Record
+from app.rollups import query_stats, rebuild_rollups
+
+
+def _cleaned(i):
+    scheduled = datetime(2025, 1, 1, 6) + timedelta(minutes=25 * i)
+    return {
+        "route_id": f"R{i % 3 + 1}",
+        "scheduled_time": scheduled,
+        "actual_time": scheduled + timedelta(minutes=i % 40),
+        "weather": ["sunny", "rainy"][i % 2],
+        "passenger_count": 10,
+        "cleaned": True,
+        "delay_minutes": float(i % 40),
+    }
+
+
+def _rollup_rows(session):
+    return sorted(
+        (r.route_id, r.bucket, r.weather, r.metric, r.count, round(r.value_sum, 6), r.value_min, r.value_max)
+        for r in session.exec(select(DelayRollup)).all()
+    )
+
+
+def test_rollups_track_inserts_predictions_and_updates(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        first = create_record(session, _cleaned(0))
+        records = create_records_bulk(session, [_cleaned(i) for i in range(1, 120)])
+        create_prediction(session, first.id, 12.5, "v1")
+        create_predictions_bulk(session, [(r.id, r.delay_minutes * 2) for r in records], "v1")
+        record = session.get(Record, records[5].id)
+        apply_record_update(session, record, {"weather": "fog", "delay_minutes": 99.0})
+
+        delays = {}
+        for r in session.exec(select(Record)).all():
+            delays.setdefault(r.route_id, []).append(r.delay_minutes)
+        by_route = {row["route"]: row for row in query_stats(session, "route")}
+        for route_id, values in delays.items():
+            mean = sum(values) / len(values)
+            assert by_route[route_id]["count"] == len(values)
+            assert math.isclose(by_route[route_id]["mean"], mean)
+            assert math.isclose(
+                by_route[route_id]["std"], math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+            )
+            assert by_route[route_id]["max"] == max(values)
+
+        weather = {row["weather"]: row for row in query_stats(session, "weather", metric="predicted")}
+        assert weather["fog"]["count"] == 1
+        assert sum(row["count"] for row in weather.values()) == 120
+        hours = query_stats(session, "hour", start=datetime(2025, 1, 1, 8), end=datetime(2025, 1, 1, 10))
+        assert [row["hour"] for row in hours] == [8, 9]
+        hours = query_stats(session, "hour", start=datetime(2025, 1, 1, 8, 40), end=datetime(2025, 1, 1, 10, 30))
+        assert [row["hour"] for row in hours] == [8, 9, 10]  # partial hours count whole
+
+        incremental = _rollup_rows(session)
+        rebuild_rollups(session)
+        assert _rollup_rows(session) == incremental
+
+
+def test_std_of_equal_values_is_exactly_zero(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        create_records_bulk(session, [{**_cleaned(i), "route_id": "R1", "delay_minutes": 3.3} for i in range(30)])
+
+        (row,) = query_stats(session, "route")
+        assert row["count"] == 30
+        assert row["std"] == 0.0
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sqlmodel import Session, SQLModel, create_engine, func, select
+
+from app.feature_engineering import create_feature_matrix
+from app.models import Record
+from app.training import fold_of, train
+
+
+def _records(n):
+    rng = np.random.default_rng(3)
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            "route_id": f"R{rng.integers(1, 5)}",
+            "scheduled_time": start + timedelta(minutes=37 * i),
+            "weather": str(rng.choice(["sunny", "cloudy", "rainy"])),
+            "passenger_count": int(rng.integers(0, 200)),
+            "latitude": 24.5 + rng.random(),
+            "longitude": 32.5 + rng.random(),
+            "delay_minutes": float(rng.normal(40, 30)),
+        }
+        for i in range(n)
+    ]
+
+
+def test_streamed_training_matches_in_memory_ols(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'train.db'}")
+    SQLModel.metadata.create_all(engine)
+    rows = _records(400)
+    with Session(engine) as session:
+        session.add_all(Record(**row, cleaned=True) for row in rows)
+        session.add(Record(route_id="R1", scheduled_time=datetime(2025, 2, 1), weather="sunny", cleaned=True))
+        session.commit()
+
+    result = train(database_url=f"sqlite:///{tmp_path / 'train.db'}", chunk_size=64, folds=4, n_jobs=1)
+
+    X = create_feature_matrix(rows)
+    y = np.array([row["delay_minutes"] for row in rows])
+    reference = LinearRegression().fit(X, y)
+    assert result.n_rows == 400
+    assert np.allclose(result.model.coef_, reference.coef_, atol=1e-9)
+    assert np.isclose(result.model.intercept_, reference.intercept_)
+
+    held_out = fold_of(np.arange(1, 401), 4) == 0
+    fold_model = LinearRegression().fit(X[~held_out], y[~held_out])
+    residual = y[held_out] - fold_model.predict(X[held_out])
+    assert result.folds[0]["n"] == held_out.sum()
+    assert np.isclose(result.folds[0]["rmse"], np.sqrt(np.mean(residual ** 2)))
+
+
+def test_csv_rows_are_cleaned_like_ingested_records(tmp_path):
+    import pandas as pd
+
+    rows = _records(300)
+    for row in rows[::3]:
+        row["passenger_count"] = 250  # out of range: imputed at serving time
+    path = tmp_path / "train.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+    result = train(csv_path=str(path), chunk_size=64, folds=3, n_jobs=1)
+
+    in_range = sorted(row["passenger_count"] for row in rows if row["passenger_count"] <= 200)
+    median = int((in_range[(len(in_range) - 1) // 2] + in_range[len(in_range) // 2]) / 2)
+    cleaned = [{**row, "passenger_count": row["passenger_count"] if row["passenger_count"] <= 200 else median}
+               for row in rows]
+    reference = LinearRegression().fit(create_feature_matrix(cleaned), [row["delay_minutes"] for row in rows])
+    assert result.n_rows == 300
+    assert np.allclose(result.model.coef_, reference.coef_, atol=1e-9)
+
+
+def test_database_training_includes_archived_months(tmp_path):
+    from app.archive import archive_before, get_archive
+
+    url = f"sqlite:///{tmp_path / 'train.db'}"
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    rows = _records(300)
+    with Session(engine) as session:
+        session.add_all(
+            Record(**row, cleaned=True, created_at=datetime(2025, 1, 1) + timedelta(days=i // 2))
+            for i, row in enumerate(rows)
+        )
+        session.commit()
+    before = train(database_url=url, chunk_size=64, folds=3, n_jobs=1)
+
+    archive_before(engine, datetime(2025, 4, 1))
+    with Session(engine) as session:
+        assert get_archive(session).counts()[0] > 100
+        assert session.exec(select(func.count()).select_from(Record)).one() < 200
+    after = train(database_url=url, chunk_size=64, folds=3, n_jobs=1)
+
+    assert after.n_rows == before.n_rows == 300
+    assert np.allclose(after.model.coef_, before.model.coef_)
+    assert [fold["n"] for fold in after.folds] == [fold["n"] for fold in before.folds]
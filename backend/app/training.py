@@ -0,0 +1,297 @@
+"""Out-of-core training: streamed feature chunks, mergeable OLS statistics, parallel CV.
+
+Training rows go through ``feature_engineering.create_feature_matrix``, the
+same code that builds serving features, so the two cannot drift. CSV rows are
+first cleaned with ``cleaning.clean_records_bulk`` like ingested records, out
+of range passenger counts being imputed from the CSV's own in-range counts
+(``csv_passenger_stats``); Record rows, archived ones included, were cleaned
+when they were stored. Each chunk is reduced to per-fold moments (count,
+means and centred cross-products of ``[features, delay]``) that merge
+exactly, so memory is bounded by the chunk size and chunks can be processed
+on any number of cores.
+"""
+
+import itertools
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.linear_model import LinearRegression
+from sqlalchemy import func
+from sqlmodel import Session, create_engine, select
+
+from . import config
+from .archive import get_archive
+from .cleaning import clean_records_bulk
+from .feature_engineering import FEATURE_COLUMNS, N_FEATURES, create_feature_matrix
+from .models import Record
+from .passenger_stats import PassengerStats
+
+logger = logging.getLogger(__name__)
+
+# Columns of a cleaned record needed to rebuild serving features, plus the target.
+_CSV_COLUMNS = ("route_id", "scheduled_time", "weather", "passenger_count", "latitude", "longitude", "delay_minutes")
+_FOLD_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+class Moments:
+    """Count, mean and centred cross-product matrix of a set of row vectors.
+
+    Merging and subtracting use Chan et al.'s pairwise update, which stays
+    accurate without ever holding the rows themselves.
+    """
+
+    def __init__(self, dim: int) -> None:
+        self.n = 0
+        self.mean = np.zeros(dim)
+        self.comoment = np.zeros((dim, dim))
+
+    @classmethod
+    def from_rows(cls, rows: np.ndarray) -> "Moments":
+        moments = cls(rows.shape[1])
+        if len(rows):
+            moments.n = len(rows)
+            moments.mean = rows.mean(axis=0)
+            centred = rows - moments.mean
+            moments.comoment = centred.T @ centred
+        return moments
+
+    def merge(self, other: "Moments") -> "Moments":
+        """Return the moments of the union of both row sets."""
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            return other
+        merged = Moments(len(self.mean))
+        merged.n = self.n + other.n
+        delta = other.mean - self.mean
+        merged.mean = self.mean + delta * (other.n / merged.n)
+        merged.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.n * other.n / merged.n)
+        return merged
+
+    def subtract(self, part: "Moments") -> "Moments":
+        """Return the moments of this row set with ``part`` (a subset) removed."""
+        rest = Moments(len(self.mean))
+        rest.n = self.n - part.n
+        if rest.n <= 0:
+            return rest
+        rest.mean = (self.mean * self.n - part.mean * part.n) / rest.n
+        delta = part.mean - rest.mean
+        rest.comoment = self.comoment - part.comoment - np.outer(delta, delta) * (part.n * rest.n / self.n)
+        return rest
+
+
+def fit_ols(moments: Moments) -> Tuple[np.ndarray, float]:
+    """Return least-squares ``(coef, intercept)`` for the last column on the others.
+
+    Solves the centred normal equations with a minimum-norm solver, matching
+    ``LinearRegression(fit_intercept=True)`` including rank-deficient inputs.
+    """
+    sxx = moments.comoment[:-1, :-1]
+    sxy = moments.comoment[:-1, -1]
+    coef = np.linalg.lstsq(sxx, sxy, rcond=None)[0]
+    intercept = float(moments.mean[-1] - moments.mean[:-1] @ coef)
+    return coef, intercept
+
+
+def score(moments: Moments, coef: np.ndarray, intercept: float) -> Dict[str, float]:
+    """Return RMSE and R² of ``coef``/``intercept`` on the rows summarised by ``moments``."""
+    sxx = moments.comoment[:-1, :-1]
+    sxy = moments.comoment[:-1, -1]
+    syy = moments.comoment[-1, -1]
+    bias = moments.mean[-1] - moments.mean[:-1] @ coef - intercept
+    sse = syy - 2 * coef @ sxy + coef @ sxx @ coef + moments.n * bias ** 2
+    return {
+        "n": moments.n,
+        "rmse": float(np.sqrt(max(sse, 0.0) / moments.n)),
+        "r2": float(1 - sse / syy) if syy > 0 else 0.0,
+    }
+
+
+def fold_of(keys: np.ndarray, folds: int) -> np.ndarray:
+    """Assign each row key to a fold with a stable multiplicative hash."""
+    hashed = keys.astype(np.uint64) * _FOLD_HASH
+    return ((hashed >> np.uint64(32)) % np.uint64(folds)).astype(np.intp)
+
+
+def _fold_moments(X: np.ndarray, y: np.ndarray, keys: np.ndarray, folds: int) -> List[Moments]:
+    rows = np.column_stack([X, y])
+    assignment = fold_of(keys, folds)
+    return [Moments.from_rows(rows[assignment == fold]) for fold in range(folds)]
+
+
+# --- data sources -----------------------------------------------------------
+
+
+def csv_chunks(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Yield chunks of a cleaned-records CSV; the index numbers rows across chunks."""
+    yield from pd.read_csv(path, usecols=list(_CSV_COLUMNS), chunksize=chunk_size)
+
+
+def csv_passenger_stats(path: str, chunk_size: int) -> PassengerStats:
+    """Passenger-count distributions of a CSV's in-range rows.
+
+    They play the part of the stored records' distributions at serving time
+    when cleaning imputes the CSV's missing or out-of-range counts.
+    """
+    stats = PassengerStats()
+    for frame in pd.read_csv(path, usecols=["route_id", "scheduled_time", "passenger_count"], chunksize=chunk_size):
+        counts = pd.to_numeric(frame["passenger_count"], errors="coerce")
+        in_range = frame[counts.between(config.MIN_PASSENGER, config.MAX_PASSENGER)]
+        for record in clean_records_bulk(in_range, None, rejects={}, passenger_stats=stats):
+            stats.observe(record["route_id"], record["scheduled_time"], record["passenger_count"])
+    return stats
+
+
+def _csv_chunk_moments(frame: pd.DataFrame, folds: int, passenger_stats: PassengerStats) -> List[Moments]:
+    frame = frame[frame["delay_minutes"].notna()]
+    rejects: Dict[int, str] = {}
+    records = clean_records_bulk(frame, None, rejects=rejects, passenger_stats=passenger_stats)
+    kept = np.setdiff1d(np.arange(len(frame)), np.fromiter(rejects, dtype=np.intp, count=len(rejects)))
+    y = frame["delay_minutes"].to_numpy(dtype=np.float64)[kept]
+    keys = frame.index.to_numpy()[kept]
+    return _fold_moments(create_feature_matrix(records), y, keys, folds)
+
+
+def record_id_ranges(database_url: str, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """Yield ``[low, high)`` id ranges of labelled records, ``chunk_size`` ids wide."""
+    engine = create_engine(database_url)
+    with Session(engine) as session:
+        low, high = session.exec(
+            select(func.min(Record.id), func.max(Record.id)).where(Record.delay_minutes.is_not(None))
+        ).one()
+    engine.dispose()
+    if low is None:
+        return
+    for start in range(low, high + 1, chunk_size):
+        yield start, start + chunk_size
+
+
+def archived_record_batches(database_url: str, chunk_size: int) -> Iterator[List[dict]]:
+    """Yield labelled records of the database's archive as row dicts, up to ``chunk_size`` at a time."""
+    engine = create_engine(database_url)
+    try:
+        with Session(engine) as session:
+            batches = get_archive(session).iter_record_batches(
+                batch_size=chunk_size, with_predictions=False, cache=False
+            )
+            for batch in batches:
+                rows = [record.dict() for record, _ in batch if record.delay_minutes is not None]
+                if rows:
+                    yield rows
+    finally:
+        engine.dispose()
+
+
+def _record_range_moments(database_url: str, low: int, high: int, folds: int) -> List[Moments]:
+    engine = create_engine(database_url)
+    try:
+        with Session(engine) as session:
+            records = session.exec(
+                select(Record)
+                .where(Record.id >= low, Record.id < high, Record.delay_minutes.is_not(None))
+                .order_by(Record.id)
+            ).all()
+            rows = [record.dict() for record in records]
+    finally:
+        engine.dispose()
+    return _rows_moments(rows, folds)
+
+
+def _rows_moments(rows: List[dict], folds: int) -> List[Moments]:
+    X = create_feature_matrix(rows)
+    y = np.array([row["delay_minutes"] for row in rows], dtype=np.float64)
+    keys = np.array([row["id"] for row in rows], dtype=np.int64)
+    return _fold_moments(X, y, keys, folds)
+
+
+# --- training ---------------------------------------------------------------
+
+
+@dataclass
+class TrainingResult:
+    """Final model fitted on all rows plus per-fold cross-validation scores."""
+
+    model: LinearRegression
+    n_rows: int
+    folds: List[Dict[str, float]]
+
+    @property
+    def cv_rmse(self) -> float:
+        return float(np.mean([fold["rmse"] for fold in self.folds]))
+
+    @property
+    def cv_r2(self) -> float:
+        return float(np.mean([fold["r2"] for fold in self.folds]))
+
+
+def build_model(coef: np.ndarray, intercept: float) -> LinearRegression:
+    """Wrap fitted coefficients in a LinearRegression that serves like a fitted one."""
+    model = LinearRegression()
+    model.coef_ = np.ascontiguousarray(coef, dtype=np.float64)
+    model.intercept_ = float(intercept)
+    model.n_features_in_ = N_FEATURES
+    model.feature_names_in_ = np.array(FEATURE_COLUMNS, dtype=object)
+    return model
+
+
+def _fold_scores(total: Moments, fold_moments: List[Moments], n_jobs: int) -> List[Dict[str, float]]:
+    """Fit on all-but-one fold and score the held-out fold, one fold per worker."""
+
+    def run(held_out: Moments) -> Dict[str, float]:
+        coef, intercept = fit_ols(total.subtract(held_out))
+        return score(held_out, coef, intercept)
+
+    return Parallel(n_jobs=n_jobs, prefer="threads")(delayed(run)(held_out) for held_out in fold_moments)
+
+
+def train(
+    csv_path: Optional[str] = None,
+    database_url: Optional[str] = None,
+    chunk_size: int = 50_000,
+    folds: int = 5,
+    n_jobs: int = -1,
+) -> TrainingResult:
+    """Stream training rows from ``csv_path`` or ``database_url`` and fit OLS with k-fold CV.
+
+    A database source includes the months its retention job has archived:
+    hot records are read in id ranges, archived ones in batches decoded here.
+
+    Chunks are featurised and reduced to per-fold moments in parallel worker
+    processes; at most ``2 * n_jobs`` chunks are in flight at a time.
+    """
+    if (csv_path is None) == (database_url is None):
+        raise ValueError("Pass exactly one of csv_path or database_url")
+    if folds < 2:
+        raise ValueError("folds must be at least 2")
+
+    if csv_path is not None:
+        stats = csv_passenger_stats(csv_path, chunk_size)
+        tasks = (delayed(_csv_chunk_moments)(frame, folds, stats) for frame in csv_chunks(csv_path, chunk_size))
+    else:
+        tasks = itertools.chain(
+            (
+                delayed(_record_range_moments)(database_url, low, high, folds)
+                for low, high in record_id_ranges(database_url, chunk_size)
+            ),
+            (delayed(_rows_moments)(rows, folds) for rows in archived_record_batches(database_url, chunk_size)),
+        )
+
+    fold_moments = [Moments(N_FEATURES + 1) for _ in range(folds)]
+    parallel = Parallel(n_jobs=n_jobs, return_as="generator", pre_dispatch="2*n_jobs")
+    for chunk in parallel(tasks):
+        fold_moments = [a.merge(b) for a, b in zip(fold_moments, chunk)]
+
+    total = Moments(N_FEATURES + 1)
+    for part in fold_moments:
+        total = total.merge(part)
+    if total.n <= N_FEATURES:
+        raise ValueError(f"Not enough labelled rows to train ({total.n})")
+
+    scores = _fold_scores(total, fold_moments, n_jobs)
+    coef, intercept = fit_ols(total)
+    logger.info("Trained on %s rows; CV RMSE %.2f", total.n, float(np.mean([s["rmse"] for s in scores])))
+    return TrainingResult(model=build_model(coef, intercept), n_rows=total.n, folds=scores)
@@ -0,0 +1,62 @@
+"""Compare sklearn LinearRegression.predict with the fused NumPy fast path.
+
+Usage (from backend/): python benchmarks/linear_fast_path.py [--model model/model.joblib] [--repeat 20000]
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.feature_engineering import N_FEATURES  # noqa: E402
+from app.model_server import PREDICTION_MAX, PREDICTION_MIN, LinearFastPath  # noqa: E402
+
+
+def sklearn_predict(model, X: np.ndarray) -> np.ndarray:
+    """The pre-fast-path code path: sklearn predict followed by clipping."""
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        return np.clip(model.predict(X), PREDICTION_MIN, PREDICTION_MAX)
+
+
+def time_per_call(fn, X: np.ndarray, repeat: int) -> float:
+    fn(X)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--model", default=os.path.join("model", "model.joblib"))
+    ap.add_argument("--repeat", type=int, default=20000)
+    args = ap.parse_args()
+
+    model = joblib.load(args.model)
+    fast = LinearFastPath.from_model(model)
+    if fast is None:
+        raise SystemExit(f"{type(model).__name__} is not eligible for the linear fast path")
+
+    rng = np.random.default_rng(0)
+    X_check = rng.normal(0, 50, size=(100_000, N_FEATURES))
+    identical = np.array_equal(sklearn_predict(model, X_check), fast(X_check))
+    print(f"bit-identical on {len(X_check)} random rows: {identical}")
+
+    print(f"{'rows':>6} {'sklearn us/call':>16} {'fast us/call':>13} {'speedup':>8}")
+    for rows in (1, 32, 256, 4096):
+        X = rng.normal(0, 50, size=(rows, N_FEATURES))
+        repeat = max(10, args.repeat // rows)
+        slow_s = time_per_call(lambda X: sklearn_predict(model, X), X, repeat)
+        fast_s = time_per_call(fast, X, repeat)
+        print(f"{rows:>6} {slow_s * 1e6:>16.2f} {fast_s * 1e6:>13.2f} {slow_s / fast_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
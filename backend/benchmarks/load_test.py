@@ -0,0 +1,137 @@
+"""Concurrent load test for /predict and /records/batch_ingest, reporting latency percentiles.
+
+Usage (from backend/): python benchmarks/load_test.py [--url http://127.0.0.1:8000]
+    [--concurrency 64] [--requests 2000] [--batch-size 100]
+
+Without ``--url`` a uvicorn server is started on a temporary SQLite database.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _record(rng: random.Random) -> Dict[str, object]:
+    hour = rng.randint(5, 22)
+    return {
+        "route_id": f"R{rng.randint(1, 8)}",
+        "scheduled_time": f"2025-03-{rng.randint(1, 28):02d} {hour:02d}:{rng.randint(0, 59):02d}",
+        "actual_time": f"2025-03-{rng.randint(1, 28):02d} {hour:02d}:{rng.randint(0, 59):02d}",
+        "weather": rng.choice(["sunny", "cloudy", "rainy", "fog"]),
+        "passenger_count": rng.randint(0, 200),
+        "latitude": 24.5 + rng.random(),
+        "longitude": 32.5 + rng.random(),
+    }
+
+
+def _percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": statistics.fmean(ordered)}
+
+
+async def _drive(client: httpx.AsyncClient, path: str, bodies: List[object], concurrency: int, params=None):
+    latencies: List[float] = []
+    errors = 0
+    queue: "asyncio.Queue[object]" = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+
+    async def worker() -> None:
+        nonlocal errors
+        while True:
+            try:
+                body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            response = await client.post(path, json=body, params=params)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def _report(name: str, latencies: List[float], errors: int, elapsed: float) -> None:
+    stats = _percentiles(latencies)
+    print(
+        f"{name:<14} n={len(latencies):<6} rps={len(latencies) / elapsed:8.1f} "
+        f"p50={stats['p50']:7.1f}ms p95={stats['p95']:7.1f}ms p99={stats['p99']:7.1f}ms errors={errors}"
+    )
+
+
+async def run(url: str, concurrency: int, requests: int, batch_size: int) -> None:
+    rng = random.Random(0)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        await client.post("/api/v1/predict", json=_record(rng), params={"use_baseline": True})
+        predict_bodies = [_record(rng) for _ in range(requests)]
+        _report("predict", *await _drive(client, "/api/v1/predict", predict_bodies, concurrency, {"use_baseline": True}))
+        batches = [[_record(rng) for _ in range(batch_size)] for _ in range(max(1, requests // batch_size))]
+        _report("batch_ingest", *await _drive(client, "/api/v1/records/batch_ingest", batches, min(concurrency, 8)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", help="Base URL of a running server; omit to start one")
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--batch-size", type=int, default=100)
+    args = ap.parse_args()
+
+    if args.url:
+        asyncio.run(run(args.url, args.concurrency, args.requests, args.batch_size))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        port = _free_port()
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'load.db')}")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=env,
+        )
+        url = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    httpx.get(f"{url}/api/v1/health", timeout=1)
+                    break
+                except httpx.TransportError:
+                    if time.monotonic() > deadline:
+                        raise SystemExit("server did not start")
+                    time.sleep(0.2)
+            asyncio.run(run(url, args.concurrency, args.requests, args.batch_size))
+        finally:
+            server.terminate()
+            server.wait(10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Show SQLite query plans and timings for the hot listing queries, before and after indexes.
+
+Usage (from backend/): python benchmarks/query_plans.py [--rows 200000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+from sqlmodel import SQLModel, create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import ensure_indexes  # noqa: E402
+from app.models import Prediction, Record  # noqa: E402
+
+QUERIES = {
+    "list_predictions_with_records": (
+        "SELECT prediction.id, record.id FROM prediction JOIN record ON prediction.record_id = record.id "
+        "ORDER BY prediction.created_at DESC LIMIT 20"
+    ),
+    "last_model_version": "SELECT model_version FROM prediction ORDER BY created_at DESC LIMIT 1",
+    "dashboard_route_window": (
+        "SELECT * FROM record WHERE route_id = 'R3' "
+        "AND scheduled_time BETWEEN '2025-03-01' AND '2025-03-08' ORDER BY scheduled_time"
+    ),
+    "recent_records": "SELECT * FROM record ORDER BY created_at DESC LIMIT 100",
+    "predictions_for_record": "SELECT * FROM prediction WHERE record_id = 4242",
+}
+
+
+def populate(engine, rows: int) -> None:
+    """Fill the database with synthetic records and one prediction per record."""
+    rng = random.Random(0)
+    start = datetime(2025, 1, 1)
+    records = []
+    for i in range(rows):
+        scheduled = start + timedelta(minutes=30 * i)
+        records.append(
+            {
+                "route_id": f"R{rng.randint(1, 4)}",
+                "scheduled_time": scheduled,
+                "actual_time": scheduled + timedelta(minutes=rng.randint(-10, 120)),
+                "weather": rng.choice(["sunny", "cloudy", "rainy"]),
+                "passenger_count": rng.randint(0, 200),
+                "latitude": 24.5,
+                "longitude": 32.5,
+                "cleaned": True,
+                "delay_minutes": 10.0,
+                "created_at": scheduled,
+            }
+        )
+    predictions = [
+        {"record_id": i + 1, "predicted_delay": 61.0, "model_version": "bench", "created_at": r["created_at"]}
+        for i, r in enumerate(records)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Record), records)
+        conn.execute(insert(Prediction), predictions)
+
+
+def report(engine, label: str, repeat: int = 20) -> None:
+    print(f"\n=== {label} ===")
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+            started = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(text(sql)).fetchall()
+            elapsed_ms = (time.perf_counter() - started) / repeat * 1000
+            print(f"{name:32s} {elapsed_ms:9.3f} ms")
+            for step in plan:
+                print(f"    {step}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}")
+        # Mimic a database created before the indexes existed.
+        SQLModel.metadata.create_all(engine)
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(engine)
+        populate(engine, args.rows)
+        report(engine, f"without indexes ({args.rows} records)")
+        ensure_indexes(engine)
+        with engine.connect() as conn:
+            conn.execute(text("ANALYZE"))
+        report(engine, "with indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Compare SQLite storage profiles under concurrent ingest and dashboard reads.
+
+Usage (from backend/): python benchmarks/storage_profiles.py [--seconds 10] [--writers 4] [--readers 8]
+
+Each profile gets a fresh database seeded with ``--rows`` records. Writer
+threads insert one record per transaction (like POST /records) and reader
+threads alternate between the prediction feed and the route/timeseries stats
+queries the dashboard issues. The tuned profile follows ``SQLITE_SYNCHRONOUS``;
+run with ``SQLITE_SYNCHRONOUS=NORMAL`` to measure the relaxed durability setting.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.crud import create_record, list_predictions_with_records  # noqa: E402
+from app.db import STORAGE_PROFILES, build_engine  # noqa: E402
+from app.models import Prediction, Record  # noqa: E402
+from app.rollups import query_stats, rebuild_rollups  # noqa: E402
+
+START = datetime(2025, 1, 1)
+
+
+def synthetic_record(rng: random.Random, i: int) -> Dict[str, object]:
+    scheduled = START + timedelta(minutes=30 * i)
+    delay = rng.randint(-10, 120)
+    return {
+        "route_id": f"R{rng.randint(1, 4)}",
+        "scheduled_time": scheduled,
+        "actual_time": scheduled + timedelta(minutes=delay),
+        "weather": rng.choice(["sunny", "cloudy", "rainy"]),
+        "passenger_count": rng.randint(0, 200),
+        "latitude": 24.5,
+        "longitude": 32.5,
+        "cleaned": True,
+        "delay_minutes": float(delay),
+    }
+
+
+def populate(engine, rows: int) -> None:
+    """Seed records, one prediction per record, and their rollups."""
+    rng = random.Random(0)
+    records = [synthetic_record(rng, i) for i in range(rows)]
+    with engine.begin() as conn:
+        conn.execute(insert(Record), records)
+        conn.execute(
+            insert(Prediction),
+            [{"record_id": i + 1, "predicted_delay": 61.0, "model_version": "bench"} for i in range(rows)],
+        )
+    with Session(engine) as session:
+        rebuild_rollups(session)
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def run_profile(profile: str, tmp: str, args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    engine = build_engine(f"sqlite:///{os.path.join(tmp, profile + '.sqlite')}", profile)
+    SQLModel.metadata.create_all(engine)
+    populate(engine, args.rows)
+
+    deadline = time.perf_counter() + args.seconds
+    latencies: Dict[str, List[float]] = {"write": [], "read": []}
+    errors = {"write": 0, "read": 0}
+    lock = threading.Lock()
+
+    def writer(seed: int) -> None:
+        rng = random.Random(seed)
+        i = args.rows + seed * 1_000_000
+        while time.perf_counter() < deadline:
+            i += 1
+            started = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    create_record(session, synthetic_record(rng, i))
+            except OperationalError:
+                with lock:
+                    errors["write"] += 1
+                continue
+            with lock:
+                latencies["write"].append(time.perf_counter() - started)
+
+    def reader(seed: int) -> None:
+        step = seed
+        while time.perf_counter() < deadline:
+            step += 1
+            started = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    if step % 3 == 0:
+                        list_predictions_with_records(session, limit=20)
+                    elif step % 3 == 1:
+                        query_stats(session, "route")
+                    else:
+                        query_stats(session, "bucket", start=START, end=START + timedelta(days=7))
+            except OperationalError:
+                with lock:
+                    errors["read"] += 1
+                continue
+            with lock:
+                latencies["read"].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    return {
+        kind: {
+            "ops": len(samples),
+            "ops_per_s": len(samples) / args.seconds,
+            "p50_ms": _percentile(samples, 0.50) * 1000,
+            "p95_ms": _percentile(samples, 0.95) * 1000,
+            "p99_ms": _percentile(samples, 0.99) * 1000,
+            "errors": errors[kind],
+        }
+        for kind, samples in latencies.items()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g}s per profile, {args.rows} seeded records")
+    print(f"{'profile':<10} {'kind':<6} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in STORAGE_PROFILES:
+            for kind, result in run_profile(profile, tmp, args).items():
+                print(
+                    f"{profile:<10} {kind:<6} {result['ops_per_s']:>9.1f} {result['p50_ms']:>9.2f} "
+                    f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}"
+                )
+
+
+if __name__ == "__main__":
+    main()
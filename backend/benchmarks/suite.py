@@ -0,0 +1,306 @@
+"""Benchmark suite for the ingest and predict hot paths; writes results as JSON.
+
+Usage (from backend/):
+    python benchmarks/suite.py                        # full run -> benchmarks/results/<timestamp>.json
+    python benchmarks/suite.py --quick --only clean,predict
+    python benchmarks/suite.py --compare benchmarks/results/before.json
+
+Synthetic inputs are resampled from cleaned_transport_dataset.csv with
+jittered coordinates, random timestamps in mixed formats and some messy
+weather/passenger values, so cleaning exercises its real branches.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = os.path.join(os.path.dirname(BACKEND_DIR), "cleaned_transport_dataset.csv")
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+# The app reads its configuration at import time: point it at a scratch
+# database and turn off the prediction cache so every call does real work.
+_SCRATCH = tempfile.mkdtemp(prefix="bench-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(_SCRATCH, 'bench.db')}",
+    MODEL_REGISTRY_DIR=os.path.join(_SCRATCH, "registry"),
+    PREDICTION_CACHE_MAX_BYTES="0",
+)
+sys.path.insert(0, BACKEND_DIR)
+
+import logging  # noqa: E402
+
+import pandas as pd  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+logging.disable(logging.WARNING)
+
+from app.cleaning import clean_record, clean_records_bulk  # noqa: E402
+from app.config import MODEL_PATH  # noqa: E402
+from app.crud import create_record, create_records_bulk  # noqa: E402
+from app.feature_engineering import create_feature_matrix, create_feature_vector  # noqa: E402
+from app.model_server import ModelServer  # noqa: E402
+
+GROUPS = ("clean", "features", "predict", "crud", "e2e")
+_TIME_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%m/%d/%Y %H:%M", "%H:%M")
+_MESSY_WEATHER = {"sunny": "Sun", "cloudy": "Clody", "rainy": "RAINY", "unknown": "??"}
+
+
+def synthetic_records(n: int, seed: int = 0) -> List[Dict[str, object]]:
+    """Raw RecordIn payloads resampled from the training CSV distribution."""
+    rng = random.Random(seed)
+    source = pd.read_csv(DATASET, usecols=["route_id", "weather", "passenger_count", "latitude", "longitude", "delay_minutes"])
+    rows = source.to_dict("records")
+    start = datetime(2025, 1, 1)
+    records = []
+    for _ in range(n):
+        row = rng.choice(rows)
+        scheduled = start + timedelta(minutes=rng.randrange(0, 60 * 24 * 90))
+        actual = scheduled + timedelta(minutes=max(-60, min(300, row["delay_minutes"])))
+        fmt = rng.choice(_TIME_FORMATS)
+        weather = row["weather"] if rng.random() > 0.2 else _MESSY_WEATHER.get(row["weather"], row["weather"])
+        records.append(
+            {
+                "route_id": row["route_id"] if rng.random() > 0.2 else f"Route-{row['route_id'][1:]}",
+                "scheduled_time": scheduled.strftime(fmt),
+                "actual_time": actual.strftime(fmt) if rng.random() > 0.1 else None,
+                "weather": weather,
+                "passenger_count": None if rng.random() < 0.1 else int(row["passenger_count"]),
+                "latitude": row["latitude"] + rng.gauss(0, 0.01),
+                "longitude": row["longitude"] + rng.gauss(0, 0.01),
+            }
+        )
+    return records
+
+
+def measure(fn: Callable[[], object], repeat: int, items_per_call: int = 1, warmup: int = 3) -> Dict[str, float]:
+    """Time ``repeat`` calls of ``fn``; report per-call latency and item throughput."""
+    for _ in range(min(warmup, repeat)):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    total = sum(samples)
+    return {
+        "calls": repeat,
+        "items_per_call": items_per_call,
+        "mean_us": total / repeat * 1e6,
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p95_us": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6,
+        "items_per_s": repeat * items_per_call / total if total else 0.0,
+    }
+
+
+def _fresh_session() -> Session:
+    engine = create_engine(f"sqlite:///{tempfile.mktemp(dir=_SCRATCH, suffix='.db')}")
+    SQLModel.metadata.create_all(engine)
+    return Session(engine)
+
+
+def bench_clean(scale: float) -> Dict[str, dict]:
+    records = synthetic_records(int(2000 * scale) or 100)
+    batch = records[:1000]
+    results = {}
+    with _fresh_session() as session:
+        it = iter(records * 50)
+        results["clean_record"] = measure(lambda: clean_record(next(it), session), len(records))
+        results["clean_records_bulk_1000"] = measure(
+            lambda: clean_records_bulk(batch, session), max(3, int(20 * scale)), len(batch)
+        )
+    return results
+
+
+def _cleaned(n: int) -> List[dict]:
+    with _fresh_session() as session:
+        return clean_records_bulk(synthetic_records(n, seed=1), session)
+
+
+def bench_features(scale: float) -> Dict[str, dict]:
+    cleaned = _cleaned(1000)
+    it = iter(cleaned * 100)
+    return {
+        "create_feature_vector": measure(lambda: create_feature_vector(next(it)), int(5000 * scale) or 200),
+        "create_feature_matrix_1000": measure(lambda: create_feature_matrix(cleaned), max(3, int(50 * scale)), 1000),
+    }
+
+
+def bench_predict(scale: float) -> Dict[str, dict]:
+    server = ModelServer()
+    server.load_model(MODEL_PATH)
+    if not server.loaded:
+        return {}
+    X = create_feature_matrix(_cleaned(1000))
+    single = X[:1]
+    repeat = int(5000 * scale) or 200
+    batch_repeat = max(3, int(200 * scale))
+    return {
+        "model_predict_single": measure(lambda: server.predict(single), repeat),
+        "model_predict_1000": measure(lambda: server.predict(X), batch_repeat, len(X)),
+        "baseline_predict_single": measure(lambda: server.predict(single, use_baseline=True), repeat),
+        "baseline_predict_1000": measure(lambda: server.predict(X, use_baseline=True), batch_repeat, len(X)),
+    }
+
+
+def bench_crud(scale: float) -> Dict[str, dict]:
+    cleaned = _cleaned(max(500, int(5000 * scale)))
+    results = {}
+    with _fresh_session() as session:
+        it = iter(cleaned * 10)
+        results["create_record_sqlite"] = measure(lambda: create_record(session, next(it)), max(50, int(500 * scale)))
+    with _fresh_session() as session:
+        results["create_records_bulk_sqlite"] = measure(
+            lambda: create_records_bulk(session, cleaned), max(3, int(10 * scale)), len(cleaned)
+        )
+    return results
+
+
+async def _e2e(scale: float) -> Dict[str, dict]:
+    import httpx
+
+    from app.main import app
+    from app.prediction_worker import prediction_worker
+
+    for handler in app.router.on_startup:
+        handler()
+    try:
+        payloads = synthetic_records(max(200, int(2000 * scale)), seed=2)
+        batches = [payloads[i:i + 100] for i in range(0, len(payloads), 100)]
+        results = {}
+        async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+            # /predict always answers with the rules baseline, so this does not reach the model or micro-batcher
+            for name, path, bodies in (
+                ("e2e_predict_baseline", "/api/v1/predict", payloads),
+                ("e2e_batch_ingest_100", "/api/v1/records/batch_ingest", batches),
+            ):
+                latencies: List[float] = []
+                queue = list(reversed(bodies))
+
+                async def worker() -> None:
+                    while queue:
+                        body = queue.pop()
+                        started = time.perf_counter()
+                        response = await client.post(path, json=body)
+                        response.raise_for_status()
+                        latencies.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(16)))
+                elapsed = time.perf_counter() - started
+                latencies.sort()
+                items = 100 if name.endswith("_100") else 1
+                results[name] = {
+                    "calls": len(latencies),
+                    "items_per_call": items,
+                    "concurrency": 16,
+                    "mean_us": statistics.fmean(latencies) * 1e6,
+                    "p50_us": latencies[len(latencies) // 2] * 1e6,
+                    "p95_us": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1e6,
+                    "items_per_s": len(latencies) * items / elapsed,
+                }
+        prediction_worker.wait_idle(60)
+        return results
+    finally:
+        for handler in app.router.on_shutdown:
+            handler()
+
+
+def bench_e2e(scale: float) -> Dict[str, dict]:
+    return asyncio.run(_e2e(scale))
+
+
+BENCHMARKS = {
+    "clean": bench_clean,
+    "features": bench_features,
+    "predict": bench_predict,
+    "crud": bench_crud,
+    "e2e": bench_e2e,
+}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, dict], baseline_path: str) -> None:
+    """Print throughput change for every benchmark present in both runs."""
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = json.load(handle)["results"]
+    print(f"\n{'benchmark':<30} {'before items/s':>15} {'after items/s':>15} {'change':>8}")
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["items_per_s"], result["items_per_s"]
+        print(f"{name:<30} {before:>15.1f} {after:>15.1f} {(after / before - 1) * 100 if before else 0:>+7.1f}%")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--only", help=f"Comma-separated groups to run ({', '.join(GROUPS)})")
+    ap.add_argument("--quick", action="store_true", help="Run about a tenth of the iterations")
+    ap.add_argument("--output", help="Result file (default benchmarks/results/<timestamp>.json)")
+    ap.add_argument("--compare", help="Earlier result file to compare against")
+    args = ap.parse_args()
+
+    groups = args.only.split(",") if args.only else list(GROUPS)
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        raise SystemExit(f"Unknown benchmark groups: {', '.join(sorted(unknown))}")
+    scale = 0.1 if args.quick else 1.0
+
+    results: Dict[str, dict] = {}
+    for group in groups:
+        group_results = BENCHMARKS[group](scale)
+        for name, result in group_results.items():
+            print(
+                f"{name:<30} p50 {result['p50_us']:>10.1f}us  p95 {result['p95_us']:>10.1f}us  "
+                f"{result['items_per_s']:>12.1f} items/s"
+            )
+        results.update(group_results)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as handle:
+        json.dump(
+            {
+                "meta": {
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "git_commit": _git_commit(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cpu_count": os.cpu_count(),
+                    "numpy": np.__version__,
+                    "quick": args.quick,
+                    "groups": groups,
+                },
+                "results": results,
+            },
+            handle,
+            indent=2,
+        )
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
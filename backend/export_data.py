@@ -0,0 +1,65 @@
+"""Export records (optionally joined with predictions) to Parquet, Arrow IPC or gzip CSV.
+
+Rows are streamed from the database in fixed-size batches, so memory use does
+not grow with the size of the export; see ``app/export.py``.
+
+Usage:
+    python export_data.py --output records.parquet
+    python export_data.py --format csv.gz --no-predictions --output train.csv.gz   # input for train_model.py --csv
+    python export_data.py --database-url sqlite:///./data/db.sqlite --route R3 --start 2025-01-01 --end 2025-02-01 -o -
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from sqlmodel import Session
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.config import DATABASE_URL, EXPORT_BATCH_SIZE  # noqa: E402
+from app.db import build_engine  # noqa: E402
+from app.export import FORMATS, ExportFormatError, ExportQuery, default_format, get_format, stream_export  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stream records and predictions to a columnar file")
+    parser.add_argument(
+        "--format", choices=list(FORMATS), help="Output format (default: parquet if pyarrow is installed)"
+    )
+    parser.add_argument("--output", "-o", required=True, help="Output path, or - for stdout")
+    parser.add_argument("--database-url", default=DATABASE_URL, help="Database to export (default: DATABASE_URL)")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="scheduled_time lower bound (inclusive)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="scheduled_time upper bound (exclusive)")
+    parser.add_argument("--route", help="Only this route_id")
+    parser.add_argument("--no-predictions", action="store_true", help="One row per record, without predictions")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="Rows per batch")
+    args = parser.parse_args()
+
+    try:
+        fmt = get_format(args.format or default_format())
+    except ExportFormatError as exc:
+        parser.error(str(exc))
+    query = ExportQuery(
+        start=args.start, end=args.end, route_id=args.route, include_predictions=not args.no_predictions
+    )
+
+    engine = build_engine(args.database_url)
+    started = time.perf_counter()
+    written = 0
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        with Session(engine) as session:
+            for chunk in stream_export(session, query, fmt, args.batch_size):
+                out.write(chunk)
+                written += len(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    print(f"Wrote {written} bytes to {args.output} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()